@@ -3,6 +3,19 @@ from pathlib import Path
 from re import Pattern
 
 DATA_PATH: Path = Path(__file__).resolve().parents[2].joinpath('data')
+WEATHER_STORE_PATH: Path = DATA_PATH.joinpath('weather_data')
+WEATHER_FILE_NAME: str = 'weather_data.parquet'
+WEATHER_ROLLUP_FILE_NAMES: dict[str, str] = {
+    every: f'weather_rollup_{every}.parquet' for every in ('6h', '1d')
+}
+MANIFEST_FILE_NAME: str = 'manifest.json'
+DATA_VERSIONS_DIR_NAME: str = 'versions'
+WEATHER_IPC_FILE_NAME: str = 'weather_data.arrow'
+METRICS_IPC_FILE_NAME: str = 'metrics.arrow'
+MAP_FRAMES_FILE_NAME: str = 'map_frames.parquet'
+WEATHER_ROLLUP_IPC_FILE_NAMES: dict[str, str] = {
+    every: f'weather_rollup_{every}.arrow' for every in WEATHER_ROLLUP_FILE_NAMES
+}
 TIMEZONE_SWITZERLAND_STRING: str = 'Europe/Zurich'
 TIME_PERIOD_VALUES: tuple[int, ...] = (3, 7, 14, 30)
 parameter_description_extraction_pattern: Pattern[str] = re.compile(r'([\w\s()]+)')
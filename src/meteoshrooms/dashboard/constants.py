@@ -28,11 +28,9 @@ WEATHER_SHORT_LABEL_DICT: dict[str, str] = {
     'tde200h0': 'Dew Point',
 }
 SIDEBAR_MAX_SELECTIONS: int = 5
-COLUMNS_FOR_MAP_FRAME: set = {
-    'Short Code',
-    'Station Type',
-    'station_name',
-    'station_coordinates_wgs84_lat',
-    'station_coordinates_wgs84_lon',
-    'Altitude',
-}
+CHART_ROLLUP_EVERY: str = '6h'
+DATA_VERSION_POLL_SECONDS: float = 60
+DATA_FILE_PATTERNS: tuple[str, ...] = ('*.parquet', '*.arrow')
+FIGURE_CACHE_MAX_ENTRIES: int = 128
+FIGURE_CACHE_MAX_BYTES: int = 256 * 1024**2
+SHARED_DATA_MAX_VERSIONS: int = 2
@@ -4,24 +4,29 @@ import logging
 import polars as pl
 import streamlit as st
 
+from meteoshrooms.dashboard import settings
 from meteoshrooms.dashboard.constants import (
     METRICS_STRINGS,
     NUM_DAYS_DELTA,
     NUM_DAYS_VAL,
     TIME_PERIODS,
 )
-from meteoshrooms.dashboard.dashboard_map import create_map_section
+from meteoshrooms.dashboard.dashboard_map import create_map_fragment
 from meteoshrooms.dashboard.dashboard_timeseries_chart import create_area_chart
 from meteoshrooms.dashboard.dashboard_utils import (
     create_station_names,
     create_stations_options_selected,
+    get_data_version,
+    get_figure_cache,
     load_metric_data,
-    load_weather_data,
+    scan_weather_data,
 )
+from meteoshrooms.dashboard.instrumentation import RenderTimer, create_timing_panel
 from meteoshrooms.dashboard.log import init_logging
 from meteoshrooms.dashboard.ux_metrics import (
-    create_metric_section,
+    create_metric_sections,
     create_metrics_expander_info,
+    load_metric_cards_frame,
 )
 
 
@@ -32,11 +37,18 @@ def main():
         st.session_state.stations_selected_last_time = {'Airolo'}
     st.set_page_config(layout='wide', initial_sidebar_state='expanded')
     root_logger.debug('Page config set')
-    df_weather: pl.LazyFrame = load_weather_data().lazy()
-    root_logger.debug('Weather data LazyFrame loaded')
-    metrics: pl.LazyFrame = load_metric_data().lazy()
-    root_logger.debug('Metrics LazyFrame created')
-    station_name_list: tuple[str, ...] = create_station_names(metrics)
+    timer: RenderTimer = RenderTimer(settings.get_args().debug)
+    with timer.stage('data_load') as stage:
+        data_version: str = get_data_version()
+        df_weather: pl.LazyFrame = scan_weather_data(data_version)
+        root_logger.debug('Weather data LazyFrame scanned')
+        frame_metrics: pl.DataFrame = load_metric_data(data_version)
+        stage['rows'] = frame_metrics.height
+        metrics: pl.LazyFrame = frame_metrics.lazy()
+        root_logger.debug('Metrics LazyFrame created')
+    with timer.stage('station_list') as stage:
+        station_name_list: tuple[str, ...] = create_station_names(metrics, data_version)
+        stage['rows'] = len(station_name_list)
     st.title('MeteoShrooms')
 
     with st.sidebar:
@@ -49,19 +61,30 @@ def main():
         )
         toggle_hide_map: bool = st.toggle('Hide Map')
 
-    with st.container():
-        create_area_chart(
-            df_weather, stations_options_selected, time_period_selected, 'rre150h0'
-        )
+    with st.container(), timer.stage('chart_frame') as stage:
+        stage['rows'] = create_area_chart(
+            df_weather,
+            stations_options_selected,
+            time_period_selected,
+            'rre150h0',
+            data_version,
+        ).height
     if not toggle_hide_map:
-        create_map_section(metrics, 'rre150h0', time_period_selected)
+        create_map_fragment(
+            'rre150h0', time_period_selected, data_version, timer.enabled
+        )
     with st.container():
-        for station in stations_options_selected:
-            create_metric_section(metrics, station, METRICS_STRINGS)
+        with timer.stage('metric_sections') as stage:
+            metric_cards: pl.DataFrame = load_metric_cards_frame(
+                tuple(stations_options_selected), data_version
+            )
+            create_metric_sections(metric_cards, METRICS_STRINGS)
+            stage['rows'] = metric_cards.height
         create_metrics_expander_info(
             num_days_value=NUM_DAYS_VAL, num_days_delta=NUM_DAYS_DELTA
         )
     st.caption(f'MeteoShrooms Version: {importlib.metadata.version("MeteoShrooms")}')
+    create_timing_panel(timer, get_figure_cache().stats())
 
 
 if __name__ == '__main__':
@@ -69,15 +92,4 @@ if __name__ == '__main__':
     root_logger: logging.Logger = logging.getLogger(__name__)
     root_logger.debug('Logger created')
 
-    # cProfile.run("main()", sort='ncalls')
-    # import cProfile
-    # from pstats import Stats
-    #
-    # pr = cProfile.Profile()
-    # pr.enable()
-
     main()
-
-    # pr.disable()
-    # stats = Stats(pr)
-    # stats.sort_stats('tottime').print_stats(10)
@@ -8,21 +8,56 @@ from plotly.graph_objs import Figure
 
 from meteoshrooms.dashboard.constants import WEATHER_SHORT_LABEL_DICT
 from meteoshrooms.dashboard.dashboard_utils import (
-    META_STATIONS,
-    create_station_frame_for_map,
+    get_figure_cache,
+    load_map_frames,
     update_selection,
 )
+from meteoshrooms.dashboard.instrumentation import RenderTimer
 from meteoshrooms.dashboard.log import init_logging
 
 init_logging(__name__)
 root_logger: logging.Logger = logging.getLogger(__name__)
 
 
-def create_map_section(
-    _metrics: pl.LazyFrame, param_short_code: str, time_period: int | None
+@st.fragment
+def create_map_fragment(
+    param_short_code: str,
+    time_period: int | None,
+    data_version: str,
+    timing_enabled: bool,
 ):
+    """Show the station map in a fragment, rerun on its own by map interactions
+
+    The map does not depend on the station selection. A click on the map only
+    reruns this fragment, unless it changes the station selection, which the
+    sidebar, the chart and the metric sections depend on. A fragment rerun
+    does not rerun the app, so the map is timed as a run of its own.
+    """
+    timer: RenderTimer = RenderTimer(timing_enabled)
+    with timer.stage('map') as stage:
+        stage['rows'] = create_map_section(param_short_code, time_period, data_version)
+    if timer.enabled:
+        st.caption(f'Map run {timer.run_id}: {stage["seconds"]:.3f} s')
+    if st.session_state.pop('stations_selection_changed', False):
+        st.rerun(scope='app')
+
+
+def create_map_section(
+    param_short_code: str,
+    time_period: int | None,
+    data_version: str,
+) -> int:
+    """Show the station map
+
+    Returns
+    -------
+        Number of stations on the map
+    """
     with st.container():
-        fig: Figure = draw_map(_metrics, param_short_code, time_period)
+        fig: Figure = get_figure_cache().get_or_create(
+            ('map', data_version, param_short_code, time_period),
+            lambda: draw_map(param_short_code, time_period, data_version),
+        )
         st.plotly_chart(
             fig,
             width='stretch',
@@ -31,14 +66,20 @@ def create_map_section(
         )
 
         root_logger.debug('map created')
+    return sum(
+        len(trace.hovertext) for trace in fig.data if trace.hovertext is not None
+    )
 
 
-@st.cache_data
-def draw_map(_metrics: pl.LazyFrame, param_short_code: str, time_period: int | None):
+def draw_map(
+    param_short_code: str,
+    time_period: int | None,
+    data_version: str,
+) -> Figure:
     if not time_period:
         time_period = 7
-    station_frame_for_map: pl.DataFrame = create_station_frame_for_map(
-        META_STATIONS, _metrics, time_period
+    station_frame_for_map: pl.DataFrame = load_map_frames(data_version).filter(
+        pl.col('time_period') == time_period
     )
     scatter_map_kwargs: dict[
         str, str | dict[str, bool] | list[str | Any] | int | None
@@ -6,51 +6,122 @@ import polars as pl
 import streamlit as st
 
 from meteoshrooms.constants import TIMEZONE_SWITZERLAND_STRING
-from meteoshrooms.dashboard.constants import WEATHER_SHORT_LABEL_DICT
-from meteoshrooms.dashboard.dashboard_utils import WEATHER_COLUMN_NAMES_DICT
+from meteoshrooms.dashboard.constants import (
+    CHART_ROLLUP_EVERY,
+    METRICS_STRINGS,
+    WEATHER_SHORT_LABEL_DICT,
+)
+from meteoshrooms.dashboard.dashboard_utils import (
+    get_figure_cache,
+    get_weather_column_names_dict,
+    scan_weather_rollup,
+)
+from meteoshrooms.data_preparation.categories import expr_is_in_categories
 from meteoshrooms.data_preparation.constants import EXPR_WEATHER_AGGREGATION_TYPES
 
 
+def expr_filter_chart_rows(
+    stations_options_selected: Sequence[str],
+    time_period: int,
+    station_name_dtype: pl.DataType,
+) -> pl.Expr:
+    return (
+        pl.col('reference_timestamp')
+        >= (
+            datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+            - timedelta(days=time_period)
+        )
+    ) & expr_is_in_categories(
+        'station_name', stations_options_selected, station_name_dtype
+    )
+
+
 def create_area_chart_frame(
     frame_weather: pl.LazyFrame,
     stations_options_selected: Sequence[str],
     time_period: int,
+    data_version: str,
+    frame_rollup: pl.LazyFrame | None = None,
 ) -> pl.LazyFrame:
-    return (
-        frame_weather.sort('reference_timestamp')
-        .filter(
-            (
-                pl.col('reference_timestamp')
-                >= (
-                    datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
-                    - timedelta(days=time_period)
+    """Create the area chart frame, sliced from the rollup if available
+
+    Parameters
+    ----------
+    frame_weather: pl.LazyFrame
+        Hourly weather data, resampled live if frame_rollup is None
+    stations_options_selected: Sequence[str]
+        Selected station names
+    time_period: int
+        Number of days to show
+    data_version: str
+        Version of the data files, naming the columns from its metadata
+    frame_rollup: pl.LazyFrame | None
+        Weather data precomputed into windows of CHART_ROLLUP_EVERY
+
+    Returns
+    -------
+        LazyFrame with one row per station and window
+    """
+    if frame_rollup is not None:
+        frame_chart: pl.LazyFrame = frame_rollup.filter(
+            expr_filter_chart_rows(
+                stations_options_selected,
+                time_period,
+                frame_rollup.collect_schema()['station_name'],
+            )
+        ).select('station_name', 'reference_timestamp', *METRICS_STRINGS)
+    else:
+        frame_chart = (
+            frame_weather.sort('reference_timestamp')
+            .filter(
+                expr_filter_chart_rows(
+                    stations_options_selected,
+                    time_period,
+                    frame_weather.collect_schema()['station_name'],
                 )
             )
-            & (pl.col('station_name').is_in(stations_options_selected))
+            .group_by_dynamic(
+                'reference_timestamp', every=CHART_ROLLUP_EVERY, group_by='station_name'
+            )
+            .agg(EXPR_WEATHER_AGGREGATION_TYPES)
         )
-        .group_by_dynamic('reference_timestamp', every='6h', group_by='station_name')
-        .agg(EXPR_WEATHER_AGGREGATION_TYPES)
-        .with_columns(pl.selectors.numeric().round(1))
-        .rename(WEATHER_COLUMN_NAMES_DICT)
+    return frame_chart.with_columns(pl.selectors.numeric().round(1)).rename(
+        get_weather_column_names_dict(data_version)
     )
 
 
-@st.cache_data
 def create_area_chart(
-    _df_weather: pl.LazyFrame,
+    df_weather: pl.LazyFrame,
     stations_options_selected: Sequence[str],
     time_period: int | None,
     param_short_code: str,
-):
+    data_version: str,
+) -> pl.DataFrame:
+    """Show the area chart of the selected stations
+
+    Returns
+    -------
+        Chart data, one row per station and window
+    """
     if not time_period:
         time_period: int = 7
+    stations: tuple[str, ...] = tuple(sorted(stations_options_selected))
+    frame_chart: pl.DataFrame = get_figure_cache().get_or_create(
+        ('area_chart', data_version, stations, time_period, param_short_code),
+        lambda: create_area_chart_frame(
+            df_weather,
+            stations,
+            time_period,
+            data_version,
+            scan_weather_rollup(CHART_ROLLUP_EVERY, data_version),
+        ).collect(),
+    )
     st.area_chart(
-        data=create_area_chart_frame(
-            _df_weather, stations_options_selected, time_period
-        ),
+        data=frame_chart,
         x='Time',
         y='Precipitation',
         color='Station',
         x_label='Time',
         y_label=f'{WEATHER_SHORT_LABEL_DICT[param_short_code]} (mm)',
     )
+    return frame_chart
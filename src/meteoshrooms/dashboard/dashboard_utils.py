@@ -8,31 +8,107 @@ import streamlit as st
 
 from meteoshrooms.constants import (
     DATA_PATH,
+    MAP_FRAMES_FILE_NAME,
+    METRICS_IPC_FILE_NAME,
     TIMEZONE_SWITZERLAND_STRING,
+    WEATHER_FILE_NAME,
+    WEATHER_IPC_FILE_NAME,
+    WEATHER_ROLLUP_FILE_NAMES,
+    WEATHER_ROLLUP_IPC_FILE_NAMES,
+    WEATHER_STORE_PATH,
     parameter_description_extraction_pattern,
 )
 from meteoshrooms.dashboard.constants import (
-    COLUMNS_FOR_MAP_FRAME,
     METRICS_STRINGS,
+    SHARED_DATA_MAX_VERSIONS,
     SIDEBAR_MAX_SELECTIONS,
     WEATHER_SHORT_LABEL_DICT,
 )
+from meteoshrooms.dashboard.data_version import DataVersionWatcher
+from meteoshrooms.dashboard.figure_cache import FigureCache
 from meteoshrooms.dashboard.log import init_logging
+from meteoshrooms.data_preparation.categories import (
+    create_category_schema,
+    encode_categories,
+)
+from meteoshrooms.data_preparation.fixed_point import (
+    group_fixed_point_files,
+    scan_fixed_point_groups,
+)
+from meteoshrooms.data_preparation.manifest import read_manifest
+from meteoshrooms.data_preparation.map_frames import create_map_frames, pivot_metrics
+from meteoshrooms.data_preparation.weather_store import (
+    list_partition_files,
+)
 
 init_logging(__name__)
 root_logger: logging.Logger = logging.getLogger(__name__)
 
 
-@st.cache_data
-def load_metadata_to_frame(meta_type: str) -> pl.DataFrame:
+@st.cache_resource(max_entries=SHARED_DATA_MAX_VERSIONS)
+def load_manifest(data_version: str) -> dict[str, Any] | None:
+    """Load the manifest of data_version, never the one of another version
+
+    Parameters
+    ----------
+    data_version: str
+        Version of the data files
+
+    Returns
+    -------
+        Manifest or None if the data files are not published with manifests
+    """
+    manifest: dict[str, Any] | None = read_manifest(DATA_PATH)
+    if manifest is None or manifest['version'] == data_version:
+        return manifest
+    manifest = read_manifest(DATA_PATH, data_version)
+    if manifest is None:
+        raise FileNotFoundError(f'manifest of data version {data_version} removed')
+    return manifest
+
+
+def resolve_data_path(file_name: str, data_version: str) -> Path | None:
+    """Resolve a data file through the manifest of the published version
+
+    Without manifest, the file is looked up directly in the data directory.
+
+    Parameters
+    ----------
+    file_name: str
+        File name, e.g. 'metrics.parquet'
+    data_version: str
+        Version of the data files
+
+    Returns
+    -------
+        Path of the file or None if the version does not contain it
+    """
+    manifest: dict[str, Any] | None = load_manifest(data_version)
+    if manifest is None:
+        file_path: Path = Path(DATA_PATH, file_name)
+        return file_path if file_path.exists() else None
+    if file_name not in manifest['files']:
+        return None
+    return Path(DATA_PATH, manifest['files'][file_name])
+
+
+@st.cache_resource(max_entries=2 * SHARED_DATA_MAX_VERSIONS)
+def load_metadata_to_frame(meta_type: str, data_version: str) -> pl.DataFrame:
     """Load metadata
 
+    Parameters
+    ----------
+    meta_type: str
+        Metadata type, one of 'parameters' or 'stations'
+    data_version: str
+        Version of the data files, only used as cache key
+
     Returns
     -------
         Metadata in Polars DataFrame
     """
     return pl.read_parquet(
-        Path(DATA_PATH, f'meta_{meta_type.lower()}.parquet')
+        resolve_data_path(f'meta_{meta_type.lower()}.parquet', data_version)
     ).unique()
 
 
@@ -73,58 +149,164 @@ def create_stations_options_selected(station_name_list) -> list:
     )
 
 
-@st.cache_data
-def create_station_names(_frame_with_stations: pl.LazyFrame) -> tuple[str, ...]:
+@st.cache_resource(max_entries=SHARED_DATA_MAX_VERSIONS)
+def create_station_names(
+    _frame_with_stations: pl.LazyFrame, data_version: str
+) -> tuple[str, ...]:
     return tuple(
-        _frame_with_stations.unique(subset=('station_name',))
+        _frame_with_stations.select(pl.col('station_name').cast(pl.String))
+        .unique()
         .sort('station_name')
-        .select('station_name')
         .collect()
         .to_series()
         .to_list()
     )
 
 
-@st.cache_data
-def create_station_frame_for_map(
-    _frame_with_stations: pl.LazyFrame, _metrics: pl.LazyFrame, time_period: int
-) -> pl.DataFrame:
+@st.cache_resource(max_entries=SHARED_DATA_MAX_VERSIONS)
+def load_map_frames(data_version: str) -> pl.DataFrame:
+    """Load the map frames written by the data preparation
+
+    Data preparations without map frames fall back to joining stations and
+    metrics here, once per data version.
+
+    Parameters
+    ----------
+    data_version: str
+        Version of the data files
+
+    Returns
+    -------
+        Stations with metric columns labelled for the map, one row per time period
+    """
+    file_path: Path | None = resolve_data_path(MAP_FRAMES_FILE_NAME, data_version)
     return (
-        _frame_with_stations.with_columns(
-            pl.col('station_type_en').alias('Station Type'),
-            pl.col('station_abbr').alias('Short Code'),
-            Altitude=pl.col('station_height_masl')
-            .cast(pl.Int16)
-            .cast(pl.String)
-            .add(' m.a.s.l'),
+        pl.read_parquet(file_path)
+        if file_path is not None
+        else create_map_frames(
+            load_metadata_to_frame('stations', data_version).lazy(),
+            load_metric_data(data_version).lazy(),
+        ).collect()
+    ).rename(WEATHER_SHORT_LABEL_DICT, strict=False)
+
+
+def scan_ipc_snapshot(file_name: str, data_version: str) -> pl.LazyFrame | None:
+    """Scan an Arrow IPC snapshot memory-mapped, zero-copy
+
+    Returns
+    -------
+        Polars LazyFrame or None if the data preparation has not written it
+    """
+    file_path: Path | None = resolve_data_path(file_name, data_version)
+    if file_path is None:
+        return None
+    return pl.scan_ipc(file_path, memory_map=True)
+
+
+@st.cache_resource(max_entries=SHARED_DATA_MAX_VERSIONS)
+def load_weather_file_groups(
+    data_version: str,
+) -> dict[tuple[tuple[str, int], ...], list[Path]] | None:
+    """Group the weather files of a version by their fixed-point encoding
+
+    The encoding is read from the manifest, or once per version from the Parquet
+    metadata of manifests and stores that predate it, never on every rerun.
+
+    Returns
+    -------
+        Weather files per encoding, see group_fixed_point_files, or None if the
+        version has no weather files
+    """
+    manifest: dict[str, Any] | None = load_manifest(data_version)
+    if manifest is not None and manifest['weather_files']:
+        return group_fixed_point_files(
+            [Path(DATA_PATH, file_path) for file_path in manifest['weather_files']],
+            {
+                Path(DATA_PATH, file_path): decimals_encoded
+                for file_path, decimals_encoded in manifest[
+                    'fixed_point_decimals'
+                ].items()
+            }
+            if 'fixed_point_decimals' in manifest
+            else None,
         )
-        .select(pl.col(COLUMNS_FOR_MAP_FRAME))
-        .join(
-            _metrics.filter(pl.col('time_period') == time_period),
-            left_on='Short Code',
-            right_on='station_abbr',
+    file_paths: list[Path] = list_partition_files(WEATHER_STORE_PATH)
+    return group_fixed_point_files(file_paths) if file_paths else None
+
+
+def scan_weather_data(data_version: str) -> pl.LazyFrame:
+    """Scan weather data, so that filters on stations and time are pushed down
+
+    The IPC snapshot is preferred, then the weather files of the manifest. Without
+    manifest, the weather store and finally the single Parquet file of older data
+    preparations are scanned.
+
+    Returns
+    -------
+        Polars LazyFrame, only reading the row groups matching later filters
+    """
+    weather: pl.LazyFrame | None = scan_ipc_snapshot(
+        WEATHER_IPC_FILE_NAME, data_version
+    )
+    if weather is None:
+        weather_file_groups: dict[tuple[tuple[str, int], ...], list[Path]] | None = (
+            load_weather_file_groups(data_version)
+        )
+        weather = (
+            scan_fixed_point_groups(weather_file_groups)
+            if weather_file_groups is not None
+            else pl.scan_parquet(Path(DATA_PATH, WEATHER_FILE_NAME))
+        )
+    return weather.with_columns(
+        pl.col('reference_timestamp').dt.replace_time_zone(
+            TIMEZONE_SWITZERLAND_STRING, non_existent='null'
         )
-        .rename(WEATHER_SHORT_LABEL_DICT)
-        .collect()
     )
 
 
-@st.cache_data
-def load_weather_data() -> pl.DataFrame:
-    return pl.read_parquet(Path(DATA_PATH, 'weather_data.parquet')).with_columns(
+def scan_weather_rollup(every: str, data_version: str) -> pl.LazyFrame | None:
+    """Scan weather data precomputed into windows of length every
+
+    The IPC snapshot is preferred over the Parquet file.
+
+    Returns
+    -------
+        Polars LazyFrame or None if the data preparation has not written it
+    """
+    rollup: pl.LazyFrame | None = scan_ipc_snapshot(
+        WEATHER_ROLLUP_IPC_FILE_NAMES[every], data_version
+    )
+    file_path: Path | None = resolve_data_path(
+        WEATHER_ROLLUP_FILE_NAMES[every], data_version
+    )
+    if rollup is None and file_path is not None:
+        rollup = pl.scan_parquet(file_path)
+    if rollup is None:
+        return None
+    return rollup.with_columns(
         pl.col('reference_timestamp').dt.replace_time_zone(
             TIMEZONE_SWITZERLAND_STRING, non_existent='null'
         )
     )
 
 
-@st.cache_data
-def load_metric_data() -> pl.DataFrame:
-    return pl.read_parquet(Path(DATA_PATH, 'metrics.parquet')).pivot(
-        'parameter',
-        index=('station_abbr', 'station_name', 'time_period'),
-        values='value',
+@st.cache_resource(max_entries=SHARED_DATA_MAX_VERSIONS)
+def load_category_schema(data_version: str) -> dict[str, pl.Enum]:
+    """Create the Enum of every identifier column from the metadata of a version"""
+    return create_category_schema(
+        load_metadata_to_frame('stations', data_version),
+        load_metadata_to_frame('parameters', data_version),
+    )
+
+
+@st.cache_resource(max_entries=SHARED_DATA_MAX_VERSIONS)
+def load_metric_data(data_version: str) -> pl.DataFrame:
+    metrics: pl.LazyFrame | None = scan_ipc_snapshot(
+        METRICS_IPC_FILE_NAME, data_version
     )
+    if metrics is None:
+        metrics = pl.scan_parquet(resolve_data_path('metrics.parquet', data_version))
+    return pivot_metrics(encode_categories(metrics, load_category_schema(data_version)))
 
 
 @st.cache_data
@@ -132,14 +314,82 @@ def create_metrics_names_dict(meta_params_df: pl.DataFrame) -> dict[str, str]:
     return {m: create_meta_map(meta_params_df).get(m, '') for m in METRICS_STRINGS}
 
 
-META_PARAMETERS: pl.DataFrame = load_metadata_to_frame('parameters')
+def clear_shared_data():
+    """Drop the shared frames of all data versions
 
-META_STATIONS: pl.LazyFrame = load_metadata_to_frame('stations').lazy()
+    Sessions keep the frames they already hold, as the frames are never mutated.
+    """
+    for load_shared in (
+        load_manifest,
+        load_metadata_to_frame,
+        create_station_names,
+        load_map_frames,
+        load_category_schema,
+        load_metric_data,
+        load_weather_file_groups,
+    ):
+        load_shared.clear()
 
-METRICS_NAMES_DICT: dict[str, str] = create_metrics_names_dict(META_PARAMETERS)
-WEATHER_COLUMN_NAMES_DICT: dict[str, str] = dict(
-    {'reference_timestamp': 'Time', 'station_name': 'Station'} | METRICS_NAMES_DICT
-)
+
+def drop_data_version(data_version: str):
+    """Drop the shared frames of a superseded data version
+
+    Called once the next version is published, so no new run requests them.
+    """
+    load_manifest.clear(data_version)
+    for meta_type in ('parameters', 'stations'):
+        load_metadata_to_frame.clear(meta_type, data_version)
+    create_station_names.clear(None, data_version)
+    load_map_frames.clear(data_version)
+    load_category_schema.clear(data_version)
+    load_metric_data.clear(data_version)
+    load_weather_file_groups.clear(data_version)
+
+
+def warm_data_caches(data_version: str):
+    """Load the shared frames of a new data version next to the current ones
+
+    Sessions still on the current version keep hitting its entries until the new
+    version is published, max_entries bounds the memory of both.
+    """
+    load_manifest(data_version)
+    for meta_type in ('parameters', 'stations'):
+        load_metadata_to_frame(meta_type, data_version)
+    load_metric_data(data_version)
+    load_map_frames(data_version)
+
+
+@st.cache_resource
+def get_data_version_watcher() -> DataVersionWatcher:
+    """Start the watcher that hot-reloads new data files, once per process"""
+    return DataVersionWatcher(warm_data_caches, on_published=drop_data_version).start()
+
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    """Create the cache of figures and chart data shared by all sessions"""
+    return FigureCache()
+
+
+def get_data_version() -> str:
+    return get_data_version_watcher().version
+
+
+def get_meta_parameters() -> pl.DataFrame:
+    return load_metadata_to_frame('parameters', get_data_version())
+
+
+def get_meta_stations() -> pl.LazyFrame:
+    return load_metadata_to_frame('stations', get_data_version()).lazy()
+
+
+def get_weather_column_names_dict(data_version: str | None = None) -> dict[str, str]:
+    return {
+        'reference_timestamp': 'Time',
+        'station_name': 'Station',
+    } | create_metrics_names_dict(
+        load_metadata_to_frame('parameters', data_version or get_data_version())
+    )
 
 
 def update_selection():
@@ -162,6 +412,7 @@ def update_selection():
                 for pt in new_selection
             ):
                 root_logger.debug(new_selection)
+                st.session_state.stations_selection_changed = True
                 st.session_state.stations_options_multiselect = sorted(
                     st.session_state.stations_options_multiselect
                     + list(
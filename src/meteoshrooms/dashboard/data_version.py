@@ -0,0 +1,123 @@
+"""Detect new data files written by the data preparation while the dashboard runs"""
+
+import hashlib
+import logging
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from meteoshrooms.constants import DATA_PATH
+from meteoshrooms.dashboard.constants import (
+    DATA_FILE_PATTERNS,
+    DATA_VERSION_POLL_SECONDS,
+)
+from meteoshrooms.data_preparation.manifest import read_manifest
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def read_data_version(data_path: Path = DATA_PATH) -> str:
+    """Read the version of the published manifest
+
+    Without manifest, the version is derived from name, size and mtime of all data
+    files. Either way no data file is opened, so this is cheap enough to be polled.
+
+    Parameters
+    ----------
+    data_path: Path
+        Data directory, searched recursively
+
+    Returns
+    -------
+        Version string, changing whenever a data file is written or removed
+    """
+    manifest: dict | None = read_manifest(data_path)
+    if manifest is not None:
+        return manifest['version']
+    sha256 = hashlib.sha256()
+    for file_path in sorted(
+        file_path
+        for pattern in DATA_FILE_PATTERNS
+        for file_path in data_path.rglob(pattern)
+    ):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue
+        sha256.update(
+            f'{file_path.relative_to(data_path)}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode()
+        )
+    return sha256.hexdigest()[:16]
+
+
+class DataVersionWatcher:
+    """Poll the data version in a background thread and publish changes
+
+    A new version is only published once on_change has returned, which is used to
+    load the new data into the caches. Sessions keep using the data of the
+    previous version until then, so they never wait for the reload. Only after
+    publishing is on_published called, to release the previous version.
+
+    Parameters
+    ----------
+    on_change: Callable[[str], None]
+        Called in the background thread with a new version before it is published
+    data_path: Path
+        Data directory
+    poll_seconds: float
+        Interval between two checks of the data version
+    on_published: Callable[[str], None] | None
+        Called in the background thread with the superseded version after a new
+        version is published
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[str], None],
+        data_path: Path = DATA_PATH,
+        poll_seconds: float = DATA_VERSION_POLL_SECONDS,
+        on_published: Callable[[str], None] | None = None,
+    ):
+        self.on_change: Callable[[str], None] = on_change
+        self.on_published: Callable[[str], None] | None = on_published
+        self.data_path: Path = data_path
+        self.poll_seconds: float = poll_seconds
+        self.version: str = read_data_version(data_path)
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run, name='data-version-watcher', daemon=True
+        )
+
+    def start(self) -> 'DataVersionWatcher':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def poll(self) -> bool:
+        """Check the data version once, publishing it after on_change if new
+
+        Returns
+        -------
+            Whether a new version has been published
+        """
+        version: str = read_data_version(self.data_path)
+        if version == self.version:
+            return False
+        logger.debug(f'data version {self.version} changed to {version}')
+        self.on_change(version)
+        version_superseded: str = self.version
+        self.version = version
+        if self.on_published is not None:
+            self.on_published(version_superseded)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('reloading data failed, keeping current version')
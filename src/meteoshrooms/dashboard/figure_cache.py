@@ -0,0 +1,134 @@
+"""Figures and chart data shared by all sessions of one dashboard server
+
+Entries are keyed explicitly, e.g. by data version, stations, time period and
+parameter, so no argument escapes the key like the unhashed arguments of
+st.cache_data. Memory is bounded by the number of entries and their estimated
+size, and the least recently used entries are evicted first.
+"""
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+import polars as pl
+from plotly.graph_objs import Figure
+
+from meteoshrooms.dashboard.constants import (
+    FIGURE_CACHE_MAX_BYTES,
+    FIGURE_CACHE_MAX_ENTRIES,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory held by a cached value in bytes"""
+    if isinstance(value, pl.DataFrame):
+        return value.estimated_size()
+    if isinstance(value, Figure):
+        return len(value.to_json())
+    return sys.getsizeof(value)
+
+
+class FigureCache:
+    """Thread-safe LRU cache with hit and miss counters
+
+    Values are created outside the lock, so a slow miss never blocks hits of
+    other sessions. Two sessions missing the same key at once both create the
+    value, and the last one is kept.
+
+    Parameters
+    ----------
+    max_entries: int
+        Maximum number of entries
+    max_bytes: int
+        Maximum estimated size of all entries, larger values are not cached
+    """
+
+    def __init__(
+        self,
+        max_entries: int = FIGURE_CACHE_MAX_ENTRIES,
+        max_bytes: int = FIGURE_CACHE_MAX_BYTES,
+    ):
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self.num_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get_or_create(
+        self,
+        key: Hashable,
+        create: Callable[[], Any],
+        size: Callable[[Any], int] = estimate_size,
+    ) -> Any:
+        """Return the value of key, creating and caching it on a miss
+
+        Parameters
+        ----------
+        key: Hashable
+            Key of the value, must contain everything the value depends on
+        create: Callable[[], Any]
+            Creates the value on a miss
+        size: Callable[[Any], int]
+            Estimates the size of the value in bytes
+
+        Returns
+        -------
+            Cached or newly created value
+        """
+        with self._lock:
+            entry: tuple[Any, int] | None = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value: Any = create()
+        value_size: int = size(value)
+        if value_size > self.max_bytes:
+            logger.debug(f'{key} not cached, {value_size} bytes exceed the maximum')
+            return value
+        with self._lock:
+            previous: tuple[Any, int] | None = self._entries.pop(key, None)
+            if previous is not None:
+                self.num_bytes -= previous[1]
+            self._entries[key] = (value, value_size)
+            self.num_bytes += value_size
+            self._evict()
+        logger.debug(f'{key} cached, {self.stats()}')
+        return value
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self.num_bytes > self.max_bytes:
+            _, (_, value_size) = self._entries.popitem(last=False)
+            self.num_bytes -= value_size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Counters and size of the cache, e.g. for logging"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.num_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
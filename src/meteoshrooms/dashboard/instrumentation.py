@@ -0,0 +1,86 @@
+"""Wall time and row counts of the stages of a dashboard run
+
+Enabled with the --debug flag. Every timed stage is logged as a JSON line and
+listed in a sidebar panel, so slow reruns can be traced to a single widget.
+"""
+
+import logging
+import time
+import uuid
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from typing import Any
+
+import polars as pl
+import streamlit as st
+
+from meteoshrooms.dashboard.log import init_structured_logging
+
+TIMING_LOGGER_NAME: str = 'meteoshrooms.dashboard.timing'
+
+init_structured_logging(TIMING_LOGGER_NAME)
+timing_logger: logging.Logger = logging.getLogger(TIMING_LOGGER_NAME)
+
+
+class RenderTimer:
+    """Time the stages of one dashboard run
+
+    Parameters
+    ----------
+    enabled: bool
+        Whether stages are recorded and logged, a disabled timer only yields
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled: bool = enabled
+        self.run_id: str = uuid.uuid4().hex[:8]
+        self.stages: list[dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict[str, Any]]:
+        """Time the enclosed block as stage name
+
+        Parameters
+        ----------
+        name: str
+            Stage name, e.g. 'map'
+
+        Yields
+        ------
+            Record of the stage, set its 'rows' to the number of rows processed
+        """
+        record: dict[str, Any] = {'stage': name, 'rows': None}
+        start: float = time.perf_counter()
+        try:
+            yield record
+        finally:
+            if self.enabled:
+                record['seconds'] = time.perf_counter() - start
+                self.stages.append(record)
+                timing_logger.debug(
+                    'stage timed', extra={'fields': {'run': self.run_id} | record}
+                )
+
+    def to_frame(self) -> pl.DataFrame:
+        return pl.DataFrame(
+            self.stages,
+            schema={'stage': pl.String, 'rows': pl.Int64, 'seconds': pl.Float64},
+        )
+
+
+def create_timing_panel(timer: RenderTimer, cache_stats: Mapping[str, int]):
+    """Show the stage timings of the current run and the figure cache counters"""
+    if not timer.enabled:
+        return
+    frame_timings: pl.DataFrame = timer.to_frame()
+    with st.sidebar.expander('Performance'):
+        st.caption(
+            f'Run {timer.run_id}: {frame_timings.get_column("seconds").sum():.3f} s'
+        )
+        st.dataframe(
+            frame_timings.with_columns(pl.col('seconds').round(4)), hide_index=True
+        )
+        st.caption(
+            'Figure cache: '
+            + ', '.join(f'{name} {value}' for name, value in cache_stats.items())
+        )
@@ -1,17 +1,43 @@
+import json
 import logging
 
 from meteoshrooms.dashboard import settings
 
 
-def init_logging(name):
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including the fields of extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                'time': self.formatTime(record),
+                'logger': record.name,
+                'level': record.levelname,
+                'message': record.getMessage(),
+            }
+            | getattr(record, 'fields', {}),
+            default=str,
+        )
+
+
+def init_logging(name, formatter: logging.Formatter | None = None):
     root_logger = logging.getLogger(name)
     if root_logger.handlers:  # logger is already setup, don't setup again
         return
     root_logger.propagate = True
     log_level = logging.DEBUG if settings.get_args().debug else logging.WARNING
     root_logger.setLevel(log_level)
-    formatter = logging.Formatter('%(name)s %(asctime)s %(levelname)s - %(message)s')
+    if formatter is None:
+        formatter = logging.Formatter(
+            '%(name)s %(asctime)s %(levelname)s - %(message)s'
+        )
     handler = logging.StreamHandler()
     handler.setLevel(log_level)
     handler.setFormatter(formatter)
     root_logger.addHandler(handler)
+
+
+def init_structured_logging(name):
+    """Set up a logger writing JSON lines, e.g. for ingestion by a log collector"""
+    init_logging(name, JsonFormatter())
+    logging.getLogger(name).propagate = False
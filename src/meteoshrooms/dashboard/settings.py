@@ -5,4 +5,4 @@ parser.add_argument('-d', '--debug', action='store_true')
 
 
 def get_args():
-    return parser.parse_args()
+    return parser.parse_known_args()[0]
@@ -1,22 +1,24 @@
 """Provide static data for the MeteoShrooms dashboard ui"""
 
-from typing import Sequence
+from typing import Mapping, Sequence
 
 import polars as pl
 import streamlit as st
-from polars import LazyFrame
 from streamlit.delta_generator import DeltaGenerator
 
 from meteoshrooms.dashboard.constants import (
+    METRICS_STRINGS,
     NUM_DAYS_DELTA,
     NUM_DAYS_VAL,
     PARAMETER_AGGREGATION_TYPES,
     WEATHER_SHORT_LABEL_DICT,
 )
 from meteoshrooms.dashboard.dashboard_utils import (
-    META_PARAMETERS,
-    WEATHER_COLUMN_NAMES_DICT,
+    get_weather_column_names_dict,
+    load_metadata_to_frame,
+    load_metric_data,
 )
+from meteoshrooms.data_preparation.categories import expr_is_in_categories
 
 
 def get_metric_emoji(val: float) -> str:
@@ -62,101 +64,169 @@ def create_metrics_expander_info(num_days_value: float, num_days_delta: float):
         st.info('Data Sources: MeteoSwiss')
 
 
-def create_metric_tooltip_string(metric_name: str) -> str:
-    return f'{WEATHER_COLUMN_NAMES_DICT[metric_name]} in {META_PARAMETERS.filter(pl.col("parameter_shortname") == metric_name).select("parameter_unit").item()}'
+def expr_metric_emoji(col_name: str) -> pl.Expr:
+    """Vectorized get_metric_emoji, null for negative values"""
+    return (
+        pl.when(pl.col(col_name) < 0)
+        .then(pl.lit(None, dtype=pl.String))
+        .when(pl.col(col_name) < 1)
+        .then(pl.lit('☀️'))
+        .when(pl.col(col_name) < 10)
+        .then(pl.lit('🌦️'))
+        .when(pl.col(col_name) < 20)
+        .then(pl.lit('🌧️'))
+        .when(pl.col(col_name) < 50)
+        .then(pl.lit('🌊'))
+        .otherwise(pl.lit('🌧️🌊'))
+    )
 
 
-def create_metric_kwargs(metric_name) -> dict[str, bool | str]:
-    return {
-        'border': True,
-        'help': create_metric_tooltip_string(metric_name),
-        'height': 'stretch',
-    }
+def create_metric_cards_frame(
+    metrics: pl.DataFrame,
+    meta_parameters: pl.DataFrame,
+    station_names: Sequence[str],
+    metrics_list: Sequence[str],
+    metric_names: Mapping[str, str],
+) -> pl.DataFrame:
+    """Compute the metric cards of all selected stations in one pass
 
+    Parameters
+    ----------
+    metrics: pl.DataFrame
+        Metrics with one row per station and time period, one column per metric
+    meta_parameters: pl.DataFrame
+        Parameter metadata with the unit of every metric
+    station_names: Sequence[str]
+        Selected station names, in the order of their sections
+    metrics_list: Sequence[str]
+        Metric short codes, in the order of the cards
+    metric_names: Mapping[str, str]
+        Long name of every metric, used in the tooltip
 
-def filter_metrics_time_period(
-    metrics: pl.LazyFrame, station_name: str, number_days: int, metric_short_code: str
-) -> pl.LazyFrame | None:
-    return (
-        metrics.filter(
-            (pl.col('station_name') == station_name)
-            & (pl.col('time_period') == number_days)
-        ).select(pl.col(metric_short_code))
-        if metrics.select(pl.len()).collect().item() > 0
-        else None
+    Returns
+    -------
+        One row per station and metric with label, value string, delta and tooltip,
+        the value string is '-' and the delta null if the value is missing
+    """
+    values: pl.LazyFrame = (
+        metrics.lazy()
+        .filter(
+            expr_is_in_categories(
+                'station_name', station_names, metrics.schema['station_name']
+            )
+            & pl.col('time_period').is_in((NUM_DAYS_VAL, NUM_DAYS_DELTA))
+        )
+        .unpivot(
+            on=metrics_list,
+            index=('station_name', 'time_period'),
+            variable_name='parameter',
+        )
+        .with_columns(
+            pl.when(pl.col('parameter').is_in(PARAMETER_AGGREGATION_TYPES['sum']))
+            .then(pl.col('value').cast(pl.Float64) / pl.col('time_period'))
+            .otherwise(pl.col('value').cast(pl.Float64))
+            .alias('value')
+        )
+        .group_by('station_name', 'parameter')
+        .agg(
+            pl.col('value').filter(pl.col('time_period') == NUM_DAYS_VAL).first(),
+            pl.col('value')
+            .filter(pl.col('time_period') == NUM_DAYS_DELTA)
+            .first()
+            .alias('value_delta'),
+        )
+        .with_columns(pl.col('station_name').cast(pl.String))
     )
-
-
-def calculate_metric_value(
-    metrics: pl.LazyFrame, metric_name: str, station_name: str, number_days: int
-) -> float | None:
-    try:
-        df_filtered: LazyFrame | None = filter_metrics_time_period(
-            metrics, station_name, number_days, metric_name
+    units: pl.LazyFrame = (
+        meta_parameters.lazy()
+        .select(pl.col('parameter_shortname').alias('parameter'), 'parameter_unit')
+        .unique('parameter')
+    )
+    return (
+        pl.LazyFrame(
+            {'station_name': station_names}, schema={'station_name': pl.String}
         )
-        if df_filtered is not None:
-            if metric_name in PARAMETER_AGGREGATION_TYPES['sum']:
-                df_filtered = df_filtered.select(pl.col(metric_name) / number_days)
-            return df_filtered.collect().item()
-        return None
-    except ValueError:
-        # If a station has data missing, return None
-        return None
-
-
-def create_metric_section(
-    metrics: pl.LazyFrame, station_name: str, metrics_list: Sequence[str]
-):
-    st.subheader(station_name)
-
-    cols_metric: list[DeltaGenerator] = st.columns(len(metrics_list))
-    for col, metric_name in zip(
-        cols_metric,
-        metrics_list,
-        strict=False,
-    ):
-        val: float | None = calculate_metric_value(
-            metrics, metric_name, station_name, number_days=NUM_DAYS_VAL
+        .join(
+            pl.LazyFrame({'parameter': metrics_list}, schema={'parameter': pl.String}),
+            how='cross',
         )
-
-        metric_label: str = WEATHER_SHORT_LABEL_DICT[metric_name]
-        if val is not None:
-            delta: str | None = calculate_metric_delta(
-                metric_name, metrics, station_name, val
-            )
-            col.metric(
-                label=metric_label,
-                value=convert_metric_value_to_string_for_metric_section(
-                    metric_name, val
-                ),
-                delta=delta,
-                **create_metric_kwargs(metric_name),
+        .join(
+            values, on=('station_name', 'parameter'), how='left', maintain_order='left'
+        )
+        .join(units, on='parameter', how='left', maintain_order='left')
+        .select(
+            'station_name',
+            'parameter',
+            pl.col('parameter')
+            .replace_strict(WEATHER_SHORT_LABEL_DICT, return_dtype=pl.String)
+            .alias('label'),
+            'value',
+            pl.when(pl.col('value').is_null())
+            .then(pl.lit('-'))
+            .otherwise(
+                pl.concat_str(
+                    pl.col('value').round(1).cast(pl.String),
+                    pl.lit(' '),
+                    pl.when(pl.col('parameter') == 'rre150h0')
+                    .then(expr_metric_emoji('value'))
+                    .otherwise(pl.lit('')),
+                )
             )
-        else:
-            col.metric(
-                label=metric_label, value='-', **create_metric_kwargs(metric_name)
+            .alias('value_string'),
+            pl.when(pl.col('value').is_null())
+            .then(pl.lit(None, dtype=pl.String))
+            .when(pl.col('value_delta').is_null() | (pl.col('value_delta') == 0))
+            .then(pl.lit('-'))
+            .otherwise(
+                (pl.col('value') - pl.col('value_delta')).round(1).cast(pl.String)
             )
+            .alias('delta'),
+            pl.concat_str(
+                pl.col('parameter').replace_strict(metric_names, default=''),
+                pl.lit(' in '),
+                pl.col('parameter_unit'),
+            ).alias('help'),
+        )
+        .collect()
+    )
 
 
-def calculate_metric_delta(
-    metric_name: str, metrics: pl.LazyFrame, station_name: str, val: float
-) -> str:
-    val_delta: float | None = calculate_metric_value(
-        metrics, metric_name, station_name, number_days=NUM_DAYS_DELTA
+@st.cache_resource(max_entries=16)
+def load_metric_cards_frame(
+    station_names: tuple[str, ...], data_version: str
+) -> pl.DataFrame:
+    return create_metric_cards_frame(
+        load_metric_data(data_version),
+        load_metadata_to_frame('parameters', data_version),
+        station_names,
+        METRICS_STRINGS,
+        get_weather_column_names_dict(data_version),
     )
-    if val_delta:
-        return str(
-            round(val - val_delta, 1),
-        )
-    return '-'
 
 
-def convert_metric_value_to_string_for_metric_section(
-    metric_name: str, val: float
-) -> str:
-    return ' '.join(
-        (
-            str(round(val, 1)),
-            (get_metric_emoji(val) if metric_name == 'rre150h0' else ''),
-        )
-    )
+def create_metric_sections(metric_cards: pl.DataFrame, metrics_list: Sequence[str]):
+    """Lay out one section of metric cards per station
+
+    Parameters
+    ----------
+    metric_cards: pl.DataFrame
+        Metric cards, see create_metric_cards_frame
+    metrics_list: Sequence[str]
+        Metric short codes, one column each
+    """
+    for (station_name,), station_cards in metric_cards.group_by(
+        'station_name', maintain_order=True
+    ):
+        st.subheader(station_name)
+        cols_metric: list[DeltaGenerator] = st.columns(len(metrics_list))
+        for col, card in zip(
+            cols_metric, station_cards.iter_rows(named=True), strict=False
+        ):
+            col.metric(
+                label=card['label'],
+                value=card['value_string'],
+                delta=card['delta'],
+                border=True,
+                help=card['help'],
+                height='stretch',
+            )
@@ -0,0 +1,143 @@
+"""Enum dictionaries of station and parameter identifiers
+
+The categories are built from the station and parameter metadata, so every frame
+of a data version encodes its identifiers with the same integer codes. Filters
+and joins then compare codes instead of strings, and each identifier is stored
+once per frame instead of once per row.
+
+Only the IPC snapshots and the frames the dashboard loads are encoded. Parquet
+files keep strings: polars writes the full category range of an Enum column as
+the statistics of every row group, so filters could not skip any of them. The
+weather store and the daily partials are also updated across runs with possibly
+different stations, and scans over files with different Enum categories fail.
+"""
+
+from collections.abc import Iterable, Mapping, Sequence
+
+import polars as pl
+
+from meteoshrooms.data_preparation.constants import PARAMETER_AGGREGATION_TYPES
+
+AGGREGATION_TYPE_ENUM: pl.Enum = pl.Enum(PARAMETER_AGGREGATION_TYPES.keys())
+
+
+def create_enum(values: Iterable[str | None]) -> pl.Enum:
+    """Create an Enum of the distinct values, sorted so codes sort like strings"""
+    return pl.Enum(sorted({value for value in values if value is not None}))
+
+
+def create_category_schema(
+    meta_stations: pl.DataFrame, meta_parameters: pl.DataFrame
+) -> dict[str, pl.Enum]:
+    """Create the Enum of every identifier column from the metadata
+
+    Parameters
+    ----------
+    meta_stations: pl.DataFrame
+        Station metadata
+    meta_parameters: pl.DataFrame
+        Parameter metadata
+
+    Returns
+    -------
+        Enum per column name
+    """
+    return {
+        'station_abbr': create_enum(meta_stations.get_column('station_abbr')),
+        'station_name': create_enum(meta_stations.get_column('station_name')),
+        'parameter': create_enum(meta_parameters.get_column('parameter_shortname')),
+        'type': AGGREGATION_TYPE_ENUM,
+    }
+
+
+def cast_categories[FrameT: (pl.DataFrame, pl.LazyFrame)](
+    frame: FrameT, category_schema: Mapping[str, pl.Enum]
+) -> FrameT:
+    """Cast the identifier columns present in frame to their Enum
+
+    Casting fails on values missing from the metadata, instead of silently
+    turning them into nulls.
+
+    Parameters
+    ----------
+    frame: pl.DataFrame | pl.LazyFrame
+        Frame with identifier columns as String or Enum
+    category_schema: Mapping[str, pl.Enum]
+        Enum per column name, see create_category_schema
+
+    Returns
+    -------
+        Frame with Enum identifier columns
+    """
+    column_names: list[str] = frame.collect_schema().names()
+    return frame.with_columns(
+        pl.col(column_name).cast(dtype)
+        for column_name, dtype in category_schema.items()
+        if column_name in column_names
+    )
+
+
+def filter_categories[FrameT: (pl.DataFrame, pl.LazyFrame)](
+    frame: FrameT, category_schema: Mapping[str, pl.Enum]
+) -> FrameT:
+    """Keep the rows whose identifiers are all categories of their Enum
+
+    The weather store keeps the rows of a station for the whole retention window,
+    also after the station has been dropped from the metadata. Frames derived
+    from the store are filtered before cast_categories, which raises on them.
+
+    Parameters
+    ----------
+    frame: pl.DataFrame | pl.LazyFrame
+        Frame with identifier columns as String or Enum
+    category_schema: Mapping[str, pl.Enum]
+        Enum per column name, see create_category_schema
+
+    Returns
+    -------
+        Frame without the rows of identifiers missing from the metadata
+    """
+    column_names: list[str] = frame.collect_schema().names()
+    predicates: list[pl.Expr] = [
+        pl.col(column_name).cast(pl.String).is_in(pl.Series(dtype.categories).implode())
+        for column_name, dtype in category_schema.items()
+        if column_name in column_names
+    ]
+    return frame.filter(*predicates) if predicates else frame
+
+
+def encode_categories[FrameT: (pl.DataFrame, pl.LazyFrame)](
+    frame: FrameT, category_schema: Mapping[str, pl.Enum]
+) -> FrameT:
+    """Cast the identifier columns of a frame derived from the weather store
+
+    Rows of stations missing from the metadata are dropped, see
+    filter_categories, the others are cast, see cast_categories.
+    """
+    return cast_categories(filter_categories(frame, category_schema), category_schema)
+
+
+def expr_is_in_categories(
+    column_name: str, values: Sequence[str], dtype: pl.DataType
+) -> pl.Expr:
+    """Filter a String or Enum column by values, ignoring values it cannot contain
+
+    Parameters
+    ----------
+    column_name: str
+        Column to filter
+    values: Sequence[str]
+        Values to keep
+    dtype: pl.DataType
+        Data type of the column
+
+    Returns
+    -------
+        Filter expression, comparing integer codes for Enum columns
+    """
+    values_series: pl.Series = pl.Series(values, dtype=pl.String)
+    if isinstance(dtype, pl.Enum):
+        values_series = values_series.filter(
+            values_series.is_in(dtype.categories.implode())
+        )
+    return pl.col(column_name).is_in(values_series.implode())
@@ -1,11 +1,17 @@
 from datetime import datetime, timedelta
+from itertools import chain
 from pathlib import Path
+from typing import Any
 from zoneinfo import ZoneInfo
 
 import polars as pl
 from polars import DataType, Expr
 
+from meteoshrooms.constants import DATA_VERSIONS_DIR_NAME
+
 DATA_PATH: Path = Path(__file__).resolve().parents[3].joinpath('data')
+METRICS_DAILY_PARTIALS_PATH: Path = DATA_PATH.joinpath('metrics_daily_partials.parquet')
+DATA_VERSIONS_PATH: Path = DATA_PATH.joinpath(DATA_VERSIONS_DIR_NAME)
 DTYPE_DICT: dict[str, type[pl.DataType]] = {
     'Integer': pl.Int16,
     'Float': pl.Float32,
@@ -13,6 +19,10 @@ DTYPE_DICT: dict[str, type[pl.DataType]] = {
 }
 
 METEO_CSV_ENCODING: str = 'ISO-8859-1'
+CSV_REQUIRED_SCHEMA: dict[str, pl.DataType] = {
+    'station_abbr': pl.String(),
+    'reference_timestamp': pl.Datetime('us'),
+}
 META_FILE_PATH_DICT: dict[str, list[str]] = {
     meta_type: [
         f'https://data.geo.admin.ch/ch.meteoschweiz.ogd-smn{ogd_smn_prefix}/ogd-smn{meta_suffix}_meta_{meta_type}.csv'
@@ -112,6 +122,12 @@ COLS_TO_KEEP_META_DATAINVENTORY: tuple[str, ...] = (
 )
 URL_GEO_ADMIN_BASE: str = 'https://data.geo.admin.ch'
 URL_GEO_ADMIN_STATION_TYPE_BASE: str = 'ch.meteoschweiz.ogd-smn'
+DOWNLOAD_MAX_WORKERS: int = 8
+DOWNLOAD_CHUNK_SIZE: int = 1024**2
+CSV_IN_MEMORY_FACTOR: float = 3.0
+DOWNLOAD_CACHE_SUBDIR: str = 'http'
+DOWNLOAD_CACHE_MAX_MEGABYTES: int = 1024
+COLUMNAR_CACHE_SUBDIR: str = 'columnar'
 
 PARAMETER_AGGREGATION_TYPES: dict[str, tuple[str, ...]] = {
     'sum': ('rre150h0',),
@@ -119,6 +135,18 @@ PARAMETER_AGGREGATION_TYPES: dict[str, tuple[str, ...]] = {
 }
 TIMEZONE_SWITZERLAND_STRING: str = 'Europe/Zurich'
 TIME_PERIOD_VALUES: tuple[int, ...] = (3, 7, 14, 30)
+WEATHER_RETENTION_DAYS: int = 31
+WEATHER_ROW_GROUP_STATIONS: int = 8
+WEATHER_STORE_SCHEMA: dict[str, pl.DataType] = {
+    'station_abbr': pl.String(),
+    'reference_timestamp': pl.Datetime('us', TIMEZONE_SWITZERLAND_STRING),
+    **{
+        parameter: pl.Float32()
+        for parameter in chain.from_iterable(PARAMETER_AGGREGATION_TYPES.values())
+    },
+    'station_name': pl.String(),
+}
+FIXED_POINT_METADATA_KEY: str = 'meteoshrooms.fixed_point_decimals'
 TIME_PERIODS: dict[int, datetime] = {
     period: (
         datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING)) - timedelta(days=period)
@@ -132,6 +160,11 @@ EXPR_WEATHER_AGGREGATION_TYPES: tuple[Expr, Expr] = (
 STATION_TYPE_ERROR_STRING: str = 'station_type must be String and cannot be None'
 TIMEFRAME_VALUE_ERROR_STRING: str = "timeframe needs to be 'recent' or 'now'"
 TIMEFRAME_STRINGS: set[str] = {'recent', 'now'}
+STATION_TYPES: dict[str, str] = {
+    'weather': 'Automatic weather stations',
+    'rainfall': 'Automatic precipitation stations',
+}
+NOW_FILE_START_HOUR_UTC: int = 12
 ARGS_LOAD_META_PARAMETERS: tuple[
     dict[str, list[str]], dict[str, type[DataType]], tuple[str, ...]
 ] = (
@@ -158,7 +191,24 @@ TIMEZONE_EXPRESSION: pl.Expr = pl.col('reference_timestamp').dt.replace_time_zon
     non_existent='null',
     ambiguous='earliest',
 )
-SINK_PARQUET_KWARGS: dict[str, int | str] = {
-    'compression': 'brotli',
-    'compression_level': 11,
+# The row_group_size of a profile applies to all files but the weather files and
+# rollups, whose row groups hold WEATHER_ROW_GROUP_STATIONS whole stations each
+PARQUET_WRITE_PROFILES: dict[str, dict[str, Any]] = {
+    'archival': {
+        'compression': 'brotli',
+        'compression_level': 11,
+        'statistics': True,
+    },
+    'fast': {
+        'compression': 'zstd',
+        'compression_level': 1,
+        'statistics': True,
+        'row_group_size': 64 * 1024,
+    },
+    'lz4': {
+        'compression': 'lz4',
+        'statistics': True,
+        'row_group_size': 64 * 1024,
+    },
 }
+PARQUET_WRITE_PROFILE_DEFAULT: str = 'archival'
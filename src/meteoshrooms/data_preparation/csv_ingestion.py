@@ -0,0 +1,233 @@
+"""Lazy ingestion of station CSV files that tolerates schema drift
+
+Files are grouped by their header line, and each group is scanned with a single
+multi-file scan. Groups are combined with a relaxed diagonal concat, so a station
+with an additional, missing or reordered column only ends up in its own group
+instead of breaking the scan of all other files.
+
+With a columnar cache directory, every file is parsed once into a typed Parquet
+file keyed by the SHA-256 of its content, and later runs scan the cached files
+instead of parsing the CSV again.
+"""
+
+import hashlib
+import logging
+import uuid
+from collections.abc import Iterable
+from pathlib import Path
+
+import polars as pl
+
+from meteoshrooms.data_preparation.constants import (
+    CSV_REQUIRED_SCHEMA,
+    DOWNLOAD_CHUNK_SIZE,
+    METEO_CSV_ENCODING,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def read_csv_header(file_path: Path, separator: str = ';') -> tuple[str, ...]:
+    """Read the column names from the first line of a CSV file
+
+    Parameters
+    ----------
+    file_path: Path
+        CSV file
+    separator: str
+        Column separator
+
+    Returns
+    -------
+        Column names, empty if the file is empty
+    """
+    with file_path.open('rb') as f:
+        header: str = f.readline().decode(METEO_CSV_ENCODING).strip()
+    return tuple(column.strip('"') for column in header.split(separator) if header)
+
+
+def group_files_by_header(
+    file_paths: Iterable[Path], separator: str = ';'
+) -> dict[tuple[str, ...], list[Path]]:
+    """Group CSV files by header, skipping files that cannot be ingested
+
+    Missing files, empty files and files lacking a column of CSV_REQUIRED_SCHEMA are
+    logged and left out.
+
+    Parameters
+    ----------
+    file_paths: Iterable[Path]
+        CSV files
+    separator: str
+        Column separator
+
+    Returns
+    -------
+        File paths per header
+    """
+    groups: dict[tuple[str, ...], list[Path]] = {}
+    for file_path in file_paths:
+        try:
+            header: tuple[str, ...] = read_csv_header(file_path, separator)
+        except OSError as e:
+            logger.warning(f'{file_path.name} skipped: {e}')
+            continue
+        if not set(CSV_REQUIRED_SCHEMA).issubset(header):
+            logger.warning(f'{file_path.name} skipped: unexpected header {header}')
+            continue
+        groups.setdefault(header, []).append(file_path)
+    logger.debug(f'{sum(map(len, groups.values()))} files in {len(groups)} schemas')
+    return groups
+
+
+def create_header_kwargs(kwargs_lazyframe: dict, header: Iterable[str]) -> dict:
+    """Restrict the schema overrides of kwargs_lazyframe to the columns of header"""
+    columns: set[str] = set(header)
+    return kwargs_lazyframe | {
+        'schema_overrides': {
+            column: dtype
+            for column, dtype in kwargs_lazyframe.get('schema_overrides', {}).items()
+            if column in columns
+        }
+    }
+
+
+def scan_csv_files(
+    file_paths: Iterable[Path],
+    kwargs_lazyframe: dict,
+    columnar_cache_dir: Path | None = None,
+) -> pl.LazyFrame:
+    """Scan CSV files lazily, one scan per distinct header
+
+    Parameters
+    ----------
+    file_paths: Iterable[Path]
+        CSV files
+    kwargs_lazyframe: dict
+        Arguments to pass to pl.scan_csv
+    columnar_cache_dir: Path | None
+        Directory of the columnar cache, CSV files are scanned directly if None
+
+    Returns
+    -------
+        LazyFrame with the rows of all files, empty if no file can be ingested
+    """
+    groups: dict[tuple[str, ...], list[Path]] = group_files_by_header(
+        file_paths, kwargs_lazyframe.get('separator', ',')
+    )
+    frames: list[pl.LazyFrame]
+    if columnar_cache_dir is None:
+        frames = [
+            pl.scan_csv(
+                group_file_paths, **create_header_kwargs(kwargs_lazyframe, header)
+            )
+            for header, group_file_paths in groups.items()
+        ]
+    else:
+        frames = scan_columnar_cache(groups, kwargs_lazyframe, columnar_cache_dir)
+    if not frames:
+        return pl.LazyFrame(schema=CSV_REQUIRED_SCHEMA)
+    return pl.concat(frames, how='diagonal_relaxed')
+
+
+def create_columnar_cache_path(
+    file_path: Path, kwargs_lazyframe: dict, columnar_cache_dir: Path
+) -> Path:
+    """Create the path of the cached Parquet file of a CSV file
+
+    The key is the SHA-256 of the file content and of the parse arguments, so a
+    changed schema is never served from an outdated entry.
+
+    Parameters
+    ----------
+    file_path: Path
+        CSV file
+    kwargs_lazyframe: dict
+        Arguments to pass to pl.scan_csv
+    columnar_cache_dir: Path
+        Directory of the columnar cache
+
+    Returns
+    -------
+        Path of the cached Parquet file
+    """
+    sha256 = hashlib.sha256(repr(sorted(kwargs_lazyframe.items())).encode())
+    with file_path.open('rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return Path(columnar_cache_dir, f'{sha256.hexdigest()}.parquet')
+
+
+def convert_csv_to_parquet(
+    file_path: Path, kwargs_lazyframe: dict, columnar_cache_dir: Path
+) -> Path:
+    """Parse a CSV file into the columnar cache unless it is already cached
+
+    Parameters
+    ----------
+    file_path: Path
+        CSV file
+    kwargs_lazyframe: dict
+        Arguments to pass to pl.scan_csv, restricted to the columns of the file
+    columnar_cache_dir: Path
+        Directory of the columnar cache
+
+    Returns
+    -------
+        Path of the cached Parquet file
+    """
+    cache_path: Path = create_columnar_cache_path(
+        file_path, kwargs_lazyframe, columnar_cache_dir
+    )
+    if cache_path.exists():
+        cache_path.touch()
+        logger.debug(f'{file_path.name} read from columnar cache.')
+        return cache_path
+    columnar_cache_dir.mkdir(parents=True, exist_ok=True)
+    part_path: Path = cache_path.with_name(f'{uuid.uuid4().hex}.part')
+    try:
+        pl.scan_csv(file_path, **kwargs_lazyframe).sink_parquet(part_path)
+        part_path.replace(cache_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    logger.debug(f'{file_path.name} converted to {cache_path.name}.')
+    return cache_path
+
+
+def scan_columnar_cache(
+    groups: dict[tuple[str, ...], list[Path]],
+    kwargs_lazyframe: dict,
+    columnar_cache_dir: Path,
+) -> list[pl.LazyFrame]:
+    """Convert grouped CSV files into the columnar cache and scan the cached files
+
+    Cached files are grouped again by their Parquet schema, as type inference of
+    columns without schema override may differ between files of the same header.
+
+    Parameters
+    ----------
+    groups: dict[tuple[str, ...], list[Path]]
+        CSV files per header, see group_files_by_header
+    kwargs_lazyframe: dict
+        Arguments to pass to pl.scan_csv
+    columnar_cache_dir: Path
+        Directory of the columnar cache
+
+    Returns
+    -------
+        One LazyFrame per distinct schema of the cached files
+    """
+    cache_groups: dict[tuple, list[Path]] = {}
+    for header, group_file_paths in groups.items():
+        header_kwargs: dict = create_header_kwargs(kwargs_lazyframe, header)
+        for file_path in group_file_paths:
+            cache_path: Path = convert_csv_to_parquet(
+                file_path, header_kwargs, columnar_cache_dir
+            )
+            cache_groups.setdefault(
+                tuple(pl.read_parquet_schema(cache_path).items()), []
+            ).append(cache_path)
+    return [
+        pl.scan_parquet(cache_paths, hive_partitioning=False)
+        for cache_paths in cache_groups.values()
+    ]
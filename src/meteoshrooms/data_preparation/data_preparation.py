@@ -2,35 +2,103 @@
 
 import argparse
 import logging
+import resource
+import sys
 import tempfile
-from collections.abc import Sequence
-from datetime import datetime, timedelta
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import chain
 from pathlib import Path
 from typing import Any, Iterable, Mapping
 from zoneinfo import ZoneInfo
 
 import polars as pl
-import polars.exceptions
 import requests
 from requests.adapters import HTTPAdapter, Retry
 
-from meteoshrooms.constants import DATA_PATH, TIMEZONE_SWITZERLAND_STRING
+from meteoshrooms.constants import (
+    DATA_PATH,
+    MAP_FRAMES_FILE_NAME,
+    METRICS_IPC_FILE_NAME,
+    TIMEZONE_SWITZERLAND_STRING,
+    WEATHER_IPC_FILE_NAME,
+    WEATHER_ROLLUP_FILE_NAMES,
+    WEATHER_ROLLUP_IPC_FILE_NAMES,
+    WEATHER_STORE_PATH,
+)
+from meteoshrooms.data_preparation.categories import (
+    create_category_schema,
+    encode_categories,
+)
 from meteoshrooms.data_preparation.constants import (
     ARGS_LOAD_META_DATAINVENTORY,
     ARGS_LOAD_META_PARAMETERS,
     ARGS_LOAD_META_STATIONS,
+    COLUMNAR_CACHE_SUBDIR,
+    CSV_IN_MEMORY_FACTOR,
+    DATA_VERSIONS_PATH,
+    DOWNLOAD_CACHE_MAX_MEGABYTES,
+    DOWNLOAD_CACHE_SUBDIR,
+    DOWNLOAD_MAX_WORKERS,
     DTYPE_DICT,
     EXPR_WEATHER_AGGREGATION_TYPES,
     METEO_CSV_ENCODING,
+    METRICS_DAILY_PARTIALS_PATH,
     PARAMETER_AGGREGATION_TYPES,
-    SINK_PARQUET_KWARGS,
+    PARQUET_WRITE_PROFILE_DEFAULT,
+    PARQUET_WRITE_PROFILES,
     STATION_TYPE_ERROR_STRING,
+    STATION_TYPES,
     TIME_PERIODS,
     TIMEFRAME_STRINGS,
     TIMEFRAME_VALUE_ERROR_STRING,
     TIMEZONE_EXPRESSION,
     URL_GEO_ADMIN_BASE,
     URL_GEO_ADMIN_STATION_TYPE_BASE,
+    WEATHER_RETENTION_DAYS,
+)
+from meteoshrooms.data_preparation.csv_ingestion import scan_csv_files
+from meteoshrooms.data_preparation.download_cache import (
+    DownloadReport,
+    copy_file_atomically,
+    evict_cache_entries,
+    fetch_url_to_cache,
+    stream_response_to_file,
+)
+from meteoshrooms.data_preparation.download_plan import create_download_plan
+from meteoshrooms.data_preparation.fixed_point import (
+    create_fixed_point_decimals,
+)
+from meteoshrooms.data_preparation.incremental_metrics import (
+    aggregate_time_periods,
+    combine_daily_partials,
+    create_store_daily_partials,
+    update_daily_partials,
+)
+from meteoshrooms.data_preparation.manifest import (
+    create_manifest,
+    create_version_id,
+    export_version,
+    link_file,
+    link_weather_files,
+    publish_manifest,
+    read_manifest,
+    remove_unreferenced_versions,
+)
+from meteoshrooms.data_preparation.map_frames import create_map_frames, pivot_metrics
+from meteoshrooms.data_preparation.weather_store import (
+    append_weather_partitions,
+    drop_expired_partitions,
+    list_partition_dates,
+    list_partition_files,
+    read_partition_date,
+    read_station_max_timestamps,
+    scan_weather_files,
+    scan_weather_partitions,
+    scan_weather_store,
+    write_station_row_groups,
+    write_weather_partitions,
 )
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -51,6 +119,7 @@ def load_metadata(
     meta_schema: Mapping[str, type[pl.DataType]],
     meta_cols_to_keep: Sequence[str],
     data_path: Path = DATA_PATH,
+    cache_dir: Path | None = None,
 ) -> pl.LazyFrame:
     """Load metadata from a Parquet file.
 
@@ -65,11 +134,22 @@ def load_metadata(
         Dict with polars schema, structured as 'column_name': polars.Datatype
     meta_cols_to_keep: Sequence[str]
         Column names to keep in metadata DataFrame
+    cache_dir: Path | None
+        Download cache directory, files are read from their URLs if None
 
     Returns
     -------
         Metadata loaded into a LazyFrame
     """
+    file_paths: list[str | Path] = list(file_path_dict[meta_type])
+    if cache_dir is not None:
+        with create_download_session(max_workers=1) as s:
+            file_paths = [
+                fetch_url_to_cache(s, str(file_path), cache_dir)
+                if str(file_path).startswith(('http://', 'https://'))
+                else file_path
+                for file_path in file_paths
+            ]
     frame_meta: pl.LazyFrame = pl.concat(
         [
             pl.read_csv(
@@ -79,7 +159,7 @@ def load_metadata(
                 schema=meta_schema,
                 columns=meta_cols_to_keep,
             )
-            for file_path in file_path_dict[meta_type]
+            for file_path in file_paths
         ]
     ).lazy()
     logger.debug(f'frame_meta with type {meta_type} as pl.LazyFrame created')
@@ -135,126 +215,328 @@ def load_weather(
     schema_dict_lazyframe: Mapping[str, type[pl.DataType]],
     down_path: Path,
     update_data=False,
-) -> pl.LazyFrame:
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    cache_dir: Path | None = None,
+    checksum: bool = False,
+    memory_limit_bytes: int | None = None,
+    columnar_cache_dir: Path | None = None,
+    meta_datainventory: pl.LazyFrame | None = None,
+    store_path: Path = WEATHER_STORE_PATH,
+) -> Iterable[pl.LazyFrame]:
+    """Download station files and load them into batches of weather data
+
+    Only the files that can contain new rows are downloaded, see download_plan.
+    Batches are loaded lazily one after the other, see create_weather_batches.
+
+    Parameters
+    ----------
+    metadata: pl.LazyFrame
+        Station metadata
+    schema_dict_lazyframe: Mapping[str, type[pl.DataType]]
+        Polars schema of the weather parameters
+    down_path: Path
+        Directory the station files are downloaded to
+    update_data: bool
+        Whether to only load rows newer than the weather store
+    max_workers: int
+        Maximum number of concurrent downloads
+    cache_dir: Path | None
+        Download cache directory, files are fetched unconditionally if None
+    checksum: bool
+        Whether to calculate the SHA-256 of every downloaded file
+    memory_limit_bytes: int | None
+        Memory ceiling used to split the stations into batches, one batch if None
+    columnar_cache_dir: Path | None
+        Directory of the parsed station files, CSV files are parsed on every run
+        if None
+    meta_datainventory: pl.LazyFrame | None
+        Data inventory used to skip stations without new rows, every station is
+        downloaded if None
+    store_path: Path
+        Root directory of the weather store
+
+    Returns
+    -------
+        LazyFrames with the weather data of disjoint sets of stations, to be
+        consumed one at a time
+    """
     stations: pl.DataFrame = filter_unique_station_names(metadata).collect()
     kwargs_lazyframe: dict = {
         'separator': ';',
         'try_parse_dates': True,
         'schema_overrides': schema_dict_lazyframe,
     }
-    station_series_precipitation: pl.Series = filter_stations_to_series(
-        stations, station_type='Automatic precipitation stations'
+    station_max_timestamps: pl.DataFrame | None = (
+        read_station_max_timestamps(store_path) if update_data else None
     )
-    station_series_weather: pl.Series = filter_stations_to_series(
-        stations, station_type='Automatic weather stations'
+    download_plan: pl.DataFrame = create_download_plan(
+        stations, meta_datainventory, station_max_timestamps
     )
+    planned_urls: pl.Series = generate_planned_urls(download_plan)
     download_files(
-        pl.concat(
-            generate_download_urls(station_series, station_type, 'now')
-            for station_series, station_type in zip(
-                (station_series_weather, station_series_precipitation),
-                ('weather', 'rainfall'),
-                strict=False,
-            )
-        ),
+        planned_urls,
         down_path,
+        max_workers=max_workers,
+        cache_dir=cache_dir,
+        checksum=checksum,
     )
-    if update_data:
-        return update_weather_data(
-            down_path,
-            kwargs_lazyframe,
-            metadata,
-            station_series_precipitation,
-            station_series_weather,
-        )
-    urls_weather: pl.Series = pl.concat(
-        generate_download_urls(station_series_weather, 'weather', period)
-        for period in TIMEFRAME_STRINGS
-    )
-    urls_rainfall: pl.Series = pl.concat(
-        generate_download_urls(station_series_precipitation, 'rainfall', period)
-        for period in TIMEFRAME_STRINGS
-    )
-    download_files(
-        pl.concat(
-            generate_download_urls(station_series, station_type, 'recent')
-            for station_series, station_type in zip(
-                (station_series_weather, station_series_precipitation),
-                ('weather', 'rainfall'),
-                strict=False,
+    if station_max_timestamps is not None:
+        return [
+            update_weather_data(
+                down_path,
+                kwargs_lazyframe,
+                metadata,
+                planned_urls,
+                station_max_timestamps,
+                columnar_cache_dir=columnar_cache_dir,
             )
-        ),
+        ]
+    return create_weather_batches(
         down_path,
+        kwargs_lazyframe,
+        metadata,
+        plan_station_batches(
+            down_path,
+            {
+                station_type: filter_stations_to_series(download_plan, station_type_en)
+                for station_type, station_type_en in STATION_TYPES.items()
+            },
+            memory_limit_bytes,
+            planned_urls,
+        ),
+        columnar_cache_dir,
     )
-    try:
-        weather: pl.LazyFrame = create_rainfall_weather_lazyframes(
-            down_path, urls_weather, kwargs_lazyframe
+
+
+def generate_planned_urls(download_plan: pl.DataFrame) -> pl.Series:
+    """Generate the URLs of all files of a download plan, see create_download_plan"""
+    return pl.concat(
+        generate_download_urls(
+            filter_stations_to_series(
+                download_plan.filter(pl.col(timeframe)), station_type_en
+            ),
+            station_type,
+            timeframe,
         )
-        rainfall: pl.LazyFrame = create_rainfall_weather_lazyframes(
-            down_path, urls_rainfall, kwargs_lazyframe
+        for station_type, station_type_en in STATION_TYPES.items()
+        for timeframe in sorted(TIMEFRAME_STRINGS)
+    )
+
+
+def plan_station_batches(
+    down_path: Path,
+    station_series_by_type: Mapping[str, pl.Series],
+    memory_limit_bytes: int | None,
+    planned_urls: pl.Series | None = None,
+) -> list[list[pl.Series]]:
+    """Split downloaded station files into batches that fit into memory
+
+    The in-memory size of a station is estimated from the size of its downloaded
+    files times CSV_IN_MEMORY_FACTOR. All files of a station end up in the same
+    batch, and every batch only holds stations of one type.
+
+    Parameters
+    ----------
+    down_path: Path
+        Directory with the downloaded station files
+    station_series_by_type: Mapping[str, pl.Series]
+        Station names per station type, one of 'rainfall' or 'weather'
+    memory_limit_bytes: int | None
+        Memory ceiling per batch, one batch per station type if None
+    planned_urls: pl.Series | None
+        URLs of the downloaded files, files of all timeframes are loaded if None
+
+    Returns
+    -------
+        Batches, each a list of URL Series of one station type
+    """
+    batches: list[list[pl.Series]] = []
+    for station_type, station_series in station_series_by_type.items():
+        if station_series.is_empty():
+            continue
+        urls: pl.DataFrame = pl.DataFrame(
+            generate_download_urls(station_series, station_type, timeframe).alias(
+                timeframe
+            )
+            for timeframe in sorted(TIMEFRAME_STRINGS)
         )
-    except polars.exceptions.ComputeError:
-        weather = create_rainfall_weather_dataframes(
-            down_path, urls_weather, kwargs_lazyframe
+        if planned_urls is not None:
+            urls = urls.with_columns(
+                pl.when(pl.col(timeframe).is_in(planned_urls.implode())).then(
+                    pl.col(timeframe)
+                )
+                for timeframe in urls.columns
+            )
+        if memory_limit_bytes is None:
+            batches.append(create_url_batch(urls))
+            continue
+        batch_start: int = 0
+        batch_bytes: float = 0
+        for row_index, station_urls in enumerate(urls.iter_rows()):
+            station_bytes: float = CSV_IN_MEMORY_FACTOR * sum(
+                file_path.stat().st_size
+                for url in station_urls
+                if url is not None
+                and (file_path := Path(down_path, Path(url).name)).exists()
+            )
+            if batch_bytes + station_bytes > memory_limit_bytes and row_index:
+                batches.append(create_url_batch(urls[batch_start:row_index]))
+                batch_start, batch_bytes = row_index, 0
+            batch_bytes += station_bytes
+        batches.append(create_url_batch(urls[batch_start:]))
+    logger.debug(f'{len(batches)} station batches planned')
+    return batches
+
+
+def create_url_batch(urls: pl.DataFrame) -> list[pl.Series]:
+    """Split URLs into one Series per timeframe, leaving out unplanned files"""
+    return [url_series.drop_nulls() for url_series in urls.iter_columns()]
+
+
+def create_weather_batches(
+    down_path: Path,
+    kwargs_lazyframe: dict,
+    metadata: pl.LazyFrame,
+    station_url_batches: Iterable[Sequence[pl.Series]],
+    columnar_cache_dir: Path | None = None,
+) -> Iterator[pl.LazyFrame]:
+    """Load the batches of plan_station_batches, each only once it is requested
+
+    A batch is collected when the previous one has been consumed, so a consumer
+    writing every batch before requesting the next one holds a single batch in
+    memory.
+
+    Parameters
+    ----------
+    down_path: Path
+        Directory with the downloaded station files
+    kwargs_lazyframe: dict
+        Arguments to pass to LazyFrame constructor
+    metadata: pl.LazyFrame
+        Station metadata
+    station_url_batches: Iterable[Sequence[pl.Series]]
+        Batches of URL Series, see plan_station_batches
+    columnar_cache_dir: Path | None
+        Directory of the parsed station files, CSV files are parsed if None
+
+    Yields
+    ------
+        LazyFrame of the collected batch
+    """
+    for station_urls in station_url_batches:
+        yield create_weather_batch(
+            down_path, kwargs_lazyframe, metadata, station_urls, columnar_cache_dir
         )
-        rainfall = create_rainfall_weather_dataframes(
-            down_path, urls_rainfall, kwargs_lazyframe
+
+
+def create_weather_batch(
+    down_path: Path,
+    kwargs_lazyframe: dict,
+    metadata: pl.LazyFrame,
+    station_urls: Sequence[pl.Series],
+    columnar_cache_dir: Path | None = None,
+) -> pl.LazyFrame:
+    """Load the station files of one batch into memory
+
+    Parameters
+    ----------
+    down_path: Path
+        Directory with the downloaded station files
+    kwargs_lazyframe: dict
+        Arguments to pass to LazyFrame constructor
+    metadata: pl.LazyFrame
+        Station metadata
+    station_urls: Sequence[pl.Series]
+        URL Series of the batch, one per timeframe
+    columnar_cache_dir: Path | None
+        Directory of the parsed station files, CSV files are parsed if None
+
+    Returns
+    -------
+        LazyFrame of the collected batch
+    """
+    urls: pl.Series = pl.concat(station_urls)
+    return (
+        concat_rainfall_weather_lazyframes(
+            metadata,
+            create_rainfall_weather_lazyframes(
+                down_path, urls, kwargs_lazyframe, columnar_cache_dir
+            ),
         )
-    return concat_rainfall_weather_lazyframes(metadata, rainfall, weather)
+        .collect()
+        .lazy()
+    )
 
 
 def update_weather_data(
     down_path: Path,
     kwargs_lazyframe: dict,
     metadata: pl.LazyFrame,
-    station_series_precipitation: pl.Series,
-    station_series_weather: pl.Series,
+    urls: pl.Series,
+    station_max_timestamps: pl.DataFrame,
+    columnar_cache_dir: Path | None = None,
 ) -> pl.LazyFrame:
-    weather: pl.LazyFrame = pl.scan_parquet(Path(DATA_PATH, 'weather_data.parquet'))
-    urls_weather: pl.Series = generate_download_urls(
-        station_series_weather, 'weather', 'now'
-    )
-    urls_rainfall: pl.Series = generate_download_urls(
-        station_series_precipitation, 'rainfall', 'now'
-    )
-    weather_now: pl.LazyFrame = create_rainfall_weather_lazyframes(
-        down_path, urls_weather, kwargs_lazyframe
-    )
-    rainfall_now: pl.LazyFrame = create_rainfall_weather_lazyframes(
-        down_path, urls_rainfall, kwargs_lazyframe
-    )
+    """Create the weather rows that are newer than the content of the store
+
+    Rows are compared with the latest stored timestamp of their own station, so
+    stations lagging behind the others keep their late rows.
+
+    Parameters
+    ----------
+    down_path: Path
+        Directory with the downloaded station files
+    kwargs_lazyframe: dict
+        Arguments to pass to LazyFrame constructor
+    metadata: pl.LazyFrame
+        Station metadata
+    urls: pl.Series
+        URLs of the downloaded station files
+    station_max_timestamps: pl.DataFrame
+        Latest stored timestamp per station, see read_station_max_timestamps
+    columnar_cache_dir: Path | None
+        Directory of the parsed station files, CSV files are parsed if None
+
+    Returns
+    -------
+        LazyFrame with new rows only, to be appended to the store
+    """
     weather_new: pl.LazyFrame = concat_rainfall_weather_lazyframes(
-        metadata, rainfall_now, weather_now
-    )
-    weather_max_timestamp: datetime = (
-        weather.select('reference_timestamp').max().collect().item()
+        metadata,
+        create_rainfall_weather_lazyframes(
+            down_path, urls, kwargs_lazyframe, columnar_cache_dir
+        ),
     )
     return (
-        pl.concat(
-            (
-                weather_new.filter(
-                    pl.col('reference_timestamp') > weather_max_timestamp
-                )
-                .select(weather.drop('station_name').collect_schema().names())
-                .join(
-                    metadata.select(('station_abbr', 'station_name')),
-                    on=['station_abbr'],
-                ),
-                weather,
-            )
+        weather_new.join(
+            station_max_timestamps.lazy().rename(
+                {'reference_timestamp': 'max_timestamp'}
+            ),
+            on='station_abbr',
+            how='left',
         )
-        .filter(expr_filter_column_timedelta('reference_timestamp', 31))
-        .unique()
+        .filter(
+            pl.col('max_timestamp').is_null()
+            | (pl.col('reference_timestamp') > pl.col('max_timestamp'))
+        )
+        .drop('max_timestamp')
     )
 
 
 def concat_rainfall_weather_lazyframes(
-    metadata: pl.LazyFrame, frame_rainfall: pl.LazyFrame, frame_weather: pl.LazyFrame
+    metadata: pl.LazyFrame, *frames: pl.LazyFrame
 ) -> pl.LazyFrame:
+    frame_concat: pl.LazyFrame = pl.concat(frames, how='diagonal_relaxed')
+    column_names: list[str] = frame_concat.collect_schema().names()
     return (
-        pl.concat([frame_rainfall, frame_weather], how='diagonal')
+        frame_concat.with_columns(
+            pl.lit(None, dtype=pl.Float32).alias(parameter)
+            for parameter in chain.from_iterable(PARAMETER_AGGREGATION_TYPES.values())
+            if parameter not in column_names
+        )
         .sort('reference_timestamp')
-        .filter(expr_filter_column_timedelta('reference_timestamp', 31))
+        .filter(
+            expr_filter_column_timedelta('reference_timestamp', WEATHER_RETENTION_DAYS)
+        )
         .group_by_dynamic('reference_timestamp', every='1h', group_by='station_abbr')
         .agg(*EXPR_WEATHER_AGGREGATION_TYPES)
         .join(
@@ -265,6 +547,101 @@ def concat_rainfall_weather_lazyframes(
     )
 
 
+def create_weather_rollup(weather: pl.LazyFrame, every: str) -> pl.LazyFrame:
+    """Aggregate weather data per station into windows of length every
+
+    Parameters
+    ----------
+    weather: pl.LazyFrame
+        Hourly weather data
+    every: str
+        Window length as polars duration string, e.g. '6h' or '1d'
+
+    Returns
+    -------
+        LazyFrame with one row per station and window, ready for the dashboard
+    """
+    return (
+        weather.sort('reference_timestamp')
+        .group_by_dynamic(
+            'reference_timestamp',
+            every=every,
+            group_by=('station_name', 'station_abbr'),
+        )
+        .agg(*EXPR_WEATHER_AGGREGATION_TYPES)
+        .sort('station_name', 'reference_timestamp')
+    )
+
+
+def write_weather_rollup(
+    store_path: Path, every: str, file_path: Path, sink_parquet_kwargs: dict[str, Any]
+) -> Path:
+    """Write the rollup of the weather store in row groups of whole stations
+
+    The windows never span two days, so the store is rolled up partition by
+    partition, holding one day of hourly rows and the rollup in memory. Station
+    names stay String: polars writes the full category range of an Enum column
+    as the statistics of every row group, so no station filter could skip any
+    of them.
+
+    Parameters
+    ----------
+    store_path: Path
+        Root directory of the weather store
+    every: str
+        Window length as polars duration string, see create_weather_rollup
+    file_path: Path
+        Path of the rollup file
+    sink_parquet_kwargs: dict[str, Any]
+        Arguments of the Parquet writer
+
+    Returns
+    -------
+        Path of the written rollup
+    """
+    partition_dates: list[date] = list_partition_dates(store_path)
+    weather_rollup: pl.DataFrame = (
+        pl.concat(
+            create_weather_rollup(
+                scan_weather_partitions(store_path, (partition_date,)), every
+            ).collect()
+            for partition_date in partition_dates
+        ).sort('station_name', 'reference_timestamp')
+        if partition_dates
+        else create_weather_rollup(scan_weather_store(store_path), every).collect()
+    )
+    write_station_row_groups(weather_rollup, file_path, sink_parquet_kwargs)
+    return file_path
+
+
+def write_ipc_snapshot(frame: pl.LazyFrame, file_path: Path) -> Path:
+    """Write frame as uncompressed Arrow IPC file, renamed into place once complete
+
+    Uncompressed IPC files can be memory-mapped by the dashboard, so that all of
+    its processes share one copy in the page cache. Readers that still map the
+    previous snapshot keep reading it until they reopen the file.
+
+    Parameters
+    ----------
+    frame: pl.LazyFrame
+        Data of the snapshot
+    file_path: Path
+        Path of the snapshot
+
+    Returns
+    -------
+        Path of the written snapshot
+    """
+    part_path: Path = file_path.with_name(f'{file_path.name}.part')
+    try:
+        frame.sink_ipc(part_path, compression='uncompressed')
+        part_path.replace(file_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    logger.debug(f'IPC snapshot {file_path} written')
+    return file_path
+
+
 def filter_unique_station_names(metadata: pl.LazyFrame) -> pl.LazyFrame:
     return (
         metadata.select('station_abbr', 'station_type_en')
@@ -274,112 +651,151 @@ def filter_unique_station_names(metadata: pl.LazyFrame) -> pl.LazyFrame:
 
 
 def create_rainfall_weather_lazyframes(
-    down_path: Path, station_urls: pl.Series, kwargs_lazyframe: dict
+    down_path: Path,
+    station_urls: pl.Series,
+    kwargs_lazyframe: dict,
+    columnar_cache_dir: Path | None = None,
 ) -> pl.LazyFrame:
     """Create LazyFrame from CSV urls
 
+    Files whose header differs from the others are scanned separately instead of
+    failing the whole scan, see scan_csv_files.
+
     Parameters
     ----------
-    station_series: pl.Series
-        Station names
-    station_type: str
-        Station type, one of 'rainfall' or 'weather'
-    timeframe: str
-        Time range, one of 'recent' or 'now'
+    down_path: Path
+        Directory with the downloaded station files
+    station_urls: pl.Series
+        URLs of the station files
     kwargs_lazyframe: dict
         Arguments to pass to LazyFrame constructor
+    columnar_cache_dir: Path | None
+        Directory of the parsed station files, CSV files are parsed if None
 
     Returns
     -------
         Polars LazyFrame with rainfall/weather data
     """
-
-    try:
-        return (
-            scan_csv_from_urls(down_path, kwargs_lazyframe, station_urls)
-            .with_columns(TIMEZONE_EXPRESSION)
-            .collect()
-            .lazy()
-        )
-    except polars.exceptions.ComputeError:
-        raise
+    return scan_csv_from_urls(
+        down_path, kwargs_lazyframe, station_urls, columnar_cache_dir
+    ).with_columns(TIMEZONE_EXPRESSION)
 
 
 def scan_csv_from_urls(
-    down_path: Path, kwargs_lazyframe: dict, station_urls
+    down_path: Path,
+    kwargs_lazyframe: dict,
+    station_urls,
+    columnar_cache_dir: Path | None = None,
 ) -> pl.LazyFrame:
-    return pl.scan_csv(
-        tuple(Path(down_path, Path(url).name) for url in station_urls),
-        **kwargs_lazyframe,
+    return scan_csv_files(
+        (Path(down_path, Path(url).name) for url in station_urls),
+        kwargs_lazyframe,
+        columnar_cache_dir,
     )
 
 
-def download_files(urls: Iterable[str], down_path: Path):
-    with requests.Session() as s:
-        retries = Retry(
-            total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504]
-        )
-        s.mount('https://', HTTPAdapter(max_retries=retries))
-        for url in urls:
-            try:
-                r = s.get(url)
-                with Path(Path(down_path, Path(url).name)).open('wb') as f:
-                    f.write(r.content)
-                logger.debug(f'file {Path(down_path, Path(url).name)} written.')
-            except Exception as e:
-                print('Exception in download_url():', e)
-
-
-def create_rainfall_weather_dataframes(
-    down_path: Path,
-    station_urls,
-    kwargs_lazyframe: dict,
-) -> pl.LazyFrame:
-    """Create LazyFrame from CSV urls
+def create_download_session(max_workers: int) -> requests.Session:
+    """Create a Session with retries and a connection pool per host
 
     Parameters
     ----------
-    station_series: pl.Series
-        Station names
-    station_type: str
-        Station type, one of 'rainfall' or 'weather'
-    timeframe: str
-        Time range, one of 'recent' or 'now'
-    kwargs_lazyframe: dict
-        Arguments to pass to LazyFrame constructor
+    max_workers: int
+        Number of concurrent downloads, used as pool size per host
 
     Returns
     -------
-        Polars LazyFrame with rainfall/weather data
+        Session with retrying HTTPAdapter mounted for http and https
     """
-    return (
-        read_csv_from_urls(down_path, kwargs_lazyframe, station_urls)
-        .with_columns(TIMEZONE_EXPRESSION)
-        .lazy()
+    session: requests.Session = requests.Session()
+    retries: Retry = Retry(
+        total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504]
     )
+    adapter: HTTPAdapter = HTTPAdapter(
+        max_retries=retries, pool_maxsize=max_workers, pool_block=True
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 
-def read_csv_from_urls(
-    down_path: Path, kwargs_lazyframe: dict, station_urls
-) -> pl.DataFrame:
-    return pl.concat(
-        tuple(
-            pl.read_csv(
-                Path(down_path, Path(url).name),
-                **kwargs_lazyframe,
+def download_file(
+    session: requests.Session,
+    url: str,
+    down_path: Path,
+    cache_dir: Path | None = None,
+    checksum: bool = False,
+) -> DownloadReport | None:
+    file_path: Path = Path(down_path, Path(url).name)
+    try:
+        if cache_dir is not None:
+            num_bytes, sha256 = copy_file_atomically(
+                fetch_url_to_cache(session, url, cache_dir), file_path, checksum
             )
-            for url in station_urls
-        ),
-        how='diagonal',
-    )
+        else:
+            num_bytes, sha256 = stream_response_to_file(
+                session.get(url, stream=True), file_path, checksum
+            )
+        logger.debug(f'file {file_path} written ({num_bytes} bytes).')
+        return DownloadReport(url, file_path, num_bytes, sha256)
+    except Exception:
+        logger.exception(f'download of {url} failed')
+        return None
+
+
+def download_files(
+    urls: Iterable[str],
+    down_path: Path,
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    cache_dir: Path | None = None,
+    checksum: bool = False,
+) -> list[DownloadReport]:
+    """Download files concurrently into down_path
+
+    Files are streamed to disk in chunks and only renamed to their final name once
+    complete, so partially downloaded files are never scanned.
+
+    Parameters
+    ----------
+    urls: Iterable[str]
+        URLs to download
+    down_path: Path
+        Directory the files are written to, named after the last URL part
+    max_workers: int
+        Maximum number of concurrent downloads
+    cache_dir: Path | None
+        Download cache directory, files are fetched unconditionally if None
+    checksum: bool
+        Whether to calculate the SHA-256 of every file
+
+    Returns
+    -------
+        Report with byte count and checksum of every downloaded file
+    """
+    with (
+        create_download_session(max_workers) as s,
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+    ):
+        reports: list[DownloadReport | None] = list(
+            executor.map(
+                lambda url: download_file(s, url, down_path, cache_dir, checksum),
+                urls,
+            )
+        )
+    for report in reports:
+        if report is not None and report.sha256 is not None:
+            logger.debug(f'{report.file_path.name}: sha256 {report.sha256}')
+    return [report for report in reports if report is not None]
 
 
 def create_metrics(
     weather_data: pl.LazyFrame, time_periods: Mapping[int, datetime]
 ) -> pl.LazyFrame:
+    return unpivot_metrics_frame(concat_metrics_frame(time_periods, weather_data))
+
+
+def unpivot_metrics_frame(metrics_frame: pl.LazyFrame) -> pl.LazyFrame:
     return (
-        concat_metrics_frame(time_periods, weather_data)
-        .unpivot(
+        metrics_frame.unpivot(
             index=('station_abbr', 'station_name', 'time_period'),
             variable_name='parameter',
         )
@@ -391,18 +807,7 @@ def create_metrics(
 def concat_metrics_frame(
     time_periods: Mapping[int, datetime], weather_data: pl.LazyFrame
 ) -> pl.LazyFrame:
-    return pl.concat(
-        tuple(
-            weather_data.filter(pl.col('reference_timestamp') >= datetime_period)
-            .drop(
-                'reference_timestamp',
-            )
-            .group_by(('station_abbr', 'station_name'))
-            .agg(*EXPR_WEATHER_AGGREGATION_TYPES)
-            .with_columns(pl.lit(period).alias('time_period').cast(pl.Int8))
-            for period, datetime_period in time_periods.items()
-        )
-    )
+    return aggregate_time_periods(weather_data, time_periods)
 
 
 def filter_stations_to_series(stations: pl.DataFrame, station_type: str) -> pl.Series:
@@ -445,35 +850,225 @@ if __name__ == '__main__':
     parser.add_argument('-m', '--metrics', action='store_true')
     parser.add_argument('-d', '--debug', action='store_true')
     parser.add_argument('-u', '--update', action='store_true')
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=DOWNLOAD_MAX_WORKERS,
+        help='maximum number of concurrent downloads',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=Path,
+        default=None,
+        help='directory of the persistent download cache, disabled if omitted',
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=DOWNLOAD_CACHE_MAX_MEGABYTES,
+        help='size of the download cache before old entries are evicted',
+    )
+    parser.add_argument(
+        '--checksum',
+        action='store_true',
+        help='log the SHA-256 of every downloaded file',
+    )
+    parser.add_argument(
+        '--write-profile',
+        choices=PARQUET_WRITE_PROFILES.keys(),
+        default=PARQUET_WRITE_PROFILE_DEFAULT,
+        help='compression profile of the written Parquet files',
+    )
+    parser.add_argument(
+        '--memory-limit-mb',
+        type=int,
+        default=None,
+        help='run the streaming engine on station batches fitting into this limit',
+    )
+    parser.add_argument(
+        '--ipc',
+        action='store_true',
+        help='also write uncompressed Arrow IPC snapshots for the dashboard',
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='store measurements as integers scaled by their parameter decimals',
+    )
+    parser.add_argument(
+        '--export',
+        action='store_true',
+        help='also export the published version under fixed file names',
+    )
     args: argparse.Namespace = parser.parse_args()
-    if args.debug:
-        logger.setLevel(logging.DEBUG)
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
     logger.debug('Logger created')
+    memory_limit_bytes: int | None = (
+        args.memory_limit_mb * 1024**2 if args.memory_limit_mb else None
+    )
+    if memory_limit_bytes is not None:
+        pl.Config.set_engine_affinity('streaming')
+    sink_parquet_kwargs: dict[str, Any] = PARQUET_WRITE_PROFILES[args.write_profile]
+    http_cache_dir: Path | None = (
+        Path(args.cache_dir, DOWNLOAD_CACHE_SUBDIR) if args.cache_dir else None
+    )
+    columnar_cache_dir: Path | None = (
+        Path(args.cache_dir, COLUMNAR_CACHE_SUBDIR) if args.cache_dir else None
+    )
+    manifest_before: dict[str, Any] | None = read_manifest(DATA_PATH)
+    version: str = create_version_id()
+    version_path: Path = Path(DATA_VERSIONS_PATH, version)
+    version_path.mkdir(parents=True)
+    version_files: dict[str, Path] = {}
     meta_parameters: pl.LazyFrame = load_metadata(
-        'parameters', *ARGS_LOAD_META_PARAMETERS
+        'parameters',
+        *ARGS_LOAD_META_PARAMETERS,
+        data_path=version_path,
+        cache_dir=http_cache_dir,
     )
     weather_schema_dict: dict[str, type[pl.DataType]] = create_weather_schema_dict(
         meta_parameters
     )
-    meta_stations: pl.LazyFrame = (
-        load_metadata('stations', *ARGS_LOAD_META_STATIONS).collect().lazy()
+    meta_stations: pl.LazyFrame = load_metadata(
+        'stations',
+        *ARGS_LOAD_META_STATIONS,
+        data_path=version_path,
+        cache_dir=http_cache_dir,
+    )
+    meta_datainventory: pl.LazyFrame = load_metadata(
+        'datainventory',
+        *ARGS_LOAD_META_DATAINVENTORY,
+        data_path=version_path,
+        cache_dir=http_cache_dir,
     )
-    meta_datainventory: pl.LazyFrame = (
-        load_metadata('datainventory', *ARGS_LOAD_META_DATAINVENTORY).collect().lazy()
+    category_schema: dict[str, pl.Enum] = create_category_schema(
+        meta_stations.collect(), meta_parameters.collect()
     )
+    fixed_point_decimals: dict[str, int] | None = (
+        create_fixed_point_decimals(meta_parameters) if args.compact else None
+    )
+    for meta_type in ('parameters', 'stations', 'datainventory'):
+        version_files[f'meta_{meta_type}.parquet'] = Path(
+            version_path, f'meta_{meta_type}.parquet'
+        )
     with tempfile.TemporaryDirectory() as tmpdir:
         down_path: Path = Path(tmpdir)
-        weather_data: pl.LazyFrame = load_weather(
+        weather_batches: Iterable[pl.LazyFrame] = load_weather(
             meta_stations,
             schema_dict_lazyframe=weather_schema_dict,
             down_path=down_path,
             update_data=args.update,
+            max_workers=args.workers,
+            cache_dir=http_cache_dir,
+            checksum=args.checksum,
+            memory_limit_bytes=memory_limit_bytes,
+            columnar_cache_dir=columnar_cache_dir,
+            meta_datainventory=meta_datainventory,
+        )
+        if args.update:
+            weather_files_written: list[Path] = [
+                file_path
+                for weather_batch in weather_batches
+                for file_path in append_weather_partitions(
+                    weather_batch,
+                    WEATHER_STORE_PATH,
+                    sink_parquet_kwargs,
+                    fixed_point_decimals,
+                )
+            ]
+        else:
+            weather_files_written = write_weather_partitions(
+                weather_batches,
+                WEATHER_STORE_PATH,
+                sink_parquet_kwargs,
+                fixed_point_decimals,
+            )
+    drop_expired_partitions(WEATHER_STORE_PATH, WEATHER_RETENTION_DAYS)
+    weather_files: list[Path] = link_weather_files(
+        list_partition_files(WEATHER_STORE_PATH), WEATHER_STORE_PATH, version_path
+    )
+    for every, file_name in WEATHER_ROLLUP_FILE_NAMES.items():
+        version_files[file_name] = write_weather_rollup(
+            WEATHER_STORE_PATH,
+            every,
+            Path(version_path, file_name),
+            sink_parquet_kwargs,
+        )
+    if args.metrics:
+        if args.update and METRICS_DAILY_PARTIALS_PATH.exists():
+            daily_partials: pl.DataFrame = update_daily_partials(
+                pl.scan_parquet(METRICS_DAILY_PARTIALS_PATH),
+                WEATHER_STORE_PATH,
+                {read_partition_date(file_path) for file_path in weather_files_written},
+                WEATHER_RETENTION_DAYS,
+            ).collect()
+            metrics: pl.LazyFrame = unpivot_metrics_frame(
+                combine_daily_partials(
+                    daily_partials.lazy(), WEATHER_STORE_PATH, TIME_PERIODS
+                )
+            )
+        else:
+            daily_partials = create_store_daily_partials(WEATHER_STORE_PATH)
+            metrics = unpivot_metrics_frame(
+                combine_daily_partials(
+                    daily_partials.lazy(), WEATHER_STORE_PATH, TIME_PERIODS
+                )
+            )
+        daily_partials.write_parquet(METRICS_DAILY_PARTIALS_PATH, **sink_parquet_kwargs)
+        version_files['metrics.parquet'] = Path(version_path, 'metrics.parquet')
+        metrics.sink_parquet(version_files['metrics.parquet'], **sink_parquet_kwargs)
+    elif manifest_before is not None and 'metrics.parquet' in manifest_before['files']:
+        version_files['metrics.parquet'] = link_file(
+            Path(DATA_PATH, manifest_before['files']['metrics.parquet']),
+            Path(version_path, 'metrics.parquet'),
+        )
+    if 'metrics.parquet' in version_files:
+        version_files[MAP_FRAMES_FILE_NAME] = Path(version_path, MAP_FRAMES_FILE_NAME)
+        create_map_frames(
+            meta_stations,
+            pivot_metrics(pl.scan_parquet(version_files['metrics.parquet'])).lazy(),
+        ).sink_parquet(version_files[MAP_FRAMES_FILE_NAME], **sink_parquet_kwargs)
+    if args.ipc:
+        # Streamed in partition order, each partition is sorted by station
+        version_files[WEATHER_IPC_FILE_NAME] = write_ipc_snapshot(
+            encode_categories(scan_weather_files(weather_files), category_schema),
+            Path(version_path, WEATHER_IPC_FILE_NAME),
         )
-        if args.metrics:
-            metrics: pl.LazyFrame = create_metrics(weather_data, TIME_PERIODS)
-            metrics.sink_parquet(
-                Path(DATA_PATH, 'metrics.parquet'), **SINK_PARQUET_KWARGS
+        for every, file_name in WEATHER_ROLLUP_IPC_FILE_NAMES.items():
+            version_files[file_name] = write_ipc_snapshot(
+                encode_categories(
+                    pl.scan_parquet(version_files[WEATHER_ROLLUP_FILE_NAMES[every]]),
+                    category_schema,
+                ),
+                Path(version_path, file_name),
+            )
+        if 'metrics.parquet' in version_files:
+            version_files[METRICS_IPC_FILE_NAME] = write_ipc_snapshot(
+                encode_categories(
+                    pl.scan_parquet(version_files['metrics.parquet']), category_schema
+                ),
+                Path(version_path, METRICS_IPC_FILE_NAME),
             )
-        weather_data.sink_parquet(
-            Path(DATA_PATH, 'weather_data.parquet'), **SINK_PARQUET_KWARGS
+    manifest: dict[str, Any] = create_manifest(
+        version, version_files, weather_files, DATA_PATH
+    )
+    publish_manifest(manifest, DATA_PATH)
+    if args.export:
+        export_version(manifest, sink_parquet_kwargs, DATA_PATH, DATA_PATH)
+    remove_unreferenced_versions(
+        DATA_VERSIONS_PATH,
+        (manifest, manifest_before) if manifest_before is not None else (manifest,),
+        DATA_PATH,
+    )
+    if http_cache_dir is not None:
+        evict_cache_entries(http_cache_dir, args.cache_max_mb * 1024**2)
+    if columnar_cache_dir is not None:
+        evict_cache_entries(
+            columnar_cache_dir, args.cache_max_mb * 1024**2, pattern='*.parquet'
         )
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    logger.info(
+        'peak memory: '
+        f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024**2 if sys.platform == "darwin" else 1024):.0f} MB'
+    )
@@ -0,0 +1,200 @@
+"""Persistent on-disk cache for conditional HTTP downloads"""
+
+import hashlib
+import json
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+import requests
+
+from meteoshrooms.data_preparation.constants import DOWNLOAD_CHUNK_SIZE
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class DownloadReport(NamedTuple):
+    url: str
+    file_path: Path
+    num_bytes: int
+    sha256: str | None
+
+
+def write_chunks_atomically(
+    chunks: Iterable[bytes], file_path: Path, checksum: bool = False
+) -> tuple[int, str | None]:
+    """Write chunks to a partial file and rename it once complete
+
+    Parameters
+    ----------
+    chunks: Iterable[bytes]
+        File content, e.g. from Response.iter_content()
+    file_path: Path
+        Final file path, only present once all chunks have been written
+    checksum: bool
+        Whether to calculate the SHA-256 of the content
+
+    Returns
+    -------
+        Number of bytes written and SHA-256 hex digest or None
+    """
+    part_path: Path = file_path.with_name(f'{file_path.name}.part')
+    sha256 = hashlib.sha256() if checksum else None
+    num_bytes: int = 0
+    try:
+        with part_path.open('wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                num_bytes += len(chunk)
+                if sha256 is not None:
+                    sha256.update(chunk)
+        part_path.replace(file_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    return num_bytes, (sha256.hexdigest() if sha256 is not None else None)
+
+
+def copy_file_atomically(
+    source_path: Path, file_path: Path, checksum: bool = False
+) -> tuple[int, str | None]:
+    with source_path.open('rb') as f:
+        return write_chunks_atomically(
+            iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''), file_path, checksum
+        )
+
+
+def stream_response_to_file(
+    response: requests.Response, file_path: Path, checksum: bool = False
+) -> tuple[int, str | None]:
+    with response:
+        response.raise_for_status()
+        return write_chunks_atomically(
+            response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), file_path, checksum
+        )
+
+
+def create_cache_entry_paths(cache_dir: Path, url: str) -> tuple[Path, Path]:
+    """Create paths of cached file and its validators, keyed by URL
+
+    Parameters
+    ----------
+    cache_dir: Path
+        Cache directory
+    url: str
+        URL of the cached file
+
+    Returns
+    -------
+        Paths of the cached file and of the JSON file with its validators
+    """
+    key: str = hashlib.sha256(url.encode()).hexdigest()
+    return Path(cache_dir, f'{key}.data'), Path(cache_dir, f'{key}.json')
+
+
+def create_conditional_headers(cache_dir: Path, url: str) -> dict[str, str]:
+    """Create If-None-Match/If-Modified-Since headers from cached validators
+
+    Parameters
+    ----------
+    cache_dir: Path
+        Cache directory
+    url: str
+        URL of the cached file
+
+    Returns
+    -------
+        Request headers, empty if the URL is not cached
+    """
+    data_path, validators_path = create_cache_entry_paths(cache_dir, url)
+    if not (data_path.exists() and validators_path.exists()):
+        return {}
+    validators: dict[str, str] = json.loads(validators_path.read_text())
+    headers: dict[str, str] = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def store_cache_entry(cache_dir: Path, url: str, response: requests.Response):
+    data_path, validators_path = create_cache_entry_paths(cache_dir, url)
+    stream_response_to_file(response, data_path)
+    validators_path.write_text(
+        json.dumps(
+            {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+        )
+    )
+
+
+def fetch_url_to_cache(session: requests.Session, url: str, cache_dir: Path) -> Path:
+    """Fetch URL conditionally, reusing the cached file on 304 Not Modified
+
+    Parameters
+    ----------
+    session: requests.Session
+        Session used for the request
+    url: str
+        URL to fetch
+    cache_dir: Path
+        Cache directory
+
+    Returns
+    -------
+        Path of the up-to-date cached file
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    data_path, _ = create_cache_entry_paths(cache_dir, url)
+    r: requests.Response = session.get(
+        url, headers=create_conditional_headers(cache_dir, url), stream=True
+    )
+    if r.status_code == requests.codes.not_modified:
+        r.close()
+        data_path.touch()
+        logger.debug(f'{url} not modified, cached file reused.')
+        return data_path
+    if not r.ok:
+        r.close()
+        r.raise_for_status()
+    store_cache_entry(cache_dir, url, r)
+    logger.debug(f'{url} downloaded to cache.')
+    return data_path
+
+
+def evict_cache_entries(
+    cache_dir: Path, max_bytes: int, pattern: str = '*.data'
+) -> int:
+    """Evict least recently used files until the cache fits into max_bytes
+
+    Parameters
+    ----------
+    cache_dir: Path
+        Cache directory
+    max_bytes: int
+        Maximum total size of cached files
+    pattern: str
+        Glob pattern of the cached files, their '.json' validators are evicted along
+
+    Returns
+    -------
+        Number of evicted entries
+    """
+    data_paths: list[Path] = sorted(
+        cache_dir.glob(pattern), key=lambda p: p.stat().st_mtime
+    )
+    total_bytes: int = sum(p.stat().st_size for p in data_paths)
+    num_evicted: int = 0
+    for data_path in data_paths:
+        if total_bytes <= max_bytes:
+            break
+        total_bytes -= data_path.stat().st_size
+        data_path.unlink()
+        data_path.with_suffix('.json').unlink(missing_ok=True)
+        num_evicted += 1
+    logger.debug(f'{num_evicted} entries evicted from {cache_dir}.')
+    return num_evicted
@@ -0,0 +1,169 @@
+"""Plan which station files of a run can contain new, relevant rows
+
+Every station publishes a 'now' file, covering the time since
+NOW_FILE_START_HOUR_UTC of the previous UTC day, and a 'recent' file, covering
+the time before. The 'now' file rolls over daily, so it spans between 12 and 36
+hours depending on the time of the run. The data inventory lists for every
+station and parameter when measurements started and, for stations that stopped,
+when they ended. Together with the latest timestamp stored per station, this
+decides which of the two files may hold rows that are newer than the store,
+within the retention window and of a parameter the dashboard shows:
+
+- stations without any dashboard parameter are skipped
+- stations that stopped before their latest stored row or before the retention
+  window are skipped
+- the 'now' file is fetched if the station measured during its span
+- the 'recent' file is fetched if the rows missing from the store start before
+  the span of the 'now' file, i.e. on the first run or after a gap
+"""
+
+import logging
+from collections.abc import Iterable
+from datetime import UTC, datetime, time, timedelta
+from itertools import chain
+from zoneinfo import ZoneInfo
+
+import polars as pl
+
+from meteoshrooms.constants import TIMEZONE_SWITZERLAND_STRING
+from meteoshrooms.data_preparation.constants import (
+    NOW_FILE_START_HOUR_UTC,
+    PARAMETER_AGGREGATION_TYPES,
+    WEATHER_RETENTION_DAYS,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def summarize_datainventory(
+    meta_datainventory: pl.LazyFrame, parameters: Iterable[str]
+) -> pl.LazyFrame:
+    """Summarize the measuring period of every station over the given parameters
+
+    Parameters
+    ----------
+    meta_datainventory: pl.LazyFrame
+        Data inventory, one row per station and parameter
+    parameters: Iterable[str]
+        Parameter short names to consider
+
+    Returns
+    -------
+        LazyFrame with columns station_abbr and data_till, the end of the latest
+        measured parameter, null while any parameter is still measured
+    """
+    return (
+        meta_datainventory.filter(
+            pl.col('parameter_shortname').is_in(pl.Series(list(parameters)).implode())
+        )
+        .with_columns(
+            pl.col('data_till').dt.replace_time_zone(
+                TIMEZONE_SWITZERLAND_STRING, non_existent='null', ambiguous='earliest'
+            )
+        )
+        .group_by('station_abbr')
+        .agg(
+            pl.when(pl.col('data_till').null_count() > 0)
+            .then(None)
+            .otherwise(pl.col('data_till').max())
+            .alias('data_till')
+        )
+    )
+
+
+def calculate_now_file_start(now: datetime) -> datetime:
+    """Calculate the first reference timestamp the 'now' files hold at time now
+
+    Like the stored rows, see TIMEZONE_EXPRESSION, the UTC wall time of the file
+    is labelled as Swiss time, which errs towards fetching the 'recent' file.
+    """
+    return datetime.combine(
+        now.astimezone(UTC).date() - timedelta(days=1),
+        time(hour=NOW_FILE_START_HOUR_UTC),
+        tzinfo=ZoneInfo(TIMEZONE_SWITZERLAND_STRING),
+    )
+
+
+def create_download_plan(
+    stations: pl.DataFrame,
+    meta_datainventory: pl.LazyFrame | None,
+    station_max_timestamps: pl.DataFrame | None,
+    now: datetime | None = None,
+) -> pl.DataFrame:
+    """Decide per station whether its 'now' and 'recent' files are downloaded
+
+    Parameters
+    ----------
+    stations: pl.DataFrame
+        Stations with columns station_abbr and station_type_en
+    meta_datainventory: pl.LazyFrame | None
+        Data inventory, every station is considered measuring if None
+    station_max_timestamps: pl.DataFrame | None
+        Latest stored timestamp per station, see read_station_max_timestamps,
+        nothing is considered stored if None
+    now: datetime | None
+        Time of the run, the current time if None
+
+    Returns
+    -------
+        DataFrame with columns station_abbr, station_type_en and the Boolean
+        columns 'now' and 'recent', only holding stations with a file to fetch
+    """
+    now = (now or datetime.now(tz=UTC)).astimezone(
+        ZoneInfo(TIMEZONE_SWITZERLAND_STRING)
+    )
+    now_file_start: datetime = calculate_now_file_start(now)
+    station_periods: pl.LazyFrame = (
+        summarize_datainventory(
+            meta_datainventory,
+            chain.from_iterable(PARAMETER_AGGREGATION_TYPES.values()),
+        )
+        if meta_datainventory is not None
+        else stations.lazy().select(
+            'station_abbr',
+            pl.lit(None, dtype=pl.Datetime('us', TIMEZONE_SWITZERLAND_STRING)).alias(
+                'data_till'
+            ),
+        )
+    )
+    if station_max_timestamps is None:
+        station_max_timestamps = pl.DataFrame(
+            schema={
+                'station_abbr': pl.String,
+                'reference_timestamp': pl.Datetime('us', TIMEZONE_SWITZERLAND_STRING),
+            }
+        )
+    missing_since: pl.Expr = pl.max_horizontal(
+        pl.col('reference_timestamp'),
+        pl.lit(now - timedelta(days=WEATHER_RETENTION_DAYS)),
+    )
+    measured_since_missing: pl.Expr = pl.col('data_till').is_null() | (
+        pl.col('data_till') > missing_since
+    )
+    download_plan: pl.DataFrame = (
+        stations.lazy()
+        .select('station_abbr', 'station_type_en')
+        .join(station_periods, on='station_abbr', how='inner')
+        .join(station_max_timestamps.lazy(), on='station_abbr', how='left')
+        .select(
+            'station_abbr',
+            'station_type_en',
+            (
+                measured_since_missing
+                & (
+                    pl.col('data_till').is_null()
+                    | (pl.col('data_till') > now_file_start)
+                )
+            ).alias('now'),
+            (measured_since_missing & (missing_since < now_file_start)).alias('recent'),
+        )
+        .filter(pl.col('now') | pl.col('recent'))
+        .sort('station_abbr')
+        .collect()
+    )
+    logger.debug(
+        f'{download_plan.height} of {stations.height} stations planned, '
+        f'{download_plan.get_column("now").sum()} now and '
+        f'{download_plan.get_column("recent").sum()} recent files'
+    )
+    return download_plan
@@ -0,0 +1,172 @@
+"""Compact fixed-point storage of measurements in the weather store
+
+Measurements are published with a fixed number of decimals per parameter, the
+parameter_decimals of the parameter metadata. In compact mode, each Float column
+is stored as the integer value * 10**decimals, in the smallest integer type its
+values fit in. The decimals of every encoded column are stored in the key-value
+metadata of its Parquet file, so files are decoded without any other input and a
+store may mix compact and plain files.
+
+A column is only encoded if decoding reproduces every Float32 value exactly,
+otherwise it is written as Float32 as before.
+"""
+
+import json
+import logging
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+import polars as pl
+
+from meteoshrooms.data_preparation.constants import FIXED_POINT_METADATA_KEY
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+FIXED_POINT_DTYPES: dict[type[pl.DataType], int] = {
+    pl.Int16: 2**15 - 1,
+    pl.Int32: 2**31 - 1,
+}
+
+
+def create_fixed_point_decimals(meta_parameters: pl.LazyFrame) -> dict[str, int]:
+    """Read the decimals of every Float parameter from the parameter metadata"""
+    return dict(
+        meta_parameters.filter(pl.col('parameter_datatype') == 'Float')
+        .select('parameter_shortname', 'parameter_decimals')
+        .unique('parameter_shortname')
+        .collect()
+        .iter_rows()
+    )
+
+
+def expr_decode_fixed_point(column_name: str, decimals: int) -> pl.Expr:
+    """Decode a fixed-point column to Float32, dividing in Float64 to round once"""
+    return (
+        (pl.col(column_name).cast(pl.Float64) / 10**decimals)
+        .cast(pl.Float32)
+        .alias(column_name)
+    )
+
+
+def encode_fixed_point(
+    frame: pl.DataFrame, fixed_point_decimals: Mapping[str, int]
+) -> tuple[pl.DataFrame, dict[str, int]]:
+    """Encode the Float32 columns of frame as scaled integers where lossless
+
+    Parameters
+    ----------
+    frame: pl.DataFrame
+        Weather data
+    fixed_point_decimals: Mapping[str, int]
+        Decimals per parameter, see create_fixed_point_decimals
+
+    Returns
+    -------
+        Encoded frame and the decimals of the encoded columns
+    """
+    encoded: dict[str, pl.Series] = {}
+    decimals_encoded: dict[str, int] = {}
+    for column_name, decimals in fixed_point_decimals.items():
+        if frame.schema.get(column_name) != pl.Float32:
+            continue
+        scaled: pl.Series = (
+            frame.get_column(column_name).cast(pl.Float64) * 10**decimals
+        ).round()
+        max_abs: float | None = scaled.abs().max()
+        dtype: type[pl.DataType] | None = next(
+            (
+                dtype
+                for dtype, max_value in FIXED_POINT_DTYPES.items()
+                if max_abs is None or max_abs <= max_value
+            ),
+            None,
+        )
+        if dtype is None:
+            continue
+        column: pl.Series = scaled.cast(dtype)
+        decoded: pl.Series = (
+            column.to_frame()
+            .select(expr_decode_fixed_point(column_name, decimals))
+            .to_series()
+        )
+        if not decoded.equals(frame.get_column(column_name)):
+            logger.debug(f'{column_name} kept as Float32, values exceed its decimals')
+            continue
+        encoded[column_name] = column
+        decimals_encoded[column_name] = decimals
+    return frame.with_columns(encoded.values()), decimals_encoded
+
+
+def create_fixed_point_metadata(decimals_encoded: Mapping[str, int]) -> dict[str, str]:
+    """Create the Parquet key-value metadata recording the encoded columns"""
+    return {FIXED_POINT_METADATA_KEY: json.dumps(dict(decimals_encoded))}
+
+
+def read_fixed_point_decimals(file_path: Path) -> dict[str, int]:
+    """Read the decimals of the encoded columns of a Parquet file, empty if plain"""
+    metadata: dict[str, str] = pl.read_parquet_metadata(file_path)
+    return json.loads(metadata.get(FIXED_POINT_METADATA_KEY, '{}'))
+
+
+def group_fixed_point_files(
+    file_paths: Iterable[Path],
+    fixed_point_decimals_by_file: Mapping[Path, Mapping[str, int]] | None = None,
+) -> dict[tuple[tuple[str, int], ...], list[Path]]:
+    """Group Parquet files by their encoded columns
+
+    One scan cannot read a column stored as integer in one file and as Float32 in
+    another, so every group is scanned separately.
+
+    Parameters
+    ----------
+    file_paths: Iterable[Path]
+        Parquet files, compact or plain
+    fixed_point_decimals_by_file: Mapping[Path, Mapping[str, int]] | None
+        Decimals of the encoded columns per compact file, e.g. from the manifest,
+        files missing from it are plain. The metadata of every file is read if
+        None.
+
+    Returns
+    -------
+        File paths per sorted tuple of encoded columns and their decimals
+    """
+    groups: dict[tuple[tuple[str, int], ...], list[Path]] = {}
+    for file_path in file_paths:
+        decimals_encoded: Mapping[str, int] = (
+            read_fixed_point_decimals(file_path)
+            if fixed_point_decimals_by_file is None
+            else fixed_point_decimals_by_file.get(file_path, {})
+        )
+        groups.setdefault(tuple(sorted(decimals_encoded.items())), []).append(file_path)
+    return groups
+
+
+def scan_fixed_point_files(file_paths: Iterable[Path]) -> pl.LazyFrame:
+    """Scan Parquet files of the weather store, decoding fixed-point columns
+
+    Parameters
+    ----------
+    file_paths: Iterable[Path]
+        Parquet files, compact or plain
+
+    Returns
+    -------
+        LazyFrame with all measurements as Float32
+    """
+    return scan_fixed_point_groups(group_fixed_point_files(file_paths))
+
+
+def scan_fixed_point_groups(
+    groups: Mapping[tuple[tuple[str, int], ...], Sequence[Path]],
+) -> pl.LazyFrame:
+    """Scan groups of Parquet files, see group_fixed_point_files, decoding each"""
+    return pl.concat(
+        [
+            pl.scan_parquet(group, hive_partitioning=False).with_columns(
+                expr_decode_fixed_point(column_name, decimals)
+                for column_name, decimals in decimals_encoded
+            )
+            for decimals_encoded, group in groups.items()
+        ],
+        how='diagonal_relaxed',
+    )
@@ -0,0 +1,239 @@
+"""Metrics from partial aggregates of sum and count per parameter
+
+The partial aggregates keep sum and count of every parameter per station and day.
+When new hourly rows arrive, only the affected days are recomputed from their
+weather store partitions. The time period metrics are then combined from the
+full days after each cutoff plus the rows of the cutoff day itself.
+
+The same partial aggregates let aggregate_time_periods() compute every time period
+in a single pass over the weather data.
+"""
+
+import logging
+from collections.abc import Iterable, Mapping
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import polars as pl
+
+from meteoshrooms.constants import TIMEZONE_SWITZERLAND_STRING
+from meteoshrooms.data_preparation.constants import PARAMETER_AGGREGATION_TYPES
+from meteoshrooms.data_preparation.weather_store import (
+    EXPR_PARTITION_DATE,
+    PARTITION_COLUMN,
+    list_partition_dates,
+    scan_weather_partitions,
+    scan_weather_store,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+EXPR_PARTIAL_AGGREGATES: tuple[pl.Expr, ...] = tuple(
+    expr
+    for parameter in (
+        *PARAMETER_AGGREGATION_TYPES['sum'],
+        *PARAMETER_AGGREGATION_TYPES['mean'],
+    )
+    for expr in (
+        pl.col(parameter).cast(pl.Float64).sum().alias(f'{parameter}_sum'),
+        pl.col(parameter).count().alias(f'{parameter}_count'),
+    )
+)
+EXPR_COMBINE_PARTIAL_AGGREGATES: tuple[pl.Expr, ...] = (
+    *(
+        pl.col(f'{parameter}_sum').sum().cast(pl.Float32).alias(parameter)
+        for parameter in PARAMETER_AGGREGATION_TYPES['sum']
+    ),
+    *(
+        pl.when(pl.col(f'{parameter}_count').sum() > 0)
+        .then(pl.col(f'{parameter}_sum').sum() / pl.col(f'{parameter}_count').sum())
+        .cast(pl.Float32)
+        .alias(parameter)
+        for parameter in PARAMETER_AGGREGATION_TYPES['mean']
+    ),
+)
+
+
+def create_daily_partials(weather: pl.LazyFrame) -> pl.LazyFrame:
+    """Aggregate weather rows to sum and count per station, day and parameter
+
+    Parameters
+    ----------
+    weather: pl.LazyFrame
+        Hourly weather data
+
+    Returns
+    -------
+        LazyFrame with one row per station and day
+    """
+    return weather.group_by('station_abbr', 'station_name', EXPR_PARTITION_DATE).agg(
+        *EXPR_PARTIAL_AGGREGATES
+    )
+
+
+def create_store_daily_partials(store_path: Path) -> pl.DataFrame:
+    """Aggregate the weather store partition by partition
+
+    The partial aggregates of a day only depend on its own partition, so only
+    one day of hourly rows is held in memory at a time.
+
+    Parameters
+    ----------
+    store_path: Path
+        Root directory of the weather store
+
+    Returns
+    -------
+        Partial aggregates per station and day, see create_daily_partials
+    """
+    partition_dates: list[date] = list_partition_dates(store_path)
+    if not partition_dates:
+        return create_daily_partials(scan_weather_store(store_path)).collect()
+    return pl.concat(
+        create_daily_partials(
+            scan_weather_partitions(store_path, (partition_date,))
+        ).collect()
+        for partition_date in partition_dates
+    )
+
+
+def update_daily_partials(
+    daily_partials: pl.LazyFrame,
+    store_path: Path,
+    partition_dates: Iterable[date],
+    retention_days: int,
+) -> pl.LazyFrame:
+    """Replace the partial aggregates of the given days from the weather store
+
+    Parameters
+    ----------
+    daily_partials: pl.LazyFrame
+        Current partial aggregates
+    store_path: Path
+        Root directory of the weather store
+    partition_dates: Iterable[date]
+        Days that received new rows
+    retention_days: int
+        Number of days to keep
+
+    Returns
+    -------
+        Updated partial aggregates
+    """
+    partition_dates = tuple(partition_dates)
+    oldest_date: date = (
+        datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+        - timedelta(days=retention_days)
+    ).date()
+    frames: list[pl.LazyFrame] = [
+        daily_partials.filter(~pl.col(PARTITION_COLUMN).is_in(partition_dates))
+    ]
+    weather_updated: pl.LazyFrame | None = scan_weather_partitions(
+        store_path, partition_dates
+    )
+    if weather_updated is not None:
+        frames.append(create_daily_partials(weather_updated))
+    logger.debug(f'daily partials of {len(partition_dates)} days updated')
+    return pl.concat(frames).filter(pl.col(PARTITION_COLUMN) >= oldest_date)
+
+
+def combine_daily_partials(
+    daily_partials: pl.LazyFrame,
+    store_path: Path,
+    time_periods: Mapping[int, datetime],
+) -> pl.LazyFrame:
+    """Combine partial aggregates into one row per station and time period
+
+    Parameters
+    ----------
+    daily_partials: pl.LazyFrame
+        Partial aggregates per station and day
+    store_path: Path
+        Root directory of the weather store, used for the cutoff days
+    time_periods: Mapping[int, datetime]
+        Cutoff timestamp per time period in days
+
+    Returns
+    -------
+        LazyFrame with the same columns as concat_metrics_frame()
+    """
+    frames: list[pl.LazyFrame] = []
+    for period, datetime_period in time_periods.items():
+        partials: list[pl.LazyFrame] = [
+            daily_partials.filter(pl.col(PARTITION_COLUMN) > datetime_period.date())
+        ]
+        weather_cutoff_day: pl.LazyFrame | None = scan_weather_partitions(
+            store_path, (datetime_period.date(),)
+        )
+        if weather_cutoff_day is not None:
+            partials.append(
+                create_daily_partials(
+                    weather_cutoff_day.filter(
+                        pl.col('reference_timestamp') >= datetime_period
+                    )
+                )
+            )
+        frames.append(
+            pl.concat(partials)
+            .group_by('station_abbr', 'station_name')
+            .agg(*EXPR_COMBINE_PARTIAL_AGGREGATES)
+            .with_columns(pl.lit(period).alias('time_period').cast(pl.Int8))
+        )
+    return pl.concat(frames)
+
+
+def aggregate_time_periods(
+    weather: pl.LazyFrame, time_periods: Mapping[int, datetime]
+) -> pl.LazyFrame:
+    """Aggregate weather data for all time periods in a single pass
+
+    Every row is bucketed into the smallest time period it falls into. Partial
+    aggregates per station and bucket are then combined cumulatively, so that each
+    time period contains its own bucket and all smaller ones.
+
+    Parameters
+    ----------
+    weather: pl.LazyFrame
+        Hourly weather data
+    time_periods: Mapping[int, datetime]
+        Cutoff timestamp per time period in days, any number of periods
+
+    Returns
+    -------
+        LazyFrame with one row per station and time period
+    """
+    cutoffs: list[tuple[int, datetime]] = sorted(
+        time_periods.items(), key=lambda item: item[1], reverse=True
+    )
+    expr_bucket: pl.Expr = pl.lit(None, dtype=pl.Int32)
+    for bucket, (_, datetime_period) in reversed(tuple(enumerate(cutoffs))):
+        expr_bucket = (
+            pl.when(pl.col('reference_timestamp') >= datetime_period)
+            .then(pl.lit(bucket, dtype=pl.Int32))
+            .otherwise(expr_bucket)
+        )
+    windows: pl.LazyFrame = pl.LazyFrame(
+        {
+            'window': list(range(len(cutoffs))),
+            'time_period': [period for period, _ in cutoffs],
+        },
+        schema={'window': pl.Int32, 'time_period': pl.Int8},
+    )
+    return (
+        weather.with_columns(expr_bucket.alias('bucket'))
+        .drop_nulls('bucket')
+        .group_by('station_abbr', 'station_name', 'bucket')
+        .agg(*EXPR_PARTIAL_AGGREGATES)
+        .join(windows, how='cross')
+        .filter(pl.col('bucket') <= pl.col('window'))
+        .group_by('station_abbr', 'station_name', 'time_period')
+        .agg(*EXPR_COMBINE_PARTIAL_AGGREGATES)
+        .select(
+            'station_abbr',
+            'station_name',
+            *PARAMETER_AGGREGATION_TYPES['sum'],
+            *PARAMETER_AGGREGATION_TYPES['mean'],
+            'time_period',
+        )
+    )
@@ -0,0 +1,328 @@
+"""Versioned publishing of the data files read by the dashboard
+
+Every data preparation run stages its output files in a new version directory
+below DATA_VERSIONS_PATH. The files of the weather store are hard-linked into it,
+so that later updates of the store never change the files of a published version.
+The version is published by atomically replacing the manifest, a small JSON file
+listing the files of the version with their checksums and summary statistics.
+Readers only open the manifest to find the current version and its files.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from meteoshrooms.constants import (
+    DATA_PATH,
+    DATA_VERSIONS_DIR_NAME,
+    MANIFEST_FILE_NAME,
+    WEATHER_FILE_NAME,
+)
+from meteoshrooms.data_preparation.constants import DOWNLOAD_CHUNK_SIZE
+from meteoshrooms.data_preparation.fixed_point import (
+    read_fixed_point_decimals,
+    scan_fixed_point_files,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def create_version_id() -> str:
+    """Create a version id, sortable by creation time"""
+    return f'{datetime.now(tz=UTC):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}'
+
+
+def create_version_manifest_path(version: str, data_path: Path = DATA_PATH) -> Path:
+    return Path(data_path, DATA_VERSIONS_DIR_NAME, version, MANIFEST_FILE_NAME)
+
+
+def read_manifest(
+    data_path: Path = DATA_PATH, version: str | None = None
+) -> dict[str, Any] | None:
+    """Read the manifest of the published version or of a given version
+
+    Parameters
+    ----------
+    data_path: Path
+        Data directory
+    version: str | None
+        Version id, the published version if None
+
+    Returns
+    -------
+        Manifest or None if no such version has been published
+    """
+    manifest_path: Path = (
+        Path(data_path, MANIFEST_FILE_NAME)
+        if version is None
+        else create_version_manifest_path(version, data_path)
+    )
+    try:
+        return json.loads(manifest_path.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def link_file(file_path: Path, link_path: Path) -> Path:
+    """Hard-link file_path to link_path, copying it if hard links are unsupported"""
+    link_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(file_path, link_path)
+    except OSError:
+        shutil.copy2(file_path, link_path)
+    return link_path
+
+
+def link_weather_files(
+    file_paths: Iterable[Path], store_path: Path, version_path: Path
+) -> list[Path]:
+    """Hard-link weather store files into a version directory
+
+    Files are copied if the file system does not support hard links.
+
+    Parameters
+    ----------
+    file_paths: Iterable[Path]
+        Files of the weather store
+    store_path: Path
+        Root directory of the weather store
+    version_path: Path
+        Version directory, the store is mirrored into a subdirectory of it
+
+    Returns
+    -------
+        Paths of the linked files
+    """
+    return [
+        link_file(
+            file_path,
+            Path(version_path, store_path.name, file_path.relative_to(store_path)),
+        )
+        for file_path in file_paths
+    ]
+
+
+def calculate_file_sha256(file_path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with file_path.open('rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def summarize_weather(weather_files: Sequence[Path]) -> dict[str, Any]:
+    """Summarize weather files by row count, station count and time range"""
+    if not weather_files:
+        return {'num_rows': 0, 'num_stations': 0, 'time_min': None, 'time_max': None}
+    num_rows, num_stations, time_min, time_max = (
+        scan_fixed_point_files(weather_files)
+        .select(
+            pl.len(),
+            pl.col('station_abbr').n_unique(),
+            pl.col('reference_timestamp').min().alias('time_min'),
+            pl.col('reference_timestamp').max().alias('time_max'),
+        )
+        .collect()
+        .row(0)
+    )
+    return {
+        'num_rows': num_rows,
+        'num_stations': num_stations,
+        'time_min': time_min.isoformat() if time_min is not None else None,
+        'time_max': time_max.isoformat() if time_max is not None else None,
+    }
+
+
+def create_manifest(
+    version: str,
+    files: Mapping[str, Path],
+    weather_files: Sequence[Path],
+    data_path: Path = DATA_PATH,
+) -> dict[str, Any]:
+    """Create the manifest of a version
+
+    Parameters
+    ----------
+    version: str
+        Version id
+    files: Mapping[str, Path]
+        Paths of the version files by the file name readers look them up with
+    weather_files: Sequence[Path]
+        Weather files of the version
+    data_path: Path
+        Data directory, all paths are stored relative to it
+
+    Returns
+    -------
+        Manifest, ready to be published
+    """
+    relative_files: dict[str, str] = {
+        file_name: file_path.relative_to(data_path).as_posix()
+        for file_name, file_path in files.items()
+    }
+    relative_weather_files: list[str] = [
+        file_path.relative_to(data_path).as_posix() for file_path in weather_files
+    ]
+    return {
+        'version': version,
+        'created_at': datetime.now(tz=UTC).isoformat(),
+        'files': relative_files,
+        'weather_files': relative_weather_files,
+        'checksums': {
+            relative_path: calculate_file_sha256(Path(data_path, relative_path))
+            for relative_path in (*relative_files.values(), *relative_weather_files)
+        },
+        'num_rows': {
+            file_name: pl.scan_parquet(file_path).select(pl.len()).collect().item()
+            for file_name, file_path in files.items()
+            if file_path.suffix == '.parquet'
+        },
+        'weather': summarize_weather(weather_files),
+        'fixed_point_decimals': {
+            relative_path: decimals_encoded
+            for relative_path in relative_weather_files
+            if (
+                decimals_encoded := read_fixed_point_decimals(
+                    Path(data_path, relative_path)
+                )
+            )
+        },
+    }
+
+
+def publish_manifest(manifest: Mapping[str, Any], data_path: Path = DATA_PATH) -> Path:
+    """Publish a version by atomically replacing the manifest
+
+    A copy is kept in the version directory, so readers still on a previous
+    version resolve its files with read_manifest(data_path, version).
+
+    Parameters
+    ----------
+    manifest: Mapping[str, Any]
+        Manifest of the version, see create_manifest
+    data_path: Path
+        Data directory
+
+    Returns
+    -------
+        Path of the manifest
+    """
+    version_manifest_path: Path = create_version_manifest_path(
+        manifest['version'], data_path
+    )
+    version_manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    version_manifest_path.write_text(json.dumps(manifest, indent=2))
+    manifest_path: Path = Path(data_path, MANIFEST_FILE_NAME)
+    part_path: Path = manifest_path.with_name(f'{manifest_path.name}.part')
+    try:
+        part_path.write_text(json.dumps(manifest, indent=2))
+        part_path.replace(manifest_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    logger.info(f'data version {manifest["version"]} published')
+    return manifest_path
+
+
+def export_version(
+    manifest: Mapping[str, Any],
+    sink_parquet_kwargs: dict[str, Any],
+    data_path: Path = DATA_PATH,
+    export_path: Path = DATA_PATH,
+) -> list[Path]:
+    """Export the files of a version under fixed names, without manifest
+
+    The version and store directories change their file names with every run.
+    Exporting the current version under the file names of a data directory
+    without manifest keeps repositories tracking the data small, as every run
+    only modifies the same files. The weather files are merged into one decoded
+    file, sorted by station.
+
+    Parameters
+    ----------
+    manifest: Mapping[str, Any]
+        Manifest of the version, see create_manifest
+    sink_parquet_kwargs: dict[str, Any]
+        Arguments of the merged weather file
+    data_path: Path
+        Data directory the manifest paths are relative to
+    export_path: Path
+        Directory the files are exported to
+
+    Returns
+    -------
+        Paths of the exported files
+    """
+    export_path.mkdir(parents=True, exist_ok=True)
+    exported: list[Path] = []
+    for file_name, relative_path in manifest['files'].items():
+        file_path: Path = Path(export_path, file_name)
+        part_path: Path = file_path.with_name(f'{file_name}.part')
+        shutil.copyfile(Path(data_path, relative_path), part_path)
+        part_path.replace(file_path)
+        exported.append(file_path)
+    if manifest['weather_files']:
+        file_path = Path(export_path, WEATHER_FILE_NAME)
+        part_path = file_path.with_name(f'{WEATHER_FILE_NAME}.part')
+        scan_fixed_point_files(
+            [
+                Path(data_path, relative_path)
+                for relative_path in manifest['weather_files']
+            ]
+        ).sort('station_name', 'reference_timestamp').sink_parquet(
+            part_path, **sink_parquet_kwargs
+        )
+        part_path.replace(file_path)
+        exported.append(file_path)
+    logger.debug(f'{len(exported)} files of version {manifest["version"]} exported')
+    return exported
+
+
+def remove_unreferenced_versions(
+    versions_path: Path,
+    manifests: Iterable[Mapping[str, Any]],
+    data_path: Path = DATA_PATH,
+) -> list[Path]:
+    """Remove version directories none of the given manifests refers to
+
+    Keeping the previously published manifest among the given ones lets readers
+    finish reading the previous version while the next one is published.
+
+    Parameters
+    ----------
+    versions_path: Path
+        Directory of the version directories
+    manifests: Iterable[Mapping[str, Any]]
+        Manifests whose files are kept
+    data_path: Path
+        Data directory the manifest paths are relative to
+
+    Returns
+    -------
+        Removed version directories
+    """
+    referenced: set[Path] = {
+        Path(data_path, relative_path).parent
+        for manifest in manifests
+        for relative_path in (*manifest['files'].values(), *manifest['weather_files'])
+    }
+    removed: list[Path] = [
+        version_path
+        for version_path in sorted(versions_path.glob('*'))
+        if version_path.is_dir()
+        and not any(
+            version_path == path or version_path in path.parents for path in referenced
+        )
+    ]
+    for version_path in removed:
+        shutil.rmtree(version_path)
+    logger.debug(f'{len(removed)} unreferenced versions removed from {versions_path}')
+    return removed
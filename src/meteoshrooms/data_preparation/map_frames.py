@@ -0,0 +1,80 @@
+"""Ready-to-plot station frames for the dashboard map
+
+The map frame joins the station metadata with the metrics of every time period
+once, so the dashboard only filters it by time period instead of joining, casting
+and renaming on every rebuild of the map.
+"""
+
+import polars as pl
+
+MAP_FRAME_STATION_COLUMNS: tuple[str, ...] = (
+    'station_name',
+    'Station Type',
+    'Short Code',
+    'Altitude',
+    'station_coordinates_wgs84_lat',
+    'station_coordinates_wgs84_lon',
+)
+
+
+def pivot_metrics(metrics: pl.LazyFrame) -> pl.DataFrame:
+    """Pivot long metrics to one column per parameter
+
+    Parameters
+    ----------
+    metrics: pl.LazyFrame
+        Metrics with one row per station, time period and parameter
+
+    Returns
+    -------
+        Metrics with one row per station and time period
+    """
+    return metrics.collect().pivot(
+        'parameter',
+        index=('station_abbr', 'station_name', 'time_period'),
+        values='value',
+    )
+
+
+def create_map_frames(
+    meta_stations: pl.LazyFrame, metrics_wide: pl.LazyFrame
+) -> pl.LazyFrame:
+    """Create the map frame of every time period
+
+    Parameters
+    ----------
+    meta_stations: pl.LazyFrame
+        Station metadata
+    metrics_wide: pl.LazyFrame
+        Metrics with one column per parameter, see pivot_metrics, the station
+        abbreviations of the metadata are cast to their data type for the join
+
+    Returns
+    -------
+        Stations with labelled metadata columns and metric columns, one row per
+        station and time period, sorted by time period
+    """
+    return (
+        meta_stations.select(
+            pl.col('station_abbr').cast(
+                metrics_wide.collect_schema()['station_abbr'], strict=False
+            ),
+            pl.col('station_type_en').alias('Station Type'),
+            pl.col('station_abbr').alias('Short Code'),
+            pl.col('station_height_masl')
+            .cast(pl.Int16)
+            .cast(pl.String)
+            .add(' m.a.s.l')
+            .alias('Altitude'),
+            pl.col('station_coordinates_wgs84_lat'),
+            pl.col('station_coordinates_wgs84_lon'),
+        )
+        .unique()
+        .join(metrics_wide, on='station_abbr')
+        .select(
+            *MAP_FRAME_STATION_COLUMNS,
+            pl.col('time_period'),
+            pl.exclude(*MAP_FRAME_STATION_COLUMNS, 'time_period', 'station_abbr'),
+        )
+        .sort('time_period', 'station_name')
+    )
@@ -0,0 +1,370 @@
+"""Weather data store, hive-partitioned by day of the reference timestamp
+
+Every partition directory ``date=YYYY-MM-DD`` holds immutable Parquet files. An
+update only rewrites the partitions that receive new rows, and expired days are
+dropped by deleting their directory.
+"""
+
+import logging
+import shutil
+import uuid
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+from zoneinfo import ZoneInfo
+
+import polars as pl
+
+from meteoshrooms.constants import TIMEZONE_SWITZERLAND_STRING
+from meteoshrooms.data_preparation.constants import (
+    WEATHER_ROW_GROUP_STATIONS,
+    WEATHER_STORE_SCHEMA,
+)
+from meteoshrooms.data_preparation.fixed_point import (
+    create_fixed_point_metadata,
+    encode_fixed_point,
+    scan_fixed_point_files,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN: str = 'date'
+EXPR_PARTITION_DATE: pl.Expr = (
+    pl.col('reference_timestamp').dt.date().alias(PARTITION_COLUMN)
+)
+
+
+def create_partition_path(store_path: Path, partition_date: date) -> Path:
+    return Path(store_path, f'{PARTITION_COLUMN}={partition_date.isoformat()}')
+
+
+def list_partition_dates(store_path: Path) -> list[date]:
+    return sorted(
+        date.fromisoformat(partition_path.name.split('=', maxsplit=1)[1])
+        for partition_path in store_path.glob(f'{PARTITION_COLUMN}=*')
+        if partition_path.is_dir()
+    )
+
+
+def read_partition_date(file_path: Path) -> date:
+    return date.fromisoformat(file_path.parent.name.split('=', maxsplit=1)[1])
+
+
+def list_partition_files(store_path: Path) -> list[Path]:
+    return [
+        file_path
+        for partition_date in list_partition_dates(store_path)
+        for file_path in sorted(
+            create_partition_path(store_path, partition_date).glob('*.parquet')
+        )
+    ]
+
+
+def scan_weather_partitions(
+    store_path: Path, partition_dates: Iterable[date]
+) -> pl.LazyFrame | None:
+    """Scan only the given partitions of the weather store
+
+    Parameters
+    ----------
+    store_path: Path
+        Root directory of the store
+    partition_dates: Iterable[date]
+        Days to scan, missing ones are skipped
+
+    Returns
+    -------
+        LazyFrame with the weather data of the partitions or None if none exist
+    """
+    file_paths: list[Path] = [
+        file_path
+        for partition_date in sorted(set(partition_dates))
+        for file_path in sorted(
+            create_partition_path(store_path, partition_date).glob('*.parquet')
+        )
+    ]
+    if not file_paths:
+        return None
+    return scan_fixed_point_files(file_paths)
+
+
+def scan_weather_files(file_paths: Sequence[Path]) -> pl.LazyFrame:
+    """Scan files of the weather store, empty with the store schema if none"""
+    if not file_paths:
+        return pl.LazyFrame(schema=WEATHER_STORE_SCHEMA)
+    return scan_fixed_point_files(file_paths)
+
+
+def scan_weather_store(store_path: Path) -> pl.LazyFrame:
+    """Scan all partitions of the weather store
+
+    Parameters
+    ----------
+    store_path: Path
+        Root directory of the store
+
+    Returns
+    -------
+        LazyFrame with the weather data of all partitions, empty with the store
+        schema if the store is empty
+    """
+    return scan_weather_files(list_partition_files(store_path))
+
+
+def read_max_timestamp(store_path: Path) -> datetime | None:
+    """Read the latest reference timestamp, only scanning the newest partition"""
+    partition_dates: list[date] = list_partition_dates(store_path)
+    if not partition_dates:
+        return None
+    return (
+        scan_fixed_point_files(
+            sorted(
+                create_partition_path(store_path, partition_dates[-1]).glob('*.parquet')
+            )
+        )
+        .select(pl.col('reference_timestamp').max())
+        .collect()
+        .item()
+    )
+
+
+def read_station_max_timestamps(store_path: Path) -> pl.DataFrame:
+    """Read the latest reference timestamp of every station in the store
+
+    Parameters
+    ----------
+    store_path: Path
+        Root directory of the store
+
+    Returns
+    -------
+        DataFrame with columns station_abbr and reference_timestamp, empty if the
+        store is empty
+    """
+    file_paths: list[Path] = list_partition_files(store_path)
+    if not file_paths:
+        return pl.DataFrame(
+            schema={
+                column_name: WEATHER_STORE_SCHEMA[column_name]
+                for column_name in ('station_abbr', 'reference_timestamp')
+            }
+        )
+    return (
+        scan_fixed_point_files(file_paths)
+        .group_by('station_abbr')
+        .agg(pl.col('reference_timestamp').max())
+        .collect()
+    )
+
+
+def write_station_row_groups(
+    frame: pl.DataFrame,
+    file_path: Path,
+    sink_parquet_kwargs: dict[str, Any],
+    metadata: dict[str, str] | None = None,
+    num_stations: int = WEATHER_ROW_GROUP_STATIONS,
+):
+    """Write frame, sorted by station, in row groups of num_stations whole stations
+
+    Polars writes every chunk that does not exceed the row group size as a row
+    group of its own, so frame is rechunked at station boundaries and the row
+    group size set to the largest chunk. This overrides any row_group_size of
+    sink_parquet_kwargs, which applies to all other files.
+    """
+    chunks: list[pl.DataFrame] = (
+        frame.with_columns(
+            (pl.col('station_name').rle_id() // num_stations).alias('row_group')
+        ).partition_by('row_group', maintain_order=True, include_key=False)
+        if not frame.is_empty()
+        else [frame]
+    )
+    pl.concat(chunks, rechunk=False).write_parquet(
+        file_path,
+        metadata=metadata,
+        **(
+            sink_parquet_kwargs
+            | {
+                'statistics': True,
+                'row_group_size': max(max(chunk.height for chunk in chunks), 1),
+            }
+        ),
+    )
+
+
+def write_partition(
+    frame: pl.DataFrame,
+    store_path: Path,
+    partition_date: date,
+    sink_parquet_kwargs: dict[str, Any],
+    fixed_point_decimals: Mapping[str, int] | None = None,
+) -> Path:
+    """Write frame as a new file of a partition, renamed into place once complete
+
+    Rows are sorted by station and timestamp and split into row groups of whole
+    stations, see write_station_row_groups, so that the row group statistics let
+    readers skip all stations they filter out. Given fixed_point_decimals,
+    measurements are stored as scaled integers, see fixed_point.
+    """
+    partition_path: Path = create_partition_path(store_path, partition_date)
+    partition_path.mkdir(parents=True, exist_ok=True)
+    file_path: Path = Path(partition_path, f'part-{uuid.uuid4().hex}.parquet')
+    part_path: Path = file_path.with_name(f'{file_path.name}.part')
+    metadata: dict[str, str] | None = None
+    if fixed_point_decimals is not None:
+        frame, decimals_encoded = encode_fixed_point(frame, fixed_point_decimals)
+        metadata = create_fixed_point_metadata(decimals_encoded)
+    write_station_row_groups(
+        frame.sort('station_name', 'reference_timestamp'),
+        part_path,
+        sink_parquet_kwargs,
+        metadata,
+    )
+    part_path.replace(file_path)
+    return file_path
+
+
+def write_weather_partitions(
+    weather: pl.LazyFrame | Iterable[pl.LazyFrame],
+    store_path: Path,
+    sink_parquet_kwargs: dict[str, Any],
+    fixed_point_decimals: Mapping[str, int] | None = None,
+) -> list[Path]:
+    """Replace the content of the store with weather
+
+    Batches are collected one after the other, each adding its own file to the
+    partitions it covers.
+
+    Parameters
+    ----------
+    weather: pl.LazyFrame | Iterable[pl.LazyFrame]
+        Complete weather data, either at once or in batches of disjoint stations
+    store_path: Path
+        Root directory of the store
+    sink_parquet_kwargs: dict[str, Any]
+        Arguments passed on to write_parquet
+    fixed_point_decimals: Mapping[str, int] | None
+        Decimals per parameter to store measurements as scaled integers
+
+    Returns
+    -------
+        Paths of the written files
+    """
+    files_before: list[Path] = list_partition_files(store_path)
+    written: list[Path] = [
+        write_partition(
+            partition.drop(PARTITION_COLUMN),
+            store_path,
+            partition_date,
+            sink_parquet_kwargs,
+            fixed_point_decimals,
+        )
+        for weather_batch in (
+            (weather,) if isinstance(weather, pl.LazyFrame) else weather
+        )
+        for (partition_date,), partition in weather_batch.with_columns(
+            EXPR_PARTITION_DATE
+        )
+        .collect()
+        .partition_by(PARTITION_COLUMN, as_dict=True)
+        .items()
+    ]
+    remove_files(files_before)
+    logger.debug(f'{len(written)} partitions written to {store_path}')
+    return written
+
+
+def append_weather_partitions(
+    weather_new: pl.LazyFrame,
+    store_path: Path,
+    sink_parquet_kwargs: dict[str, Any],
+    fixed_point_decimals: Mapping[str, int] | None = None,
+) -> list[Path]:
+    """Merge new rows into the partitions they belong to
+
+    Only partitions receiving new rows are read and rewritten, so the cost scales
+    with the new data instead of the history.
+
+    Parameters
+    ----------
+    weather_new: pl.LazyFrame
+        New weather rows
+    store_path: Path
+        Root directory of the store
+    sink_parquet_kwargs: dict[str, Any]
+        Arguments passed on to write_parquet
+    fixed_point_decimals: Mapping[str, int] | None
+        Decimals per parameter to store measurements as scaled integers
+
+    Returns
+    -------
+        Paths of the written files
+    """
+    written: list[Path] = []
+    for (partition_date,), partition_new in (
+        weather_new.with_columns(EXPR_PARTITION_DATE)
+        .collect()
+        .partition_by(PARTITION_COLUMN, as_dict=True)
+        .items()
+    ):
+        files_before: list[Path] = sorted(
+            create_partition_path(store_path, partition_date).glob('*.parquet')
+        )
+        partition: pl.DataFrame = partition_new.drop(PARTITION_COLUMN)
+        if files_before:
+            partition_before: pl.DataFrame = scan_fixed_point_files(
+                files_before
+            ).collect()
+            partition = (
+                pl.concat((partition_before, partition), how='diagonal_relaxed')
+                .select(partition_before.columns)
+                .unique()
+            )
+        written.append(
+            write_partition(
+                partition,
+                store_path,
+                partition_date,
+                sink_parquet_kwargs,
+                fixed_point_decimals,
+            )
+        )
+        remove_files(files_before)
+    logger.debug(f'{len(written)} partitions updated in {store_path}')
+    return written
+
+
+def drop_expired_partitions(store_path: Path, retention_days: int) -> list[date]:
+    """Delete the directories of partitions older than retention_days
+
+    Parameters
+    ----------
+    store_path: Path
+        Root directory of the store
+    retention_days: int
+        Number of days to keep
+
+    Returns
+    -------
+        Dates of the dropped partitions
+    """
+    oldest_date: date = (
+        datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+        - timedelta(days=retention_days)
+    ).date()
+    expired: list[date] = [
+        partition_date
+        for partition_date in list_partition_dates(store_path)
+        if partition_date < oldest_date
+    ]
+    for partition_date in expired:
+        shutil.rmtree(create_partition_path(store_path, partition_date))
+    logger.debug(f'{len(expired)} expired partitions dropped from {store_path}')
+    return expired
+
+
+def remove_files(file_paths: list[Path]):
+    for file_path in file_paths:
+        file_path.unlink(missing_ok=True)
+        if file_path.parent.exists() and not any(file_path.parent.iterdir()):
+            file_path.parent.rmdir()
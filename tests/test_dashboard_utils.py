@@ -0,0 +1,210 @@
+"""Tests module meteoshrooms.dashboard.dashboard_utils.py"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import polars as pl
+import pytest
+import streamlit as st
+from polars.testing import assert_frame_equal
+
+from meteoshrooms.constants import TIMEZONE_SWITZERLAND_STRING
+from meteoshrooms.dashboard import dashboard_utils
+from meteoshrooms.dashboard.dashboard_utils import (
+    clear_shared_data,
+    drop_data_version,
+    load_manifest,
+    load_metric_data,
+    scan_weather_data,
+    warm_data_caches,
+)
+from meteoshrooms.data_preparation import fixed_point
+from meteoshrooms.data_preparation.manifest import create_manifest, publish_manifest
+from meteoshrooms.data_preparation.weather_store import write_weather_partitions
+
+
+def write_benchmark_data(data_path: Path, num_stations: int, num_days: int):
+    """Write metadata, metrics and an hourly weather store into data_path"""
+    parameters: list[str] = ['rre150h0', 'tre200h0', 'ure200h0', 'fu3010h0']
+    stations: pl.DataFrame = pl.DataFrame(
+        {
+            'station_abbr': [f'S{i:03d}' for i in range(num_stations)],
+            'station_name': [f'Station {i:03d}' for i in range(num_stations)],
+        }
+    )
+    stations.with_columns(
+        station_type_en=pl.lit('Automatic weather stations'),
+        station_height_masl=pl.lit(500.0),
+        station_coordinates_wgs84_lat=pl.lit(46.5),
+        station_coordinates_wgs84_lon=pl.lit(8.6),
+    ).write_parquet(Path(data_path, 'meta_stations.parquet'))
+    pl.DataFrame({'parameter_shortname': parameters}).write_parquet(
+        Path(data_path, 'meta_parameters.parquet')
+    )
+    stations.join(pl.DataFrame({'time_period': [3, 7, 14, 30]}), how='cross').join(
+        pl.DataFrame({'parameter': parameters}), how='cross'
+    ).with_columns(value=pl.int_range(pl.len()).cast(pl.Float64)).write_parquet(
+        Path(data_path, 'metrics.parquet')
+    )
+    timestamps: pl.Series = pl.datetime_range(
+        datetime(2025, 6, 1, tzinfo=ZoneInfo(TIMEZONE_SWITZERLAND_STRING)),
+        datetime(2025, 6, 1, tzinfo=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+        + timedelta(days=num_days),
+        interval='1h',
+        eager=True,
+    ).alias('reference_timestamp')
+    write_weather_partitions(
+        stations.lazy()
+        .join(timestamps.to_frame().lazy(), how='cross')
+        .with_columns(
+            (pl.int_range(pl.len()) % 7).cast(pl.Float32).alias(parameter)
+            for parameter in parameters
+        ),
+        Path(data_path, 'weather_data'),
+        {},
+    )
+
+
+def write_data_files(data_path: Path):
+    """Write metrics and metadata files without manifest into data_path"""
+    pl.DataFrame(
+        {
+            'station_abbr': ['AIR', 'AIR'],
+            'station_name': ['Airolo', 'Airolo'],
+            'time_period': [3, 7],
+            'parameter': ['rre150h0', 'rre150h0'],
+            'value': [1.0, 2.0],
+        }
+    ).write_parquet(Path(data_path, 'metrics.parquet'))
+    pl.DataFrame(
+        {
+            'station_abbr': ['AIR'],
+            'station_name': ['Airolo'],
+            'station_type_en': ['Automatic weather stations'],
+            'station_height_masl': [1139.0],
+            'station_coordinates_wgs84_lat': [46.5],
+            'station_coordinates_wgs84_lon': [8.6],
+        }
+    ).write_parquet(Path(data_path, 'meta_stations.parquet'))
+    pl.DataFrame({'parameter_shortname': ['rre150h0']}).write_parquet(
+        Path(data_path, 'meta_parameters.parquet')
+    )
+
+
+class TestSharedData:
+    """Tests the frames shared by all sessions"""
+
+    def test_sessions_share_one_frame(self, tmp_path, monkeypatch):
+        """Tests whether all callers get the same frame until it is cleared"""
+        monkeypatch.setattr(dashboard_utils, 'DATA_PATH', tmp_path)
+        write_data_files(tmp_path)
+        clear_shared_data()
+        metrics: pl.DataFrame = load_metric_data('v1')
+        assert load_metric_data('v1') is metrics
+        clear_shared_data()
+        assert load_metric_data('v1') is not metrics
+        assert load_metric_data('v1').equals(metrics)
+
+    def test_metrics_of_station_missing_from_metadata(self, tmp_path, monkeypatch):
+        """Tests whether metrics of a station dropped from the metadata are skipped"""
+        monkeypatch.setattr(dashboard_utils, 'DATA_PATH', tmp_path)
+        write_data_files(tmp_path)
+        metrics_path: Path = Path(tmp_path, 'metrics.parquet')
+        metrics: pl.DataFrame = pl.read_parquet(metrics_path)
+        pl.concat(
+            (
+                metrics,
+                metrics.with_columns(
+                    pl.lit('OLD').alias('station_abbr'),
+                    pl.lit('Old Station').alias('station_name'),
+                ),
+            )
+        ).write_parquet(metrics_path)
+        clear_shared_data()
+        assert load_metric_data('v1').get_column('station_abbr').to_list() == [
+            'AIR',
+            'AIR',
+        ]
+
+    def test_new_version_warmed_next_to_current(self, tmp_path, monkeypatch):
+        """Tests whether warming keeps the current version until it is dropped"""
+        monkeypatch.setattr(dashboard_utils, 'DATA_PATH', tmp_path)
+        write_data_files(tmp_path)
+        clear_shared_data()
+        metrics: pl.DataFrame = load_metric_data('v1')
+        warm_data_caches('v2')
+        assert load_metric_data('v1') is metrics
+        metrics_new: pl.DataFrame = load_metric_data('v2')
+        drop_data_version('v1')
+        assert load_metric_data('v2') is metrics_new
+        assert load_metric_data('v1') is not metrics
+
+    def test_load_manifest_of_data_version(self, tmp_path, monkeypatch):
+        """Tests whether a stale version never gets the manifest of the newest"""
+        monkeypatch.setattr(dashboard_utils, 'DATA_PATH', tmp_path)
+        clear_shared_data()
+        for version in ('v1', 'v2'):
+            publish_manifest({'version': version, 'files': {}}, tmp_path)
+        assert load_manifest('v1')['version'] == 'v1'
+        assert load_manifest('v2')['version'] == 'v2'
+        with pytest.raises(FileNotFoundError):
+            load_manifest('v0')
+
+    def test_weather_files_grouped_from_manifest(self, tmp_path, monkeypatch):
+        """Tests whether reruns scan the weather files without reading metadata"""
+        monkeypatch.setattr(dashboard_utils, 'DATA_PATH', tmp_path)
+        clear_shared_data()
+        weather: pl.DataFrame = pl.DataFrame(
+            {
+                'station_abbr': ['AIR', 'AIR'],
+                'station_name': ['Airolo', 'Airolo'],
+                'reference_timestamp': ['2025-06-01 00:00', '2025-06-01 01:00'],
+                'rre150h0': pl.Series([0.1, 0.2], dtype=pl.Float32),
+            }
+        ).with_columns(pl.col('reference_timestamp').str.to_datetime())
+        weather_files: list[Path] = write_weather_partitions(
+            weather.lazy(), Path(tmp_path, 'weather_data'), {}, {'rre150h0': 1}
+        )
+        publish_manifest(create_manifest('v1', {}, weather_files, tmp_path), tmp_path)
+        monkeypatch.setattr(fixed_point, 'read_fixed_point_decimals', None)
+        assert_frame_equal(
+            scan_weather_data('v1').select('rre150h0').collect(),
+            weather.select('rre150h0'),
+        )
+
+    def test_shared_data_memory(self, tmp_path, monkeypatch):
+        """Tests whether sessions share the loaded frames instead of copies"""
+        monkeypatch.setattr(dashboard_utils, 'DATA_PATH', tmp_path)
+        monkeypatch.setattr(
+            dashboard_utils, 'WEATHER_STORE_PATH', Path(tmp_path, 'weather_data')
+        )
+        write_benchmark_data(tmp_path, num_stations=150, num_days=31)
+        clear_shared_data()
+        num_sessions: int = 20
+
+        def load_weather_frame(data_version: str) -> pl.DataFrame:
+            return scan_weather_data(data_version).collect()
+
+        megabytes: dict[str, float] = {}
+        for name, loaders in (
+            (
+                'cache_data',
+                (
+                    st.cache_data(load_metric_data.__wrapped__),
+                    st.cache_data(load_weather_frame),
+                ),
+            ),
+            (
+                'cache_resource',
+                (load_metric_data, st.cache_resource(load_weather_frame)),
+            ),
+        ):
+            frames: list[pl.DataFrame] = [
+                load('v1') for _ in range(num_sessions) for load in loaders
+            ]
+            megabytes[name] = (
+                sum({id(frame): frame.estimated_size() for frame in frames}.values())
+                / 1024**2
+            )
+        assert megabytes['cache_resource'] <= megabytes['cache_data'] / num_sessions
@@ -1,21 +1,111 @@
 """Tests module meteoshrooms.data_preparation.data_preparation.py"""
 
+import functools
+import hashlib
+import itertools
+import threading
+import time
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from zoneinfo import ZoneInfo
 
 import polars as pl
 import polars.selectors as cs
 import pytest
 from polars.testing import assert_frame_equal
 
+from meteoshrooms.constants import TIMEZONE_SWITZERLAND_STRING, WEATHER_FILE_NAME
+from meteoshrooms.data_preparation import data_preparation
+from meteoshrooms.data_preparation.categories import (
+    cast_categories,
+    create_category_schema,
+    encode_categories,
+    expr_is_in_categories,
+)
 from meteoshrooms.data_preparation.constants import (
     COLS_TO_KEEP_META_DATAINVENTORY,
     COLS_TO_KEEP_META_PARAMETERS,
     COLS_TO_KEEP_META_STATIONS,
+    EXPR_WEATHER_AGGREGATION_TYPES,
+    PARQUET_WRITE_PROFILES,
     SCHEMA_META_DATAINVENTORY,
     SCHEMA_META_PARAMETERS,
     SCHEMA_META_STATIONS,
 )
-from meteoshrooms.data_preparation.data_preparation import load_metadata
+from meteoshrooms.data_preparation.csv_ingestion import (
+    group_files_by_header,
+    scan_csv_files,
+)
+from meteoshrooms.data_preparation.data_preparation import (
+    concat_metrics_frame,
+    create_download_session,
+    create_metrics,
+    create_weather_batch,
+    create_weather_batches,
+    create_weather_rollup,
+    download_files,
+    generate_download_urls,
+    load_metadata,
+    plan_station_batches,
+    update_weather_data,
+    write_ipc_snapshot,
+    write_weather_rollup,
+)
+from meteoshrooms.data_preparation.download_cache import (
+    create_cache_entry_paths,
+    evict_cache_entries,
+    fetch_url_to_cache,
+)
+from meteoshrooms.data_preparation.download_plan import create_download_plan
+from meteoshrooms.data_preparation.fixed_point import (
+    encode_fixed_point,
+    expr_decode_fixed_point,
+    group_fixed_point_files,
+    read_fixed_point_decimals,
+)
+from meteoshrooms.data_preparation.incremental_metrics import (
+    aggregate_time_periods,
+    combine_daily_partials,
+    create_daily_partials,
+    create_store_daily_partials,
+    update_daily_partials,
+)
+from meteoshrooms.data_preparation.manifest import (
+    create_manifest,
+    create_version_id,
+    export_version,
+    link_weather_files,
+    publish_manifest,
+    read_manifest,
+    remove_unreferenced_versions,
+)
+from meteoshrooms.data_preparation.map_frames import (
+    MAP_FRAME_STATION_COLUMNS,
+    create_map_frames,
+    pivot_metrics,
+)
+from meteoshrooms.data_preparation.weather_store import (
+    append_weather_partitions,
+    drop_expired_partitions,
+    list_partition_dates,
+    list_partition_files,
+    read_max_timestamp,
+    read_partition_date,
+    read_station_max_timestamps,
+    scan_weather_store,
+    write_weather_partitions,
+)
+
+DOWNLOAD_LATENCY_SECONDS: float = 0.05
+FIXED_POINT_DECIMALS: dict[str, int] = {
+    'rre150h0': 1,
+    'tre200h0': 1,
+    'ure200h0': 1,
+    'fu3010h0': 1,
+    'tde200h0': 1,
+}
 
 
 @pytest.fixture(scope='session')
@@ -29,6 +119,133 @@ def temporary_data_path(tmp_path_factory):
     return tmp_path_factory.mktemp('data')
 
 
+class LatencyRequestHandler(SimpleHTTPRequestHandler):
+    """Serve test data files with an injected latency per request"""
+
+    def do_GET(self):
+        time.sleep(DOWNLOAD_LATENCY_SECONDS)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def local_http_server_url(test_data_path):
+    """Local HTTP stand-in serving the CSV test data"""
+    server: ThreadingHTTPServer = ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        functools.partial(LatencyRequestHandler, directory=str(test_data_path)),
+    )
+    thread: threading.Thread = threading.Thread(
+        target=server.serve_forever, daemon=True
+    )
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def test_data_urls(test_data_path, local_http_server_url):
+    """URLs of all CSV test data files on the local HTTP stand-in"""
+    return [
+        f'{local_http_server_url}/{file_path.name}'
+        for file_path in sorted(test_data_path.glob('*_test_data.csv'))
+    ]
+
+
+def create_synthetic_weather(
+    num_stations: int, num_days: int, end: datetime | None = None
+) -> pl.LazyFrame:
+    """Creates hourly weather data for num_stations over the last num_days"""
+    end = end or datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING)).replace(
+        minute=0, second=0, microsecond=0
+    )
+    timestamps: pl.Series = pl.datetime_range(
+        end - timedelta(days=num_days),
+        end,
+        interval='1h',
+        time_zone=TIMEZONE_SWITZERLAND_STRING,
+        eager=True,
+    ).alias('reference_timestamp')
+    stations: pl.DataFrame = pl.DataFrame(
+        {
+            'station_abbr': [f'S{i:03d}' for i in range(num_stations)],
+            'station_name': [f'Station {i:03d}' for i in range(num_stations)],
+        }
+    )
+    hour_index: pl.Expr = pl.int_range(pl.len()).over('station_abbr')
+    return (
+        stations.lazy()
+        .join(timestamps.to_frame().lazy(), how='cross')
+        .with_columns(
+            rre150h0=(hour_index % 7).cast(pl.Float32) / 10,
+            tre200h0=(hour_index % 24).cast(pl.Float32),
+            ure200h0=(hour_index % 100).cast(pl.Float32),
+            fu3010h0=(hour_index % 13).cast(pl.Float32),
+            tde200h0=(hour_index % 11).cast(pl.Float32),
+        )
+        .select(
+            'station_abbr',
+            'reference_timestamp',
+            'rre150h0',
+            'tre200h0',
+            'ure200h0',
+            'fu3010h0',
+            'tde200h0',
+            'station_name',
+        )
+    )
+
+
+@pytest.fixture(scope='module')
+def station_files(tmp_path_factory):
+    """Writes 'now' and 'recent' CSV files for synthetic stations
+
+    Returns the download directory, the station names per station type and the
+    station metadata.
+    """
+    down_path: Path = tmp_path_factory.mktemp('stations')
+    weather: pl.DataFrame = (
+        create_synthetic_weather(num_stations=6, num_days=3)
+        .with_columns(
+            pl.col('reference_timestamp')
+            .dt.replace_time_zone(None)
+            .dt.strftime('%d.%m.%Y %H:%M'),
+        )
+        .collect()
+    )
+    station_series_by_type: dict[str, pl.Series] = {
+        'weather': pl.Series(['s000', 's001', 's002', 's003']),
+        'rainfall': pl.Series(['s004', 's005']),
+    }
+    for station_type, station_series in station_series_by_type.items():
+        for station in station_series:
+            station_weather: pl.DataFrame = weather.filter(
+                pl.col('station_abbr') == station.upper()
+            ).drop('station_name')
+            if station_type == 'rainfall':
+                station_weather = station_weather.select(
+                    'station_abbr', 'reference_timestamp', 'rre150h0'
+                )
+            for timeframe, frame in zip(
+                ('recent', 'now'),
+                (station_weather.head(48), station_weather.tail(-48)),
+                strict=True,
+            ):
+                url: str = generate_download_urls(
+                    pl.Series([station]), station_type, timeframe
+                ).item()
+                frame.write_csv(Path(down_path, Path(url).name), separator=';')
+    metadata: pl.LazyFrame = (
+        weather.select(pl.col('station_abbr').str.to_uppercase(), 'station_name')
+        .unique()
+        .lazy()
+    )
+    return down_path, station_series_by_type, metadata
+
+
 @pytest.fixture(scope='session')
 def meta_file_path_dict(test_data_path):
     """Creates Dictionary with local metadata file paths"""
@@ -177,3 +394,1058 @@ class TestLoadMetadata:
         assert_frame_equal(
             self.lf_meta_datainventory, lf_meta_datainventory_test_result
         )
+
+
+class TestDownloadFiles:
+    """Tests function download_files()"""
+
+    def test_download_files_writes_all_files(
+        self, test_data_path, test_data_urls, tmp_path
+    ):
+        """Tests whether every file is downloaded with unchanged content"""
+        download_files(test_data_urls, tmp_path, max_workers=4)
+        for url in test_data_urls:
+            file_name: str = Path(url).name
+            assert (
+                Path(tmp_path, file_name).read_bytes()
+                == Path(test_data_path, file_name).read_bytes()
+            )
+
+    def test_download_files_reports_bytes_and_checksum(
+        self, test_data_path, test_data_urls, tmp_path
+    ):
+        """Tests whether the report matches the downloaded files"""
+        reports = download_files(test_data_urls, tmp_path, checksum=True)
+        assert len(reports) == len(test_data_urls)
+        for report in reports:
+            content: bytes = Path(test_data_path, report.file_path.name).read_bytes()
+            assert report.num_bytes == len(content)
+            assert report.sha256 == hashlib.sha256(content).hexdigest()
+        assert not tuple(tmp_path.glob('*.part'))
+
+    def test_download_files_skips_failed_downloads(
+        self, test_data_urls, local_http_server_url, tmp_path, caplog
+    ):
+        """Tests whether error responses are logged instead of written as files"""
+        url_missing: str = f'{local_http_server_url}/missing_test_data.csv'
+        reports = download_files([*test_data_urls, url_missing], tmp_path)
+        assert len(reports) == len(test_data_urls)
+        assert not Path(tmp_path, 'missing_test_data.csv').exists()
+        assert f'download of {url_missing} failed' in caplog.text
+
+    def test_download_files_runs_concurrently(
+        self, test_data_urls, tmp_path, monkeypatch
+    ):
+        """Tests whether all downloads are in flight at the same time
+
+        Every download waits at a barrier for all others, so a sequential
+        download would break the barrier and fail.
+        """
+        barrier: threading.Barrier = threading.Barrier(len(test_data_urls), timeout=10)
+        stream_response_to_file = data_preparation.stream_response_to_file
+
+        def stream_response_to_file_together(*args, **kwargs):
+            barrier.wait()
+            return stream_response_to_file(*args, **kwargs)
+
+        monkeypatch.setattr(
+            data_preparation,
+            'stream_response_to_file',
+            stream_response_to_file_together,
+        )
+        reports = download_files(
+            test_data_urls, tmp_path, max_workers=len(test_data_urls)
+        )
+        assert len(reports) == len(test_data_urls)
+        assert not barrier.broken
+
+
+class TestDownloadCache:
+    """Tests the conditional download cache"""
+
+    def test_fetch_url_to_cache_reuses_file_if_not_modified(
+        self, test_data_urls, tmp_path
+    ):
+        """Tests whether a 304 response keeps the cached file"""
+        url: str = test_data_urls[0]
+        with create_download_session(max_workers=1) as s:
+            data_path: Path = fetch_url_to_cache(s, url, tmp_path)
+            data_path.write_bytes(b'cached')
+            assert fetch_url_to_cache(s, url, tmp_path) == data_path
+        assert data_path.read_bytes() == b'cached'
+
+    def test_evict_cache_entries_keeps_cache_below_max_bytes(
+        self, test_data_urls, tmp_path
+    ):
+        """Tests whether least recently used entries are evicted first"""
+        with create_download_session(max_workers=1) as s:
+            data_paths: list[Path] = [
+                fetch_url_to_cache(s, url, tmp_path) for url in test_data_urls[:3]
+            ]
+        newest_entry_size: int = data_paths[-1].stat().st_size
+        num_evicted: int = evict_cache_entries(tmp_path, newest_entry_size)
+        assert num_evicted == 2
+        assert [p.exists() for p in data_paths] == [False, False, True]
+        assert not create_cache_entry_paths(tmp_path, test_data_urls[0])[1].exists()
+
+
+class TestWeatherStore:
+    """Tests the day-partitioned weather store"""
+
+    def test_write_weather_partitions_round_trip(self, tmp_path):
+        """Tests whether the store returns the written data, one partition per day"""
+        weather: pl.LazyFrame = create_synthetic_weather(num_stations=3, num_days=4)
+        write_weather_partitions(weather, tmp_path, {})
+        assert len(list_partition_dates(tmp_path)) == 5
+        assert_frame_equal(
+            scan_weather_store(tmp_path),
+            weather,
+            check_row_order=False,
+        )
+
+    def test_scan_weather_store_empty(self, tmp_path):
+        """Tests whether an empty store is scanned with the schema of a filled one"""
+        weather: pl.LazyFrame = scan_weather_store(Path(tmp_path, 'empty'))
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=2, num_days=1),
+            Path(tmp_path, 'filled'),
+            {},
+        )
+        assert weather.collect_schema() == (
+            scan_weather_store(Path(tmp_path, 'filled')).collect_schema()
+        )
+        assert create_weather_rollup(weather, '1d').collect().is_empty()
+
+    def test_append_weather_partitions_only_rewrites_affected_days(self, tmp_path):
+        """Tests whether untouched partitions keep their files"""
+        weather: pl.LazyFrame = create_synthetic_weather(num_stations=3, num_days=4)
+        write_weather_partitions(weather, tmp_path, {})
+        files_before: list[Path] = list_partition_files(tmp_path)
+        max_timestamp: datetime | None = read_max_timestamp(tmp_path)
+        assert max_timestamp is not None
+        weather_new: pl.LazyFrame = create_synthetic_weather(
+            num_stations=3, num_days=0, end=max_timestamp + timedelta(hours=1)
+        )
+        append_weather_partitions(pl.concat((weather_new, weather_new)), tmp_path, {})
+        new_partition_name: str = f'date={(max_timestamp + timedelta(hours=1)).date()}'
+        files_after: list[Path] = list_partition_files(tmp_path)
+        assert {
+            file_path
+            for file_path in files_before
+            if file_path.parent.name != new_partition_name
+        } == {
+            file_path
+            for file_path in files_after
+            if file_path.parent.name != new_partition_name
+        }
+        assert scan_weather_store(tmp_path).select(pl.len()).collect().item() == (
+            weather.select(pl.len()).collect().item() + 3
+        )
+
+    def test_write_weather_partitions_sorts_by_station(self, tmp_path):
+        """Tests whether partition files are sorted by station and timestamp"""
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=5, num_days=1).sort(
+                'reference_timestamp'
+            ),
+            tmp_path,
+            {},
+        )
+        for file_path in list_partition_files(tmp_path):
+            partition: pl.DataFrame = pl.read_parquet(file_path)
+            assert_frame_equal(
+                partition, partition.sort('station_name', 'reference_timestamp')
+            )
+
+    def test_write_weather_partitions_row_groups_hold_whole_stations(self, tmp_path):
+        """Tests whether row groups split partitions between stations"""
+        pq = pytest.importorskip('pyarrow.parquet')
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=20, num_days=2),
+            tmp_path,
+            PARQUET_WRITE_PROFILES['fast'],
+        )
+        for file_path in list_partition_files(tmp_path):
+            metadata = pq.read_metadata(file_path)
+            station_name_index: int = metadata.schema.names.index('station_name')
+            station_ranges: list[tuple[str, str]] = [
+                (statistics.min, statistics.max)
+                for statistics in (
+                    metadata.row_group(i).column(station_name_index).statistics
+                    for i in range(metadata.num_row_groups)
+                )
+            ]
+            assert len(station_ranges) == 3
+            assert all(
+                range_before[1] < range_after[0]
+                for range_before, range_after in itertools.pairwise(station_ranges)
+            )
+
+    def test_drop_expired_partitions_deletes_directories(self, tmp_path):
+        """Tests whether partitions older than the retention are dropped"""
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=2, num_days=10), tmp_path, {}
+        )
+        expired = drop_expired_partitions(tmp_path, retention_days=5)
+        assert len(expired) == 5
+        assert list_partition_dates(tmp_path)[0] > expired[-1]
+
+
+class TestIncrementalMetrics:
+    """Tests metrics combined from daily partial aggregates"""
+
+    def test_incremental_metrics_equal_full_recomputation(self, tmp_path):
+        """Tests whether updated partials give the same metrics as a full pass"""
+        weather: pl.LazyFrame = create_synthetic_weather(num_stations=4, num_days=32)
+        write_weather_partitions(weather, tmp_path, {})
+        daily_partials: pl.DataFrame = create_daily_partials(
+            scan_weather_store(tmp_path)
+        ).collect()
+        max_timestamp: datetime | None = read_max_timestamp(tmp_path)
+        assert max_timestamp is not None
+        files_written: list[Path] = append_weather_partitions(
+            create_synthetic_weather(
+                num_stations=4, num_days=0, end=max_timestamp + timedelta(hours=1)
+            ),
+            tmp_path,
+            {},
+        )
+        time_periods: dict[int, datetime] = {
+            period: max_timestamp - timedelta(days=period, minutes=30)
+            for period in (3, 7, 14, 30)
+        }
+        daily_partials_updated: pl.LazyFrame = update_daily_partials(
+            daily_partials.lazy(),
+            tmp_path,
+            {read_partition_date(file_path) for file_path in files_written},
+            retention_days=31,
+        )
+        assert_frame_equal(
+            combine_daily_partials(daily_partials_updated, tmp_path, time_periods),
+            concat_metrics_frame(time_periods, scan_weather_store(tmp_path)),
+            check_row_order=False,
+            check_column_order=False,
+            rel_tol=1e-5,
+        )
+
+    def test_store_daily_partials_equal_full_pass(self, tmp_path):
+        """Tests whether partials aggregated per partition match a full pass"""
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=4, num_days=3), tmp_path, {}
+        )
+        assert_frame_equal(
+            create_store_daily_partials(tmp_path),
+            create_daily_partials(scan_weather_store(tmp_path)).collect(),
+            check_row_order=False,
+        )
+        assert create_store_daily_partials(Path(tmp_path, 'empty')).is_empty()
+
+
+def concat_metrics_frame_per_period(
+    time_periods: dict[int, datetime], weather_data: pl.LazyFrame
+) -> pl.LazyFrame:
+    """Reference implementation with one filtered aggregation per time period"""
+    return pl.concat(
+        tuple(
+            weather_data.filter(pl.col('reference_timestamp') >= datetime_period)
+            .drop('reference_timestamp')
+            .group_by(('station_abbr', 'station_name'))
+            .agg(*EXPR_WEATHER_AGGREGATION_TYPES)
+            .with_columns(pl.lit(period).alias('time_period').cast(pl.Int8))
+            for period, datetime_period in time_periods.items()
+        )
+    )
+
+
+class TestAggregateTimePeriods:
+    """Tests the single-pass aggregation of all time periods"""
+
+    @pytest.mark.parametrize('periods', [(3, 7, 14, 30), (1, 2, 60, 90, 45)])
+    def test_aggregate_time_periods_equals_per_period_aggregation(self, periods):
+        """Tests whether any set of time periods matches the per-period path"""
+        weather: pl.LazyFrame = create_synthetic_weather(num_stations=5, num_days=95)
+        now: datetime = datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+        time_periods: dict[int, datetime] = {
+            period: now - timedelta(days=period) for period in periods
+        }
+        assert_frame_equal(
+            aggregate_time_periods(weather, time_periods),
+            concat_metrics_frame_per_period(time_periods, weather),
+            check_row_order=False,
+            rel_tol=1e-5,
+        )
+
+    def test_aggregate_time_periods_scans_weather_once(self):
+        """Tests whether all periods of two years are aggregated in one scan"""
+        weather: pl.LazyFrame = (
+            create_synthetic_weather(num_stations=4, num_days=730).collect().lazy()
+        )
+        now: datetime = datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+        time_periods: dict[int, datetime] = {
+            period: now - timedelta(days=period) for period in (3, 7, 14, 30, 90)
+        }
+        metrics: pl.LazyFrame = aggregate_time_periods(weather, time_periods)
+        metrics_per_period: pl.LazyFrame = concat_metrics_frame_per_period(
+            time_periods, weather
+        )
+        assert metrics.explain().count('DF ["station_abbr"') == 1
+        assert metrics_per_period.explain().count('DF ["station_abbr"') == len(
+            time_periods
+        )
+        assert_frame_equal(
+            metrics.collect(),
+            metrics_per_period.collect(),
+            check_row_order=False,
+            rel_tol=1e-5,
+        )
+
+
+class TestParquetWriteProfiles:
+    """Tests the Parquet write profiles"""
+
+    @pytest.mark.parametrize('profile', PARQUET_WRITE_PROFILES.keys())
+    def test_parquet_write_profile_round_trip(self, profile, tmp_path):
+        """Tests whether a file written with a write profile reads back unchanged"""
+        weather: pl.DataFrame = create_synthetic_weather(
+            num_stations=150, num_days=31
+        ).collect()
+        file_path: Path = Path(tmp_path, 'weather_data.parquet')
+        weather.write_parquet(file_path, **PARQUET_WRITE_PROFILES[profile])
+        weather_read: pl.DataFrame = pl.read_parquet(file_path).with_columns(
+            pl.col('reference_timestamp').dt.replace_time_zone(
+                TIMEZONE_SWITZERLAND_STRING, non_existent='null'
+            )
+        )
+        assert_frame_equal(weather_read, weather)
+
+
+class TestCreateWeatherRollup:
+    """Tests function create_weather_rollup()"""
+
+    @pytest.mark.parametrize(('every', 'hours'), [('6h', 6), ('1d', 24)])
+    def test_create_weather_rollup_totals_match_hourly_data(self, every, hours):
+        """Tests whether the windows keep the precipitation total per station"""
+        weather: pl.LazyFrame = create_synthetic_weather(num_stations=3, num_days=5)
+        rollup: pl.DataFrame = create_weather_rollup(weather, every).collect()
+        assert (
+            rollup.group_by('station_abbr').agg(pl.len()).get_column('len').max()
+            <= 5 * 24 // hours + 2
+        )
+        assert_frame_equal(
+            rollup.group_by('station_abbr').agg(pl.sum('rre150h0')),
+            weather.group_by('station_abbr').agg(pl.sum('rre150h0')).collect(),
+            check_row_order=False,
+            rel_tol=1e-5,
+        )
+
+    def test_write_weather_rollup_row_groups_skip_stations(self, tmp_path):
+        """Tests whether every row group of a rollup has its own station range"""
+        pq = pytest.importorskip('pyarrow.parquet')
+        store_path: Path = Path(tmp_path, 'weather_data')
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=40, num_days=3), store_path, {}
+        )
+        metadata = pq.ParquetFile(
+            write_weather_rollup(
+                store_path, '6h', Path(tmp_path, 'weather_rollup_6h.parquet'), {}
+            )
+        ).metadata
+        station_name_index: int = metadata.schema.names.index('station_name')
+        station_ranges: list[tuple[str, str]] = [
+            (statistics.min, statistics.max)
+            for statistics in (
+                metadata.row_group(i).column(station_name_index).statistics
+                for i in range(metadata.num_row_groups)
+            )
+        ]
+        assert len(station_ranges) == 5
+        assert all(
+            range_before[1] < range_after[0]
+            for range_before, range_after in itertools.pairwise(station_ranges)
+        )
+
+    def test_write_weather_rollup_equals_full_rollup(self, tmp_path):
+        """Tests whether the rollup written per partition matches a full pass"""
+        store_path: Path = Path(tmp_path, 'weather_data')
+        write_weather_partitions(
+            create_synthetic_weather(num_stations=4, num_days=3), store_path, {}
+        )
+        assert_frame_equal(
+            pl.read_parquet(
+                write_weather_rollup(
+                    store_path, '1d', Path(tmp_path, 'weather_rollup_1d.parquet'), {}
+                )
+            ),
+            create_weather_rollup(scan_weather_store(store_path), '1d')
+            .sort('station_name', 'reference_timestamp')
+            .collect(),
+        )
+
+
+KWARGS_LAZYFRAME_TEST: dict = {
+    'separator': ';',
+    'try_parse_dates': True,
+    'schema_overrides': {
+        parameter: pl.Float32
+        for parameter in ('rre150h0', 'tre200h0', 'ure200h0', 'fu3010h0', 'tde200h0')
+    },
+}
+
+
+class TestStationBatches:
+    """Tests the memory-bounded batching of station files"""
+
+    def test_plan_station_batches_respects_memory_limit(self, station_files):
+        """Tests whether a small limit splits stations without losing any"""
+        down_path, station_series_by_type, _ = station_files
+        batches = plan_station_batches(down_path, station_series_by_type, 1)
+        assert len(batches) == 6
+        assert len(plan_station_batches(down_path, station_series_by_type, None)) == 2
+        assert sorted(
+            url for batch in batches for urls in batch for url in urls
+        ) == sorted(
+            url
+            for batch in plan_station_batches(down_path, station_series_by_type, None)
+            for urls in batch
+            for url in urls
+        )
+
+    def test_create_weather_batch_equal_for_any_batch_size(self, station_files):
+        """Tests whether batched loading gives the same rows as a single batch"""
+        down_path, station_series_by_type, metadata = station_files
+        frames: dict[int | None, pl.DataFrame] = {
+            memory_limit_bytes: pl.concat(
+                (
+                    create_weather_batch(
+                        down_path, KWARGS_LAZYFRAME_TEST, metadata, station_urls
+                    )
+                    for station_urls in plan_station_batches(
+                        down_path, station_series_by_type, memory_limit_bytes
+                    )
+                ),
+                how='diagonal',
+            ).collect()
+            for memory_limit_bytes in (1, None)
+        }
+        assert frames[None].get_column('station_abbr').n_unique() == 6
+        assert_frame_equal(frames[1], frames[None], check_row_order=False)
+
+    def test_create_weather_batches_consumed_one_at_a_time(
+        self, station_files, tmp_path, monkeypatch
+    ):
+        """Tests whether a batch is only loaded once the previous one is written"""
+        down_path, station_series_by_type, metadata = station_files
+        num_files_per_load: list[int] = []
+
+        def create_weather_batch_recorded(*args, **kwargs) -> pl.LazyFrame:
+            num_files_per_load.append(len(list(tmp_path.rglob('*.parquet'))))
+            return create_weather_batch(*args, **kwargs)
+
+        monkeypatch.setattr(
+            data_preparation, 'create_weather_batch', create_weather_batch_recorded
+        )
+        weather_batches: Iterator[pl.LazyFrame] = create_weather_batches(
+            down_path,
+            KWARGS_LAZYFRAME_TEST,
+            metadata,
+            plan_station_batches(down_path, station_series_by_type, 1),
+        )
+        assert num_files_per_load == []
+        write_weather_partitions(weather_batches, tmp_path, {})
+        assert len(num_files_per_load) == 6
+        assert num_files_per_load[0] == 0
+        assert all(
+            num_files_before < num_files_after
+            for num_files_before, num_files_after in itertools.pairwise(
+                num_files_per_load
+            )
+        )
+
+
+class TestCsvIngestion:
+    """Tests the schema-drift-tolerant scanning of station CSV files"""
+
+    @pytest.fixture
+    def drifted_files(self, tmp_path) -> list[Path]:
+        contents: dict[str, str] = {
+            'a.csv': 'station_abbr;reference_timestamp;tre200h0\n'
+            'AAA;01.01.2025 00:00;1.5\n',
+            'b.csv': 'station_abbr;reference_timestamp;tre200h0\n'
+            'BBB;01.01.2025 00:00;2.5\n',
+            'c.csv': 'reference_timestamp;station_abbr;rre150h0;tre200h0\n'
+            '01.01.2025 00:00;CCC;0.5;3.5\n',
+            'empty.csv': '',
+            'broken.csv': '<html>Not Found</html>\n',
+        }
+        for file_name, content in contents.items():
+            Path(tmp_path, file_name).write_text(content)
+        return [Path(tmp_path, file_name) for file_name in (*contents, 'missing.csv')]
+
+    def test_group_files_by_header(self, drifted_files):
+        """Tests whether files are grouped by header and unusable files dropped"""
+        groups = group_files_by_header(drifted_files)
+        assert sorted(sorted(p.name for p in paths) for paths in groups.values()) == [
+            ['a.csv', 'b.csv'],
+            ['c.csv'],
+        ]
+
+    def test_scan_csv_files_with_drift(self, drifted_files):
+        """Tests whether drifting files are combined lazily without losing rows"""
+        frame = scan_csv_files(drifted_files, KWARGS_LAZYFRAME_TEST)
+        assert isinstance(frame, pl.LazyFrame)
+        result = frame.sort('station_abbr').collect()
+        assert result.get_column('station_abbr').to_list() == ['AAA', 'BBB', 'CCC']
+        assert result.get_column('tre200h0').to_list() == [1.5, 2.5, 3.5]
+        assert result.get_column('rre150h0').to_list() == [None, None, 0.5]
+        assert result.schema['tre200h0'] == pl.Float32
+        assert result.schema['reference_timestamp'] == pl.Datetime('us')
+
+    def test_scan_csv_files_from_columnar_cache(self, drifted_files, tmp_path):
+        """Tests whether cached files give the same rows and are parsed only once"""
+        cache_dir = Path(tmp_path, 'columnar')
+        expected = scan_csv_files(drifted_files, KWARGS_LAZYFRAME_TEST).collect()
+        result = scan_csv_files(drifted_files, KWARGS_LAZYFRAME_TEST, cache_dir)
+        assert_frame_equal(result.collect(), expected, check_row_order=False)
+        cache_files = list(cache_dir.glob('*.parquet'))
+        assert len(cache_files) == 3
+        drifted_files[0].write_text(
+            'station_abbr;reference_timestamp;tre200h0\nAAA;01.01.2025 00:00;9.5\n'
+        )
+        result = scan_csv_files(drifted_files, KWARGS_LAZYFRAME_TEST, cache_dir)
+        assert result.filter(pl.col('station_abbr') == 'AAA').collect().item(
+            0, 'tre200h0'
+        ) == pytest.approx(9.5)
+        assert len(list(cache_dir.glob('*.parquet'))) == 4
+        assert all(p.exists() for p in cache_files)
+
+    def test_scan_csv_files_without_usable_files(self, drifted_files):
+        """Tests whether an empty frame is returned if no file can be ingested"""
+        result = scan_csv_files(drifted_files[3:], KWARGS_LAZYFRAME_TEST).collect()
+        assert result.is_empty()
+        assert result.columns == ['station_abbr', 'reference_timestamp']
+
+
+class TestIpcSnapshot:
+    """Tests the uncompressed Arrow IPC snapshots for the dashboard"""
+
+    def test_write_ipc_snapshot_memory_mapped(self, tmp_path):
+        """Tests whether the snapshot is uncompressed and read back unchanged"""
+        weather = create_synthetic_weather(num_stations=3, num_days=2).collect()
+        file_path = write_ipc_snapshot(
+            weather.lazy(), Path(tmp_path, 'weather_data.arrow')
+        )
+        assert not list(tmp_path.glob('*.part'))
+        assert_frame_equal(pl.scan_ipc(file_path, memory_map=True).collect(), weather)
+        assert file_path.stat().st_size >= weather.estimated_size() // 2
+
+
+def publish_test_version(data_path: Path, weather: pl.LazyFrame) -> dict:
+    """Publishes a version with the weather files and a metrics file"""
+    store_path: Path = Path(data_path, 'weather_data')
+    version: str = create_version_id()
+    version_path: Path = Path(data_path, 'versions', version)
+    weather_files = link_weather_files(
+        write_weather_partitions(weather, store_path, {}), store_path, version_path
+    )
+    metrics_path: Path = Path(version_path, 'metrics.parquet')
+    pl.DataFrame({'value': [1.0, 2.0]}).write_parquet(metrics_path)
+    manifest = create_manifest(
+        version, {'metrics.parquet': metrics_path}, weather_files, data_path
+    )
+    publish_manifest(manifest, data_path)
+    return manifest
+
+
+class TestManifest:
+    """Tests the versioned publishing of data files through the manifest"""
+
+    def test_publish_manifest(self, tmp_path):
+        """Tests whether the manifest lists files, checksums and statistics"""
+        assert read_manifest(tmp_path) is None
+        weather = create_synthetic_weather(num_stations=3, num_days=2).collect()
+        manifest = publish_test_version(tmp_path, weather.lazy())
+        assert read_manifest(tmp_path) == manifest
+        assert not list(tmp_path.glob('*.part'))
+        assert manifest['num_rows'] == {'metrics.parquet': 2}
+        assert manifest['weather']['num_rows'] == weather.height
+        assert manifest['weather']['num_stations'] == 3
+        assert set(manifest['checksums']) == {
+            *manifest['files'].values(),
+            *manifest['weather_files'],
+        }
+        assert all(
+            manifest['checksums'][relative_path]
+            == hashlib.sha256(Path(tmp_path, relative_path).read_bytes()).hexdigest()
+            for relative_path in manifest['weather_files']
+        )
+
+    def test_read_manifest_of_previous_version(self, tmp_path):
+        """Tests whether a previous version keeps its manifest after publishing"""
+        weather = create_synthetic_weather(num_stations=2, num_days=1)
+        manifest_before = publish_test_version(tmp_path, weather)
+        manifest = publish_test_version(tmp_path, weather)
+        assert read_manifest(tmp_path) == manifest
+        assert read_manifest(tmp_path, manifest_before['version']) == manifest_before
+        assert read_manifest(tmp_path, 'removed') is None
+
+    def test_published_files_outlive_store_updates(self, tmp_path):
+        """Tests whether rewriting the store leaves published files unchanged"""
+        weather = create_synthetic_weather(num_stations=2, num_days=2).collect()
+        manifest = publish_test_version(tmp_path, weather.lazy())
+        write_weather_partitions(
+            weather.lazy().with_columns(pl.col('rre150h0') + 1),
+            Path(tmp_path, 'weather_data'),
+            {},
+        )
+        assert_frame_equal(
+            pl.read_parquet(
+                [Path(tmp_path, p) for p in manifest['weather_files']],
+                hive_partitioning=False,
+            ),
+            weather,
+            check_row_order=False,
+        )
+
+    def test_export_version_under_fixed_names(self, tmp_path):
+        """Tests whether every version is exported to the same file names"""
+        weather = create_synthetic_weather(num_stations=3, num_days=2).collect()
+        export_path: Path = Path(tmp_path, 'export')
+        file_names: list[list[str]] = []
+        for _ in range(2):
+            manifest = publish_test_version(Path(tmp_path, 'data'), weather.lazy())
+            export_version(manifest, {}, Path(tmp_path, 'data'), export_path)
+            file_names.append(sorted(p.name for p in export_path.iterdir()))
+        assert file_names[0] == file_names[1] == ['metrics.parquet', WEATHER_FILE_NAME]
+        assert_frame_equal(
+            pl.read_parquet(Path(export_path, WEATHER_FILE_NAME)),
+            weather.sort('station_name', 'reference_timestamp'),
+        )
+
+    def test_remove_unreferenced_versions(self, tmp_path):
+        """Tests whether only versions of the given manifests are kept"""
+        weather = create_synthetic_weather(num_stations=2, num_days=2)
+        manifests = [publish_test_version(tmp_path, weather) for _ in range(3)]
+        Path(tmp_path, 'versions', 'crashed-run').mkdir()
+        removed = remove_unreferenced_versions(
+            Path(tmp_path, 'versions'), manifests[1:], tmp_path
+        )
+        assert sorted(p.name for p in removed) == sorted(
+            (manifests[0]['version'], 'crashed-run')
+        )
+        assert sorted(p.name for p in Path(tmp_path, 'versions').iterdir()) == sorted(
+            manifest['version'] for manifest in manifests[1:]
+        )
+
+
+class TestMapFrames:
+    """Tests the map frames written for the dashboard"""
+
+    def test_create_map_frames(self):
+        """Tests whether every station with metrics has one row per time period"""
+        weather = create_synthetic_weather(num_stations=3, num_days=8)
+        periods = {
+            days: datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+            - timedelta(days=days)
+            for days in (3, 7)
+        }
+        metrics = pivot_metrics(create_metrics(weather, periods))
+        meta_stations = pl.concat(
+            [
+                metrics.select('station_abbr').unique(),
+                pl.DataFrame({'station_abbr': ['XXX']}),
+            ]
+        ).with_columns(
+            pl.col('station_abbr').str.to_lowercase().alias('station_type_en'),
+            pl.lit(512.7).alias('station_height_masl'),
+            pl.lit(46.5).alias('station_coordinates_wgs84_lat'),
+            pl.lit(8.0).alias('station_coordinates_wgs84_lon'),
+        )
+        map_frames = create_map_frames(
+            pl.concat([meta_stations, meta_stations]).lazy(), metrics.lazy()
+        ).collect()
+        assert map_frames.columns[: len(MAP_FRAME_STATION_COLUMNS)] == list(
+            MAP_FRAME_STATION_COLUMNS
+        )
+        assert map_frames.group_by('time_period').len().sort('time_period').rows() == [
+            (3, 3),
+            (7, 3),
+        ]
+        assert 'XXX' not in map_frames.get_column('Short Code')
+        assert map_frames.get_column('Altitude').unique().to_list() == ['512 m.a.s.l']
+        assert_frame_equal(
+            map_frames.select('station_name', 'time_period', 'rre150h0'),
+            metrics.select('station_name', 'time_period', 'rre150h0'),
+            check_row_order=False,
+        )
+
+
+class TestCategories:
+    """Tests the Enum encoding of station and parameter identifiers"""
+
+    @pytest.fixture
+    def metrics(self) -> pl.DataFrame:
+        return create_metrics(
+            create_synthetic_weather(num_stations=40, num_days=8),
+            {
+                days: datetime.now(tz=ZoneInfo(TIMEZONE_SWITZERLAND_STRING))
+                - timedelta(days=days)
+                for days in (3, 7)
+            },
+        ).collect()
+
+    @pytest.fixture
+    def category_schema(self, metrics) -> dict[str, pl.Enum]:
+        return create_category_schema(
+            metrics.select('station_abbr', 'station_name').unique(),
+            pl.DataFrame(
+                {'parameter_shortname': metrics.get_column('parameter').unique()}
+            ),
+        )
+
+    def test_cast_categories(self, metrics, category_schema):
+        """Tests whether identifiers are encoded losslessly into a smaller frame"""
+        metrics_encoded = cast_categories(metrics, category_schema)
+        assert all(
+            isinstance(metrics_encoded.schema[column_name], pl.Enum)
+            for column_name in ('station_abbr', 'station_name', 'parameter', 'type')
+        )
+        assert_frame_equal(
+            metrics_encoded.with_columns(pl.col(pl.Enum).cast(pl.String)), metrics
+        )
+        assert metrics_encoded.estimated_size() < metrics.estimated_size() / 2
+
+    def test_cast_categories_rejects_unknown_values(self, metrics, category_schema):
+        """Tests whether identifiers missing from the metadata raise"""
+        with pytest.raises(pl.exceptions.InvalidOperationError):
+            cast_categories(
+                metrics.with_columns(pl.lit('Unknown').alias('station_name')),
+                category_schema,
+            )
+
+    def test_encode_categories_drops_stations_missing_from_metadata(
+        self, metrics, category_schema
+    ):
+        """Tests whether stored rows of a dropped station are skipped, not raised"""
+        metrics_stored: pl.DataFrame = pl.concat(
+            (
+                metrics,
+                metrics.head(4).with_columns(
+                    pl.lit('OLD').alias('station_abbr'),
+                    pl.lit('Old Station').alias('station_name'),
+                ),
+            )
+        )
+        assert_frame_equal(
+            encode_categories(metrics_stored.lazy(), category_schema).collect(),
+            cast_categories(metrics, category_schema),
+        )
+
+    def test_expr_is_in_categories(self, metrics, category_schema):
+        """Tests whether Enum and String columns filter alike, ignoring unknown values"""
+        station_names = ['Station 001', 'Unknown']
+        metrics_encoded = cast_categories(metrics, category_schema)
+        assert_frame_equal(
+            metrics_encoded.filter(
+                expr_is_in_categories(
+                    'station_name',
+                    station_names,
+                    metrics_encoded.schema['station_name'],
+                )
+            ).with_columns(pl.col(pl.Enum).cast(pl.String)),
+            metrics.filter(
+                expr_is_in_categories('station_name', station_names, pl.String())
+            ),
+        )
+
+    def test_create_map_frames_from_encoded_metrics(self, metrics, category_schema):
+        """Tests whether map frames join Enum metrics with String metadata"""
+        meta_stations = (
+            metrics.select('station_abbr')
+            .unique()
+            .with_columns(
+                pl.lit('Automatic weather stations').alias('station_type_en'),
+                pl.lit(500.0).alias('station_height_masl'),
+                pl.lit(46.5).alias('station_coordinates_wgs84_lat'),
+                pl.lit(8.0).alias('station_coordinates_wgs84_lon'),
+            )
+        )
+        map_frames = create_map_frames(
+            meta_stations.lazy(),
+            pivot_metrics(cast_categories(metrics, category_schema).lazy()).lazy(),
+        ).collect()
+        assert map_frames.height == 2 * 40
+
+
+class TestFixedPoint:
+    """Tests the fixed-point storage of measurements"""
+
+    @pytest.fixture
+    def weather(self) -> pl.DataFrame:
+        weather: pl.DataFrame = create_synthetic_weather(
+            num_stations=20, num_days=8
+        ).collect()
+        values: pl.Series = pl.Series(
+            'value', range(-300, weather.height - 300), dtype=pl.Int32
+        ).shuffle(seed=0)
+        return weather.with_columns(
+            (values.cast(pl.Float64) / 10).cast(pl.Float32).alias('tre200h0'),
+            pl.when(pl.int_range(pl.len()) % 5 == 0)
+            .then(None)
+            .otherwise(pl.col('rre150h0'))
+            .alias('rre150h0'),
+        )
+
+    def test_encode_fixed_point_round_trip(self, weather):
+        """Tests whether every column is encoded as integers and decoded exactly"""
+        weather_encoded, decimals_encoded = encode_fixed_point(
+            weather, FIXED_POINT_DECIMALS
+        )
+        assert decimals_encoded == FIXED_POINT_DECIMALS
+        assert weather_encoded.schema['tre200h0'] == pl.Int16
+        assert_frame_equal(
+            weather_encoded.with_columns(
+                expr_decode_fixed_point(column_name, decimals)
+                for column_name, decimals in decimals_encoded.items()
+            ),
+            weather,
+        )
+
+    def test_encode_fixed_point_keeps_lossy_columns(self, weather):
+        """Tests whether columns with more decimals than declared stay Float32"""
+        weather = weather.with_columns(pl.col('tre200h0') + 0.01)
+        weather_encoded, decimals_encoded = encode_fixed_point(
+            weather, FIXED_POINT_DECIMALS
+        )
+        assert 'tre200h0' not in decimals_encoded
+        assert_frame_equal(
+            weather_encoded.select('tre200h0'), weather.select('tre200h0')
+        )
+
+    def test_store_mixes_compact_and_plain_files(self, weather, tmp_path):
+        """Tests whether compact files are smaller and read alike with plain files"""
+        uncompressed: dict[str, str] = {'compression': 'uncompressed'}
+        write_weather_partitions(weather.lazy(), Path(tmp_path, 'plain'), uncompressed)
+        write_weather_partitions(
+            weather.lazy(),
+            Path(tmp_path, 'compact'),
+            uncompressed,
+            FIXED_POINT_DECIMALS,
+        )
+        assert (
+            read_fixed_point_decimals(
+                list_partition_files(Path(tmp_path, 'compact'))[0]
+            )
+            == FIXED_POINT_DECIMALS
+        )
+        weather_new: pl.DataFrame = create_synthetic_weather(
+            num_stations=20, num_days=0, end=read_max_timestamp(Path(tmp_path, 'plain'))
+        ).collect()
+        append_weather_partitions(
+            weather_new.lazy(), Path(tmp_path, 'plain'), {}, FIXED_POINT_DECIMALS
+        )
+        assert_frame_equal(
+            scan_weather_store(Path(tmp_path, 'plain')),
+            pl.concat((weather, weather_new)).unique().lazy(),
+            check_row_order=False,
+        )
+
+    def test_manifest_records_fixed_point_decimals(self, weather, tmp_path):
+        """Tests whether files are grouped from the manifest as from their metadata"""
+        store_path: Path = Path(tmp_path, 'weather_data')
+        write_weather_partitions(weather.lazy(), store_path, {}, FIXED_POINT_DECIMALS)
+        weather_files: list[Path] = list_partition_files(store_path)
+        manifest = create_manifest('v1', {}, weather_files, tmp_path)
+        assert list(manifest['fixed_point_decimals'].values()) == [
+            FIXED_POINT_DECIMALS
+        ] * len(weather_files)
+        assert group_fixed_point_files(
+            weather_files,
+            {
+                Path(tmp_path, relative_path): decimals_encoded
+                for relative_path, decimals_encoded in manifest[
+                    'fixed_point_decimals'
+                ].items()
+            },
+        ) == group_fixed_point_files(weather_files)
+
+    @pytest.mark.parametrize('profile', PARQUET_WRITE_PROFILES.keys())
+    def test_fixed_point_store_round_trip(self, profile, tmp_path):
+        """Tests whether a compact store scans to the data of a plain store"""
+        weather: pl.LazyFrame = create_synthetic_weather(num_stations=150, num_days=31)
+        for name, fixed_point_decimals in (
+            ('plain', None),
+            ('compact', FIXED_POINT_DECIMALS),
+        ):
+            write_weather_partitions(
+                weather,
+                Path(tmp_path, name),
+                PARQUET_WRITE_PROFILES[profile],
+                fixed_point_decimals,
+            )
+        assert_frame_equal(
+            scan_weather_store(Path(tmp_path, 'compact')),
+            scan_weather_store(Path(tmp_path, 'plain')),
+            check_row_order=False,
+        )
+
+
+class TestDownloadPlan:
+    """Tests the planning of station file downloads from the data inventory"""
+
+    now: datetime = datetime(
+        2025, 6, 15, 12, tzinfo=ZoneInfo(TIMEZONE_SWITZERLAND_STRING)
+    )
+
+    @pytest.fixture
+    def download_plan(self) -> pl.DataFrame:
+        stations: pl.DataFrame = pl.DataFrame(
+            {
+                'station_abbr': ['NEW', 'CUR', 'GAP', 'OLD', 'END', 'TOW'],
+                'station_type_en': ['Automatic weather stations'] * 6,
+            }
+        )
+        meta_datainventory: pl.LazyFrame = pl.LazyFrame(
+            {
+                'station_abbr': ['NEW', 'CUR', 'GAP', 'OLD', 'END', 'END', 'TOW'],
+                'parameter_shortname': [
+                    'rre150h0',
+                    'tre200h0',
+                    'tre200h0',
+                    'tre200h0',
+                    'tre200h0',
+                    'ure200h0',
+                    'dk1towh0',
+                ],
+                'data_since': ['2000-01-01 00:00'] * 7,
+                'data_till': [
+                    None,
+                    None,
+                    None,
+                    '2025-01-01 00:00',
+                    '2025-06-10 00:00',
+                    '2025-06-01 00:00',
+                    None,
+                ],
+            }
+        ).with_columns(pl.col('data_since', 'data_till').str.to_datetime())
+        station_max_timestamps: pl.DataFrame = pl.DataFrame(
+            {
+                'station_abbr': ['CUR', 'GAP', 'END'],
+                'reference_timestamp': [
+                    self.now - timedelta(hours=1),
+                    self.now - timedelta(days=3),
+                    datetime(2025, 6, 12, tzinfo=ZoneInfo(TIMEZONE_SWITZERLAND_STRING)),
+                ],
+            }
+        )
+        return create_download_plan(
+            stations, meta_datainventory, station_max_timestamps, now=self.now
+        )
+
+    def test_create_download_plan(self, download_plan):
+        """Tests whether only files that can hold new, relevant rows are planned"""
+        assert download_plan.select('station_abbr', 'now', 'recent').rows() == [
+            ('CUR', True, False),
+            ('GAP', True, True),
+            ('NEW', True, True),
+        ]
+
+    @pytest.mark.parametrize('hours_stored', [20, 35])
+    @pytest.mark.parametrize(
+        ('now', 'recent'),
+        [
+            (datetime(2025, 6, 15, 0, 30, tzinfo=UTC), True),
+            (datetime(2025, 6, 15, 23, 30, tzinfo=UTC), False),
+        ],
+    )
+    def test_create_download_plan_after_rollover(self, hours_stored, now, recent):
+        """Tests whether 'recent' is planned when the 'now' file rolled over"""
+        download_plan: pl.DataFrame = create_download_plan(
+            pl.DataFrame(
+                {
+                    'station_abbr': ['ABC'],
+                    'station_type_en': ['Automatic weather stations'],
+                }
+            ),
+            None,
+            pl.DataFrame(
+                {
+                    'station_abbr': ['ABC'],
+                    'reference_timestamp': [now - timedelta(hours=hours_stored)],
+                }
+            ).with_columns(
+                pl.col('reference_timestamp').dt.convert_time_zone(
+                    TIMEZONE_SWITZERLAND_STRING
+                )
+            ),
+            now=now,
+        )
+        assert download_plan.select('now', 'recent').row(0) == (True, recent)
+
+    def test_create_download_plan_without_store(self):
+        """Tests whether a first run plans both files of measuring stations"""
+        download_plan: pl.DataFrame = create_download_plan(
+            pl.DataFrame(
+                {
+                    'station_abbr': ['ABC'],
+                    'station_type_en': ['Automatic precipitation stations'],
+                }
+            ),
+            None,
+            None,
+            now=self.now,
+        )
+        assert download_plan.select('now', 'recent').row(0) == (True, True)
+
+    def test_plan_station_batches_only_loads_planned_urls(self, station_files):
+        """Tests whether batches leave out files missing from the plan"""
+        down_path, station_series_by_type, _ = station_files
+        planned_urls: pl.Series = pl.concat(
+            (
+                generate_download_urls(
+                    station_series_by_type['weather'], 'weather', 'now'
+                ),
+                generate_download_urls(pl.Series(['s004']), 'rainfall', 'recent'),
+            )
+        )
+        for memory_limit_bytes in (1, None):
+            assert sorted(
+                url
+                for batch in plan_station_batches(
+                    down_path, station_series_by_type, memory_limit_bytes, planned_urls
+                )
+                for urls in batch
+                for url in urls
+            ) == sorted(planned_urls)
+
+    def test_update_weather_data_per_station(self, station_files, tmp_path):
+        """Tests whether new rows are found per station, also for lagging ones"""
+        down_path, station_series_by_type, metadata = station_files
+        urls: pl.Series = pl.concat(
+            generate_download_urls(station_series, station_type, timeframe)
+            for station_type, station_series in station_series_by_type.items()
+            for timeframe in ('now', 'recent')
+        )
+        weather: pl.DataFrame = create_weather_batch(
+            down_path, KWARGS_LAZYFRAME_TEST, metadata, [urls]
+        ).collect()
+        max_timestamp: datetime = weather.get_column('reference_timestamp').max()
+        is_stored: pl.Expr = pl.col('reference_timestamp') <= pl.when(
+            pl.col('station_abbr') == 'S000'
+        ).then(pl.lit(max_timestamp - timedelta(hours=30))).otherwise(
+            pl.lit(max_timestamp - timedelta(hours=2))
+        )
+        write_weather_partitions(weather.filter(is_stored).lazy(), tmp_path, {})
+        assert_frame_equal(
+            update_weather_data(
+                down_path,
+                KWARGS_LAZYFRAME_TEST,
+                metadata,
+                urls,
+                read_station_max_timestamps(tmp_path),
+            ),
+            weather.filter(~is_stored).lazy(),
+            check_row_order=False,
+            check_column_order=False,
+        )
+        assert read_station_max_timestamps(tmp_path).height == 6
@@ -0,0 +1,99 @@
+"""Tests module meteoshrooms.dashboard.data_version.py"""
+
+import os
+import threading
+from pathlib import Path
+
+import polars as pl
+
+from meteoshrooms.dashboard.data_version import DataVersionWatcher, read_data_version
+from meteoshrooms.data_preparation.manifest import publish_manifest
+
+
+def write_data_file(file_path: Path, value: int):
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    pl.DataFrame({'value': [value]}).write_parquet(file_path)
+    os.utime(file_path, ns=(value, value))
+
+
+class TestReadDataVersion:
+    """Tests the version derived from the data files"""
+
+    def test_version_changes_with_data_files(self, tmp_path):
+        """Tests whether writing, adding and removing data files changes the version"""
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 1)
+        versions: list[str] = [read_data_version(tmp_path)]
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 2)
+        versions.append(read_data_version(tmp_path))
+        write_data_file(
+            Path(tmp_path, 'weather_data', 'date=2025-01-01', 'a.parquet'), 3
+        )
+        versions.append(read_data_version(tmp_path))
+        Path(tmp_path, 'metrics.parquet').unlink()
+        versions.append(read_data_version(tmp_path))
+        assert len(set(versions)) == len(versions)
+
+    def test_version_ignores_other_files(self, tmp_path):
+        """Tests whether partial and unrelated files leave the version unchanged"""
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 1)
+        version: str = read_data_version(tmp_path)
+        Path(tmp_path, 'metrics.parquet.part').write_bytes(b'partial')
+        Path(tmp_path, 'notes.txt').write_text('notes')
+        assert read_data_version(tmp_path) == version
+
+    def test_version_read_from_manifest(self, tmp_path):
+        """Tests whether a published manifest determines the version"""
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 1)
+        publish_manifest({'version': 'v1', 'files': {}}, tmp_path)
+        assert read_data_version(tmp_path) == 'v1'
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 2)
+        assert read_data_version(tmp_path) == 'v1'
+
+
+class TestDataVersionWatcher:
+    """Tests the background hot-reload of new data versions"""
+
+    def test_poll_publishes_after_on_change(self, tmp_path):
+        """Tests whether a new version is only visible once on_change returned"""
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 1)
+        seen: list[tuple[str, str]] = []
+        watcher = DataVersionWatcher(
+            lambda version: seen.append((version, watcher.version)), tmp_path
+        )
+        version_before: str = watcher.version
+        assert not watcher.poll()
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 2)
+        assert watcher.poll()
+        assert seen == [(watcher.version, version_before)]
+        assert watcher.version != version_before
+
+    def test_on_published_after_publishing(self, tmp_path):
+        """Tests whether the superseded version is released after publishing"""
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 1)
+        released: list[tuple[str, str]] = []
+        watcher = DataVersionWatcher(
+            lambda version: None,
+            tmp_path,
+            on_published=lambda version: released.append((version, watcher.version)),
+        )
+        version_before: str = watcher.version
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 2)
+        assert watcher.poll()
+        assert released == [(version_before, watcher.version)]
+
+    def test_failing_reload_keeps_version(self, tmp_path):
+        """Tests whether the thread survives a failing reload and keeps polling"""
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 1)
+        polled: threading.Event = threading.Event()
+
+        def on_change(version: str):
+            polled.set()
+            raise OSError('file vanished')
+
+        watcher = DataVersionWatcher(on_change, tmp_path, poll_seconds=0.01)
+        version_before: str = watcher.version
+        watcher.start()
+        write_data_file(Path(tmp_path, 'metrics.parquet'), 2)
+        assert polled.wait(timeout=5)
+        watcher.stop()
+        assert watcher.version == version_before
@@ -0,0 +1,75 @@
+"""Tests module meteoshrooms.dashboard.figure_cache.py"""
+
+import threading
+
+import polars as pl
+
+from meteoshrooms.dashboard.figure_cache import FigureCache, estimate_size
+
+
+class TestFigureCache:
+    """Tests the LRU cache of figures and chart data"""
+
+    def test_hits_and_misses(self):
+        """Tests whether values are created once per key and counted"""
+        cache = FigureCache(max_entries=4, max_bytes=1024)
+        created: list[str] = []
+
+        def create(key: str):
+            created.append(key)
+            return key.upper()
+
+        values = [
+            cache.get_or_create(key, lambda key=key: create(key), size=len)
+            for key in ('a', 'b', 'a', 'a')
+        ]
+        assert values == ['A', 'B', 'A', 'A']
+        assert created == ['a', 'b']
+        assert cache.stats() == {
+            'entries': 2,
+            'bytes': 2,
+            'hits': 2,
+            'misses': 2,
+            'evictions': 0,
+        }
+
+    def test_evicts_least_recently_used(self):
+        """Tests whether the least recently used entries are evicted first"""
+        cache = FigureCache(max_entries=2, max_bytes=1024)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_create(key, lambda key=key: key, size=len)
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+        assert cache.evictions == 1
+
+    def test_bounded_bytes(self):
+        """Tests whether the estimated size of all entries stays below max_bytes"""
+        cache = FigureCache(max_entries=100, max_bytes=10)
+        for key in range(6):
+            cache.get_or_create(key, lambda: 'x' * 4, size=len)
+        cache.get_or_create('large', lambda: 'x' * 11, size=len)
+        assert cache.num_bytes == 8
+        assert len(cache) == 2
+        assert 'large' not in cache
+
+    def test_shared_across_threads(self):
+        """Tests whether concurrent sessions keep the counters consistent"""
+        cache = FigureCache(max_entries=8, max_bytes=1024**2)
+        num_threads, num_lookups = 8, 200
+
+        def lookup():
+            for i in range(num_lookups):
+                cache.get_or_create(i % 16, lambda i=i: pl.DataFrame({'a': [i]}))
+
+        threads = [threading.Thread(target=lookup) for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        assert stats['hits'] + stats['misses'] == num_threads * num_lookups
+        assert stats['entries'] == len(cache) <= 8
+        assert stats['bytes'] == sum(
+            estimate_size(value) for value, _ in cache._entries.values()
+        )
@@ -0,0 +1,50 @@
+"""Tests module meteoshrooms.dashboard.instrumentation.py"""
+
+import json
+import logging
+
+from meteoshrooms.dashboard.instrumentation import RenderTimer
+from meteoshrooms.dashboard.log import JsonFormatter
+
+
+class TestRenderTimer:
+    """Tests the timing of dashboard stages"""
+
+    def test_stages_recorded_when_enabled(self):
+        """Tests whether every stage is recorded with rows and wall time"""
+        timer = RenderTimer(enabled=True)
+        with timer.stage('data_load') as stage:
+            stage['rows'] = 36
+        with timer.stage('map'):
+            pass
+        frame_timings = timer.to_frame()
+        assert frame_timings.get_column('stage').to_list() == ['data_load', 'map']
+        assert frame_timings.get_column('rows').to_list() == [36, None]
+        assert (frame_timings.get_column('seconds') >= 0).all()
+
+    def test_stages_skipped_when_disabled(self):
+        """Tests whether a disabled timer records nothing"""
+        timer = RenderTimer(enabled=False)
+        with timer.stage('map') as stage:
+            stage['rows'] = 9
+        assert timer.to_frame().is_empty()
+
+
+def test_json_formatter():
+    """Tests whether log records become JSON lines including their extra fields"""
+    record = logging.makeLogRecord(
+        {
+            'name': 'timing',
+            'levelname': 'DEBUG',
+            'msg': 'stage timed',
+            'fields': {'stage': 'map', 'seconds': 0.5},
+        }
+    )
+    assert json.loads(JsonFormatter().format(record)) | {'time': None} == {
+        'time': None,
+        'logger': 'timing',
+        'level': 'DEBUG',
+        'message': 'stage timed',
+        'stage': 'map',
+        'seconds': 0.5,
+    }
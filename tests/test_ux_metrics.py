@@ -1 +1,195 @@
-# Will contain tests for ux_metrics.py
+"""Tests module meteoshrooms.dashboard.ux_metrics.py"""
+
+from collections.abc import Sequence
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from meteoshrooms.dashboard.constants import (
+    METRICS_STRINGS,
+    NUM_DAYS_DELTA,
+    NUM_DAYS_VAL,
+    PARAMETER_AGGREGATION_TYPES,
+    TIME_PERIODS,
+    WEATHER_SHORT_LABEL_DICT,
+)
+from meteoshrooms.dashboard.ux_metrics import (
+    create_metric_cards_frame,
+    get_metric_emoji,
+)
+from meteoshrooms.data_preparation.categories import cast_categories, create_enum
+
+
+def create_synthetic_metrics(num_stations: int) -> pl.DataFrame:
+    """Creates wide metrics as loaded by the dashboard, one row per station and period"""
+    return pl.DataFrame(
+        [
+            {
+                'station_abbr': f'S{station:03d}',
+                'station_name': f'Station {station:03d}',
+                'time_period': time_period,
+            }
+            | {
+                metric_name: float(station + time_period + metric_index)
+                for metric_index, metric_name in enumerate(METRICS_STRINGS)
+            }
+            for station in range(num_stations)
+            for time_period in TIME_PERIODS
+        ]
+    )
+
+
+def calculate_metric_value_per_filter(
+    metrics: pl.LazyFrame, metric_name: str, station_name: str, number_days: int
+) -> float | None:
+    """Calculates a metric value with filters on the LazyFrame, as done before the index"""
+    try:
+        if metrics.select(pl.len()).collect().item() == 0:
+            return None
+        frame_filtered: pl.LazyFrame = metrics.filter(
+            (pl.col('station_name') == station_name)
+            & (pl.col('time_period') == number_days)
+        ).select(pl.col(metric_name))
+        if metric_name in PARAMETER_AGGREGATION_TYPES['sum']:
+            frame_filtered = frame_filtered.select(pl.col(metric_name) / number_days)
+        return frame_filtered.collect().item()
+    except ValueError:
+        return None
+
+
+META_PARAMETERS_TEST: pl.DataFrame = pl.DataFrame(
+    {
+        'parameter_shortname': list(METRICS_STRINGS),
+        'parameter_unit': ['mm', '°C', '%', 'm/s', '°C'],
+    }
+)
+
+
+def create_metric_cards_frame_per_card(
+    metrics: pl.DataFrame, station_names: Sequence[str]
+) -> pl.DataFrame:
+    """Computes the metric cards one filter at a time, as done before batching"""
+    cards: list[dict] = []
+    for station_name in station_names:
+        for metric_name in METRICS_STRINGS:
+            val = calculate_metric_value_per_filter(
+                metrics.lazy(), metric_name, station_name, NUM_DAYS_VAL
+            )
+            val_delta = calculate_metric_value_per_filter(
+                metrics.lazy(), metric_name, station_name, NUM_DAYS_DELTA
+            )
+            cards.append(
+                {
+                    'station_name': station_name,
+                    'parameter': metric_name,
+                    'value_string': (
+                        ' '.join(
+                            (
+                                str(round(val, 1)),
+                                get_metric_emoji(val)
+                                if metric_name == 'rre150h0'
+                                else '',
+                            )
+                        )
+                        if val is not None
+                        else '-'
+                    ),
+                    'delta': (
+                        (str(round(val - val_delta, 1)) if val_delta else '-')
+                        if val is not None
+                        else None
+                    ),
+                }
+            )
+    return pl.DataFrame(cards)
+
+
+class TestMetricCardsFrame:
+    """Tests the batched computation of the metric cards"""
+
+    @pytest.mark.parametrize('encoded', [False, True])
+    def test_cards_match_per_card_computation(self, encoded):
+        """Tests whether batched cards equal those computed card by card"""
+        metrics: pl.DataFrame = create_synthetic_metrics(num_stations=4)
+        station_names: list[str] = ['Station 002', 'Station 000', 'Unknown']
+        result: pl.DataFrame = create_metric_cards_frame(
+            cast_categories(
+                metrics,
+                {'station_name': create_enum(metrics.get_column('station_name'))},
+            )
+            if encoded
+            else metrics,
+            META_PARAMETERS_TEST,
+            station_names,
+            METRICS_STRINGS,
+            WEATHER_SHORT_LABEL_DICT,
+        )
+        assert_frame_equal(
+            result.select('station_name', 'parameter', 'value_string', 'delta'),
+            create_metric_cards_frame_per_card(metrics, station_names),
+        )
+        assert result.get_column('help').head(2).to_list() == [
+            'Precipitation in mm',
+            'Air Temperature in °C',
+        ]
+        assert result.get_column('label').head(2).to_list() == [
+            'Precipitation',
+            'Air Temperature',
+        ]
+
+    def test_missing_values(self):
+        """Tests whether missing values show '-' and missing deltas '-'"""
+        metrics: pl.DataFrame = create_synthetic_metrics(num_stations=1).with_columns(
+            pl.when(pl.col('time_period') == NUM_DAYS_DELTA)
+            .then(None)
+            .otherwise(pl.col('rre150h0'))
+            .alias('rre150h0'),
+            pl.lit(None, dtype=pl.Float64).alias('tre200h0'),
+        )
+        result: pl.DataFrame = create_metric_cards_frame(
+            metrics,
+            META_PARAMETERS_TEST,
+            ['Station 000'],
+            METRICS_STRINGS,
+            WEATHER_SHORT_LABEL_DICT,
+        )
+        assert result.row(0, named=True)['delta'] == '-'
+        assert result.row(1, named=True)['value_string'] == '-'
+        assert result.row(1, named=True)['delta'] is None
+
+    def test_no_stations_selected(self):
+        """Tests whether an empty selection gives no cards"""
+        assert create_metric_cards_frame(
+            create_synthetic_metrics(num_stations=1),
+            META_PARAMETERS_TEST,
+            [],
+            METRICS_STRINGS,
+            WEATHER_SHORT_LABEL_DICT,
+        ).is_empty()
+
+    def test_metric_cards_equal_per_card(self):
+        """Tests whether the batched cards of five stations match card by card"""
+        metrics: pl.DataFrame = create_synthetic_metrics(num_stations=160)
+        station_names: list[str] = (
+            metrics.get_column('station_name').unique(maintain_order=True)[:5].to_list()
+        )
+        result: pl.DataFrame = create_metric_cards_frame(
+            metrics,
+            META_PARAMETERS_TEST,
+            station_names,
+            METRICS_STRINGS,
+            WEATHER_SHORT_LABEL_DICT,
+        )
+        assert_frame_equal(
+            result.select('station_name', 'parameter', 'value_string', 'delta'),
+            create_metric_cards_frame_per_card(metrics, station_names),
+        )
+
+
+@pytest.mark.parametrize(
+    ('val', 'emoji'), [(0, '☀️'), (5, '🌦️'), (15, '🌧️'), (30, '🌊'), (80, '🌧️🌊')]
+)
+def test_get_metric_emoji(val, emoji):
+    """Tests the emoji of each rainfall intensity"""
+    assert get_metric_emoji(val) == emoji